@@ -0,0 +1,101 @@
+"""
+Benchmark for the /save_transactions write path.
+
+Imports the same generated items into a scratch SQLite database twice: once
+with one ORM object per row (the previous implementation) and once with
+bulk_import.import_items, then checks both produce the same ledger. Usage:
+
+    python benchmarks/bench_bulk_import.py --rows 100000 --batch-size 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import bulk_import, ledger  # noqa: E402
+from src.categories import ACTIVITY_TYPES  # noqa: E402
+from src.models import db, User, Transaction  # noqa: E402
+from src.utils import parse_date  # noqa: E402
+
+
+def make_items(rows, seed):
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    return [{
+        'date': (start + timedelta(days=rng.randrange(1500))).isoformat(),
+        'description': f"item {i}",
+        'amount': round(rng.uniform(-5000, 5000), 2),
+        'type': rng.choice(ACTIVITY_TYPES),
+    } for i in range(rows)]
+
+
+def orm_import(user_id, items):
+    ledger.add_transactions(user_id, [Transaction(
+        user_id=user_id,
+        date=parse_date(item['date']),
+        description=item['description'],
+        amount=float(item['amount']),
+        type=item['type']
+    ) for item in items])
+    db.session.commit()
+
+
+def bulk(user_id, items, batch_size, commit_each_batch):
+    report = bulk_import.import_items(user_id, items, batch_size=batch_size, commit_each_batch=commit_each_batch)
+    db.session.commit()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=bulk_import.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--commit-each-batch', action='store_true')
+    parser.add_argument('--skip-orm', action='store_true', help='Only time the bulk path.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    items = make_items(args.rows, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            users = [User(username=name, password='-') for name in ('orm', 'bulk')]
+            db.session.add_all(users)
+            db.session.commit()
+            orm_user, bulk_user = (user.id for user in users)
+
+            if not args.skip_orm:
+                start = time.perf_counter()
+                orm_import(orm_user, items)
+                elapsed = time.perf_counter() - start
+                print(f"{'ORM objects':<14} {elapsed:8.2f}s  {args.rows / elapsed:>10,.0f} rows/s")
+
+            start = time.perf_counter()
+            report = bulk(bulk_user, items, args.batch_size, args.commit_each_batch)
+            elapsed = time.perf_counter() - start
+            print(f"{'bulk_import':<14} {elapsed:8.2f}s  {args.rows / elapsed:>10,.0f} rows/s  "
+                  f"(batch {args.batch_size}, inserted {report.inserted}, failed {report.failed})")
+
+            problems = ledger.check(bulk_user)
+            if problems:
+                raise SystemExit(f"Derived tables inconsistent after bulk import: {problems[:3]}")
+            if not args.skip_orm:
+                orm_summary, bulk_summary = ledger.get_summary(orm_user), ledger.get_summary(bulk_user)
+                if abs(orm_summary.total_cfo - bulk_summary.total_cfo) > 1e-6 or \
+                        orm_summary.transaction_count != bulk_summary.transaction_count:
+                    raise SystemExit("ORM and bulk imports produced different ledgers")
+            print("ledger consistent")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark for columnar uploads.
+
+Writes the same transactions as CSV, Parquet and Arrow IPC, then reads each
+back through upload_handler.read_chunks (the chunked reader uploads use),
+reporting file size and read time. Usage:
+
+    python benchmarks/bench_columnar.py --rows 1000000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from werkzeug.datastructures import FileStorage
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import columnar  # noqa: E402
+from src.exporters import COLUMNS, csv_chunks  # noqa: E402
+from src.upload_handler import CHUNK_SIZE, read_chunks  # noqa: E402
+
+
+def make_batches(rows, batch_size):
+    start = date(2020, 1, 1)
+    types = ('Cash-customer', 'Salary-suppliers', 'Other-cfo', 'borrowings')
+    for offset in range(0, rows, batch_size):
+        yield [
+            (start + timedelta(days=i % 1500), f"Transaction {i % 5000}", round(i * 0.37 % 10000 - 5000, 2), types[i % 4])
+            for i in range(offset, min(offset + batch_size, rows))
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    files = {
+        'transactions.csv': b''.join(csv_chunks(make_batches(args.rows, columnar.EXPORT_BATCH_SIZE))),
+        'transactions.parquet': columnar.write_parquet(make_batches(args.rows, columnar.EXPORT_BATCH_SIZE)).read(),
+        'transactions.arrow': columnar.write_arrow(make_batches(args.rows, columnar.EXPORT_BATCH_SIZE)).read(),
+    }
+    print(f"{args.rows} rows, columns {', '.join(COLUMNS)}")
+    for filename, data in files.items():
+        start = time.perf_counter()
+        rows = sum(len(chunk) for chunk in read_chunks(FileStorage(io.BytesIO(data), filename=filename), CHUNK_SIZE))
+        elapsed = time.perf_counter() - start
+        assert rows == args.rows, (filename, rows)
+        print(f"{filename:<22} {len(data) / 1e6:8.1f} MB  read {elapsed:7.3f}s  {rows / elapsed:>12,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark for upload date parsing.
+
+Compares the original clean_data call (pd.to_datetime without a format),
+pandas' per-element format='mixed' parsing and DateParser on a column in the
+style of sample-cashflow-worksheet.csv (unpadded 2024/2/5), optionally mixed
+with a second, day-first export format. Reports rows/sec and how many rows
+each approach failed to parse. Usage:
+
+    python benchmarks/bench_date_parser.py --rows 1000000 --mix 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.date_parser import DateParser  # noqa: E402
+
+
+def make_column(rows, mix, seed):
+    """Dates as 2024/2/5, with a `mix` share written as 25/12/2024 instead."""
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    days = [start + timedelta(days=rng.randrange(3650)) for _ in range(rows)]
+    values = [
+        f"{day.day:02d}/{day.month:02d}/{day.year}" if rng.random() < mix else f"{day.year}/{day.month}/{day.day}"
+        for day in days
+    ]
+    return pd.Series(values), pd.Series(pd.to_datetime(days))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--mix', type=float, default=0.2, help='Share of rows in the second (day-first) format.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    column, expected = make_column(args.rows, args.mix, args.seed)
+    print(f"{args.rows} rows, {args.mix:.0%} in a second format, {column.nunique()} distinct values")
+
+    approaches = {
+        'to_datetime()': lambda: pd.to_datetime(column, errors='coerce'),
+        "format='mixed'": lambda: pd.to_datetime(column, format='mixed', dayfirst=True, errors='coerce'),
+        'DateParser': lambda: DateParser().parse(column),
+    }
+    for name, fn in approaches.items():
+        parsed, elapsed = timed(fn)
+        failed = int(parsed.isna().sum())
+        wrong = int((parsed.notna() & (parsed != expected)).sum())
+        print(f"{name:<16} {elapsed:8.3f}s  {args.rows / elapsed:>12,.0f} rows/s  "
+              f"unparsed {failed:>8}  misread {wrong:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for the Excel transaction export.
+
+Compares the original path (list of dicts -> DataFrame -> to_excel into
+BytesIO) with the write-only workbook writer fed in batches, reporting time
+and peak traced memory for each. tracemalloc slows both down several times,
+so compare the ratios rather than the absolute times. Usage:
+
+    python benchmarks/bench_excel_export.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from io import BytesIO
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import workbook  # noqa: E402
+from src.exporters import COLUMNS  # noqa: E402
+
+
+def make_batches(rows, batch_size):
+    start = date(2020, 1, 1)
+    for offset in range(0, rows, batch_size):
+        yield [
+            (start + timedelta(days=i % 1500), f"Transaction {i}", i / 10, 'Other-cfo')
+            for i in range(offset, min(offset + batch_size, rows))
+        ]
+
+
+def dataframe_export(rows, batch_size):
+    data = [dict(zip(COLUMNS, row)) for batch in make_batches(rows, batch_size) for row in batch]
+    df = pd.DataFrame(data)
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Transactions')
+    return output.tell()
+
+
+def write_only_export(rows, batch_size):
+    output = workbook.write_transactions(make_batches(rows, batch_size), COLUMNS)
+    output.seek(0, os.SEEK_END)
+    return output.tell()
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows")
+    for name, fn in (('DataFrame.to_excel', dataframe_export), ('write_transactions', write_only_export)):
+        size, elapsed, peak = measure(fn, args.rows, args.batch_size)
+        print(f"{name:<20} {elapsed:8.2f}s  peak {peak / 1e6:8.1f} MB  file {size / 1e6:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
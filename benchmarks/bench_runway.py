@@ -0,0 +1,42 @@
+"""
+Benchmark for the Monte Carlo runway simulation.
+
+Times src.runway.simulate for each method at several path counts over a
+synthetic history of monthly net flows (best of five runs). Usage:
+
+    python benchmarks/bench_runway.py --months 36 --history 24
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import runway  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--history', type=int, default=24, help='Months of history to sample from.')
+    args = parser.parse_args()
+
+    flows = np.random.default_rng(0).normal(-1500, 2500, args.history)
+    balance = 30_000
+    for method in runway.METHODS:
+        for paths in (10_000, 50_000, 100_000):
+            times = []
+            for seed in range(5):
+                start = time.perf_counter()
+                simulation = runway.simulate(balance, flows, args.months, paths, method, seed)
+                times.append(time.perf_counter() - start)
+            print(f"{method:<9} {paths:>7} paths x {args.months} months  {min(times) * 1000:7.1f} ms"
+                  f"   median runway {simulation.runway_median:g}"
+                  f"   P(out by {args.months}) {simulation.cash_out_probability[-1]:.1%}")
+
+
+if __name__ == '__main__':
+    main()
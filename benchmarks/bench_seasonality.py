@@ -0,0 +1,54 @@
+"""
+Benchmark for the NumPy seasonal decomposition.
+
+Times resampling plus decomposition of random transactions onto daily,
+weekly and monthly grids, next to a pandas resample().sum() of the same
+data for reference (pandas only resamples; it does no decomposition). Usage:
+
+    python benchmarks/bench_seasonality.py --rows 500000 --years 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import seasonality  # noqa: E402
+
+PANDAS_FREQ = {'D': 'D', 'W': 'W-SUN', 'M': 'MS'}
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--years', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dates = np.datetime64('2020-01-01') + rng.integers(0, args.years * 365, args.rows)
+    amounts = rng.normal(0, 100, args.rows)
+    series = pd.Series(amounts, index=pd.DatetimeIndex(dates))
+
+    print(f"{args.rows} transactions over {args.years} years")
+    for freq in ('D', 'W', 'M'):
+        numpy_time = best_of(lambda: seasonality.decompose_transactions(dates, amounts, freq))
+        pandas_time = best_of(lambda: series.resample(PANDAS_FREQ[freq]).sum())
+        print(f"{freq}  decompose_transactions {numpy_time * 1000:7.2f} ms"
+              f"   pandas resample only {pandas_time * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Concurrency benchmark for the SQLite engine profiles.
+
+Runs reader and writer threads against a scratch database, once per profile,
+and reports throughput plus how many operations failed with 'database is
+locked'. Usage:
+
+    python benchmarks/bench_sqlite_profile.py --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.config import SQLITE_PROFILES  # noqa: E402
+from src.database import READER_BIND, engine_options, install_profile  # noqa: E402
+
+
+def build_engines(profile, uri):
+    options, binds = engine_options(profile, uri)
+    writer = create_engine(uri, **options)
+    reader = None
+    if READER_BIND in binds:
+        reader_options = dict(binds[READER_BIND])
+        reader = create_engine(reader_options.pop('url'), **reader_options)
+    split = reader is not None
+    install_profile(writer, profile, role='writer', split=split)
+    if reader is not None:
+        install_profile(reader, profile, role='reader', split=split)
+    return writer, reader or writer
+
+
+def seed(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS txn (id INTEGER PRIMARY KEY, user_id INTEGER, amount FLOAT)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_txn_user ON txn (user_id)"))
+        conn.execute(
+            text("INSERT INTO txn (user_id, amount) VALUES (:user_id, :amount)"),
+            [{'user_id': i % 50, 'amount': float(i % 997)} for i in range(rows)],
+        )
+
+
+def run(profile_name, readers, writers, seconds, rows):
+    profile = SQLITE_PROFILES[profile_name]
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        writer, reader = build_engines(profile, uri)
+        seed(writer, rows)
+
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def bump(key):
+            with lock:
+                counts[key] += 1
+
+        def read_loop(n):
+            while time.perf_counter() < deadline:
+                try:
+                    with reader.connect() as conn:
+                        conn.execute(text("SELECT SUM(amount) FROM txn WHERE user_id = :u"), {'u': n % 50}).scalar()
+                    bump('reads')
+                except OperationalError:
+                    bump('locked')
+
+        def write_loop(n):
+            while time.perf_counter() < deadline:
+                try:
+                    with writer.begin() as conn:
+                        conn.execute(text("INSERT INTO txn (user_id, amount) VALUES (:u, 1.0)"), {'u': n % 50})
+                        conn.execute(text("UPDATE txn SET amount = amount + 1 WHERE user_id = :u AND id % 100 = 0"), {'u': n % 50})
+                    bump('writes')
+                except OperationalError:
+                    bump('locked')
+
+        threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        writer.dispose()
+        reader.dispose()
+
+    print(f"{profile_name:<12} reads/s={counts['reads'] / seconds:>9.0f}  "
+          f"writes/s={counts['writes'] / seconds:>7.0f}  locked errors={counts['locked']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--profiles', nargs='+', default=sorted(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    for name in args.profiles:
+        run(name, args.readers, args.writers, args.seconds, args.rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for the upload type classifier.
+
+Compares the original per-row keyword loop with TypeClassifier on a large
+frame of realistic bank-export labels, checks both give identical output and
+reports rows/sec. Usage:
+
+    python benchmarks/bench_type_classifier.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.upload_handler import ALLOWED_TYPES, TYPE_CLASSIFIER  # noqa: E402
+
+LABELS = [
+    'Customer receipt', 'CASH DEPOSIT', 'Salary payment', 'Supplier invoice', 'Interest paid',
+    'Income tax', 'Equipment purchase', 'Sale of property', 'Buy investment', 'Share issue',
+    'Loan drawdown', 'Loan repayment', 'Dividend', 'Financing fee', 'card fee', 'misc',
+    'Transfer', 'ATM withdrawal', None, np.nan, 42,
+]
+
+
+def map_type(type_value):
+    """The original row-by-row implementation from clean_data."""
+    type_value = str(type_value).lower()
+    for allowed_type, keywords in ALLOWED_TYPES.items():
+        if any(keyword in type_value for keyword in keywords):
+            return allowed_type
+    return "Other-cfo"
+
+
+def make_frame(rows, distinct, seed):
+    rng = random.Random(seed)
+    # Real exports repeat a small vocabulary with per-row suffixes (references, counterparties)
+    vocabulary = [
+        label if isinstance(label, (int, float)) or label is None else f"{label} {rng.randint(0, 999)}"
+        for label in (rng.choice(LABELS) for _ in range(distinct))
+    ] + LABELS
+    return pd.DataFrame({'type': [rng.choice(vocabulary) for _ in range(rows)]})
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--distinct', type=int, default=5000, help='Distinct type labels in the frame.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.distinct, args.seed)
+    print(f"{args.rows} rows, {df['type'].astype(str).nunique()} distinct labels")
+
+    legacy, legacy_time = timed(lambda: df['type'].apply(map_type))
+    vectorised, vectorised_time = timed(lambda: TYPE_CLASSIFIER.classify_series(df['type']))
+
+    if not legacy.equals(vectorised):
+        mismatches = (legacy != vectorised).sum()
+        raise SystemExit(f"Output differs from the original implementation on {mismatches} rows")
+
+    print(f"{'apply(map_type)':<18} {legacy_time:8.3f}s  {args.rows / legacy_time:>12,.0f} rows/s")
+    print(f"{'TypeClassifier':<18} {vectorised_time:8.3f}s  {args.rows / vectorised_time:>12,.0f} rows/s")
+    print(f"speed-up x{legacy_time / vectorised_time:.1f}, outputs identical")
+
+
+if __name__ == '__main__':
+    main()
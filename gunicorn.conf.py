@@ -0,0 +1,23 @@
+"""
+gunicorn settings for production: gunicorn -c gunicorn.conf.py main:app
+
+/forecast/stream keeps its response open for the whole model call, up to
+ANALYSIS_TIMEOUT seconds. With gunicorn's default sync workers every open
+stream holds a whole worker process, so a few viewers block the site and the
+ANALYSIS_MAX_CONCURRENT slots (one semaphore per process) never come into
+play. Threaded workers are therefore required; give each process more
+threads than ANALYSIS_MAX_CONCURRENT so ordinary requests are still served
+while the narratives stream. gevent workers (GUNICORN_WORKER_CLASS=gevent,
+with gevent installed) work as well.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+# gevent's equivalent of threads: open connections per worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+if worker_class == 'sync':
+    raise RuntimeError('Streamed AI narratives need threaded or gevent workers; use gthread or gevent')
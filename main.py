@@ -1,21 +1,22 @@
+import functools
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app, session
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app, session, stream_with_context
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from typing_extensions import Annotated
 from src.models import db, User, Transaction, InitialBalance, UserPreferences
 from src.forms import LoginForm, RegistrationForm
 from src.anthropic_service import FinancialAnalytics
-from src.upload_handler import process_upload
-from src.utils import calculate_totals, calculate_burn_rate, calculate_runway
-from src.config import Config
-import pandas as pd
-from io import BytesIO
+from src.utils import calculate_runway, parse_date
+from src.config import Config, shard_dir
+from src.database import configure_engines
+from src import aggregates, analysis_cache, bulk_import, columnar, exporters, forecasting, jobs, ledger, narrative, runway, sharding, staging, user_cache, workbook
+from src.categories import ACTIVITY_TYPES
+from src.pagination import paginate_transactions
+from src.statement import build_cashflow_statement
+from src.commands import register_commands
 from dotenv import load_dotenv
 import traceback
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 import matplotlib.pyplot as plt
 import io
 import base64
@@ -23,7 +24,7 @@ from matplotlib.figure import Figure
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from matplotlib.dates import MonthLocator, DateFormatter
 import matplotlib.ticker as ticker
-from datetime import datetime
+from datetime import datetime, timedelta
 import calendar
 from flask_migrate import Migrate
 from flask_babel import Babel
@@ -31,9 +32,8 @@ from flask_babel import Babel
 # Load .env file explicitly at the start
 load_dotenv()
 
-# Ensure instance folder exists
-instance_path = os.path.join(os.path.dirname(__file__),'instance')
-os.makedirs(instance_path, exist_ok=True)
+# Ensure the instance folder and its shards directory exist
+os.makedirs(shard_dir, exist_ok=True)
 
 upload_path = os.path.join(os.path.dirname(__file__), 'uploads')
 os.makedirs(upload_path, exist_ok=True)
@@ -44,11 +44,28 @@ app = Flask(__name__,
 app.config.from_object(Config)
 
 db.init_app(app)
+configure_engines(app, db)
 
 migrate = Migrate(app, db)
 
 with app.app_context():
     db.create_all()
+    sharding.create_shard_tables(db)
+
+register_commands(app)
+user_cache.init_app(app)
+jobs.init_app(app)
+analysis_cache.init_app(app)
+narrative.init_app(app)
+
+# Upper bound on points per /balance-by-date/batch request
+MAX_BALANCE_DATES = 1000
+# Upper bound on rows per /transactions page
+MAX_PAGE_SIZE = 500
+# Months of recent outflows averaged into the burn rate
+BURN_RATE_MONTHS = 3
+# Seed of the runway simulation behind the AI analysis, so unchanged numbers give the same prompt
+ANALYSIS_RUNWAY_SEED = 0
 
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -87,7 +104,7 @@ def set_language(language):
 @login_manager.user_loader
 def load_user(user_id):
     #return User.query.get(int(user_id))
-    return db.session.get(User, int(user_id))
+    return user_cache.get_user(int(user_id))
 
 #All routes in app
 @app.route('/',methods=['GET','POST'])
@@ -95,32 +112,38 @@ def load_user(user_id):
 @login_required
 def home():
     user_status = "Logged In"
-    page = request.args.get('page', 1, type=int)
     per_page = 8
 
     if request.method == 'POST':
         # Handle adding transactions
         new_transaction = Transaction(
             user_id=current_user.id,
-            date=request.form.get('date'),
+            date=parse_date(request.form.get('date')),
             description=request.form.get('description'),
             amount=float(request.form.get('amount')),
             type=request.form.get('type')
         )
-        db.session.add(new_transaction)
+        ledger.add_transaction(new_transaction)
         db.session.commit()
         flash('Transaction added successfully', 'success')
         return redirect(url_for('home'))
 
-    # Filter transactions by current user
-    paginated_transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date.desc()).paginate(page=page, per_page=per_page)
-    all_transactions = Transaction.query.filter_by(user_id=current_user.id).all()
-    
     # Get initial balance for current user
-    initial_balance_record = InitialBalance.query.filter_by(user_id=current_user.id).first()
-    initial_balance = initial_balance_record.balance if initial_balance_record else 0.0
+    initial_balance = user_cache.initial_balance_amount(current_user.id)
+
+    summary = ledger.get_summary(current_user.id)
 
-    total_cfo, total_cfi, total_cff = calculate_totals(all_transactions)
+    # Filter transactions by current user
+    try:
+        paginated_transactions = paginate_transactions(
+            current_user.id, per_page,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            total=summary.transaction_count
+        )
+    except ValueError:
+        return redirect(url_for('home'))
+    total_cfo, total_cfi, total_cff = summary.total_cfo, summary.total_cfi, summary.total_cff
     balance = initial_balance + total_cfo + total_cfi + total_cff
 
     return render_template('home.html', transactions=paginated_transactions, balance=balance, initial_balance=initial_balance,
@@ -157,6 +180,10 @@ def register():
             new_preferences = UserPreferences(user_id=new_user.id)
             db.session.add(new_preferences)
             db.session.commit()
+            # An empty ledger summary, so reads never have to build one
+            with sharding.tenant(db, new_user.id):
+                ledger.prepare(new_user.id)
+                db.session.commit()
             flash('Your account has been created! You can now log in.', 'success')
             return redirect(url_for('login'))
     return render_template('register.html', form=form)
@@ -172,10 +199,13 @@ def logout():
 def edit_transaction(transaction_id):
     transaction = Transaction.query.get_or_404(transaction_id)
     if request.method == 'POST':
-        transaction.date = request.form['date']
-        transaction.description = request.form['description']
-        transaction.amount = float(request.form['amount'])
-        transaction.type = request.form['type']
+        ledger.update_transaction(
+            transaction,
+            date=parse_date(request.form['date']),
+            description=request.form['description'],
+            amount=float(request.form['amount']),
+            type=request.form['type']
+        )
         db.session.commit()
         flash('Transaction Updated Successfully', 'success')
         return redirect(url_for('cash_activities'))
@@ -185,7 +215,7 @@ def edit_transaction(transaction_id):
 @login_required
 def delete_transaction(transaction_id):
     transaction = Transaction.query.get_or_404(transaction_id)
-    db.session.delete(transaction)
+    ledger.delete_transaction(transaction)
     db.session.commit()
     flash('Your Transaction Deleted!', 'danger')
     return redirect(url_for('home'))
@@ -203,12 +233,66 @@ def upload_route():
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
+        # Day/month order for dates like 05/02/2024; inferred from the file unless chosen
+        dayfirst = {'day': True, 'month': False}.get(request.form.get('date_order'))
+
+        # Staged for review (the default) or imported straight away, by a background job either way;
+        # the browser polls /jobs/<id>, whose result is the preview or the import summary
+        kind = 'import' if request.form.get('mode') == 'stream' else 'review'
         try:
-            result = process_upload(file)
-            return jsonify(result)
-        except Exception as e:
-            app.logger.error(f"Error in upload_file: {str(e)}")
-            return jsonify({'error': str(e)}), 500
+            job = jobs.submit_import(file, current_user.id, dayfirst=dayfirst, kind=kind)
+        except jobs.TooManyJobs as e:
+            return jsonify({'error': str(e)}), 429
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'job_id': job.id, 'status_url': url_for('job_status', job_id=job.id)}), 202
+
+@app.route('/staged/<token>', methods=['GET'])
+@login_required
+def staged_preview(token):
+    upload = staging.get_upload(token, current_user.id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found or expired; please upload the file again'}), 404
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', staging.PREVIEW_PAGE_SIZE, type=int), MAX_PAGE_SIZE)
+    return jsonify(staging.preview(upload, page=page, per_page=max(per_page, 1)))
+
+@app.route('/commit-staged/<token>', methods=['POST'])
+@login_required
+def commit_staged(token):
+    upload = staging.get_upload(token, current_user.id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found or expired; please upload the file again'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        staged = upload.row_count
+        inserted = staging.commit_staged(upload, data.get('types'))
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error committing staged upload: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    duplicates = staged - inserted
+    message = f'{inserted} transactions saved successfully'
+    if duplicates:
+        message = f'{inserted} transactions saved; {duplicates} already imported and skipped'
+    return jsonify({'message': message, 'inserted': inserted, 'duplicates': duplicates})
+
+@app.route('/jobs', methods=['GET'])
+@login_required
+def list_jobs():
+    return jsonify({'jobs': [job.to_dict() for job in jobs.recent_jobs(current_user.id)]})
+
+@app.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    job = jobs.get_job(job_id, current_user.id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/set-initial-balance', methods=['POST'])
 @login_required
@@ -217,7 +301,7 @@ def set_initial_balance():
         amount = float(request.form.get('initial_balance'))
         
         # Get or create initial balance record for the user
-        initial_balance = InitialBalance.query.filter_by(user_id=current_user.id).first()
+        initial_balance = user_cache.get_initial_balance(current_user.id)
         if initial_balance:
             initial_balance.balance = amount
         else:
@@ -225,6 +309,7 @@ def set_initial_balance():
             db.session.add(initial_balance)
             
         db.session.commit()
+        user_cache.invalidate(current_user.id, user_cache.INITIAL_BALANCE)
         flash('Initial balance set successfully', 'success')
     except ValueError:
         flash('Please enter a valid number for the initial balance', 'danger')
@@ -236,28 +321,37 @@ def set_initial_balance():
 @app.route('/export/<file_type>')
 @login_required
 def export(file_type):
-    transactions = Transaction.query.all()
-    data = [{
-        'Date': transaction.date,
-        'Description': transaction.description,
-        'Amount': transaction.amount,
-        'Type': transaction.type
-    } for transaction in transactions]
-
-    df = pd.DataFrame(data)
+    # Optional filters: ?start=YYYY-MM-DD&end=YYYY-MM-DD&type=Cash-customer&type=...
+    try:
+        start = parse_date(request.args['start']) if request.args.get('start') else None
+        end = parse_date(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        flash('Export dates must be in YYYY-MM-DD format.', 'danger')
+        return redirect(url_for('cash_activities'))
+    types = request.args.getlist('type')
+    unknown = [t_type for t_type in types if t_type not in ACTIVITY_TYPES]
+    if unknown:
+        flash(f"Unknown transaction type(s): {', '.join(unknown)}", 'danger')
+        return redirect(url_for('cash_activities'))
+    query = exporters.export_query(current_user.id, start=start, end=end, types=types)
 
     if file_type == 'csv':
-        output = BytesIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-        return send_file(output, mimetype='text/csv', as_attachment=True, download_name='transactions.csv')
+        chunks = exporters.csv_chunks(exporters.iter_batches(query, app.config['EXPORT_BATCH_SIZE']))
+        headers = {'Content-Disposition': 'attachment; filename=transactions.csv', 'Vary': 'Accept-Encoding'}
+        if request.accept_encodings['gzip']:
+            chunks = exporters.gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+        # stream_with_context keeps the session (and the user's shard) alive while rows are sent
+        return Response(stream_with_context(chunks), mimetype='text/csv', headers=headers)
     elif file_type == 'excel':
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Transactions')
-        output.seek(0)
-        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
-                         as_attachment=True, download_name='transactions.xlsx')
+        batches = exporters.iter_batches(query, app.config['EXPORT_BATCH_SIZE'])
+        output = workbook.write_transactions(batches, exporters.COLUMNS)
+        return send_file(output, mimetype=workbook.XLSX_MIMETYPE, as_attachment=True, download_name='transactions.xlsx')
+    elif file_type in ('parquet', 'arrow'):
+        batches = exporters.iter_batches(query, columnar.EXPORT_BATCH_SIZE)
+        write = columnar.write_parquet if file_type == 'parquet' else columnar.write_arrow
+        return send_file(write(batches), mimetype=columnar.MIMETYPES[file_type], as_attachment=True,
+                         download_name=f'transactions.{file_type}')
     else:
         flash('Invalid file type requested.', 'danger')
         return redirect(url_for('home'))
@@ -266,22 +360,31 @@ def export(file_type):
 @login_required
 def save_transactions():
     data = request.json
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        return jsonify({'error': 'Expected a JSON list of transactions'}), 400
     try:
-        for item in data:
-            new_transaction = Transaction(
-                user_id=current_user.id,
-                date=item['date'],
-                description=item['description'],
-                amount=float(item['amount']),
-                type=item['type']
-            )
-            db.session.add(new_transaction)
+        report = bulk_import.import_items(
+            current_user.id, data,
+            batch_size=app.config['IMPORT_BATCH_SIZE'],
+            commit_each_batch=app.config['IMPORT_COMMIT_EACH_BATCH']
+        )
         db.session.commit()
-        return jsonify({'message': 'Transactions saved successfully'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+    result = report.to_dict()
+    if report.inserted == 0 and report.failed and not report.duplicates:
+        return jsonify({'error': f'No transactions saved; {report.failed} row(s) rejected', **result}), 400
+    message = 'Transactions saved successfully'
+    if report.failed or report.duplicates:
+        message = f'Saved {report.inserted} transactions'
+        if report.duplicates:
+            message += f'; {report.duplicates} already imported'
+        if report.failed:
+            message += f'; {report.failed} row(s) rejected'
+    return jsonify({'message': message, **result})
+
 @app.route('/balance-by-date', methods=['POST'])
 @login_required
 def balance_by_date():
@@ -290,18 +393,9 @@ def balance_by_date():
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
         # Get initial balance
-        initial_balance = InitialBalance.query.filter_by(user_id=current_user.id).first()
-        initial_amount = initial_balance.balance if initial_balance else 0
-        
-        # Get all transactions up to the target date
-        transactions = Transaction.query.filter(
-            Transaction.user_id == current_user.id,
-            Transaction.date <= target_date
-        ).all()
+        initial_amount = user_cache.initial_balance_amount(current_user.id)
         
-        # Calculate totals
-        total_cfo, total_cfi, total_cff = calculate_totals(transactions)
-        balance = initial_amount + total_cfo + total_cfi + total_cff
+        balance = initial_amount + ledger.balance_as_of(current_user.id, target_date)
         
         return jsonify({
             'success': True,
@@ -313,206 +407,204 @@ def balance_by_date():
             'success': False,
             'error': str(e)
         }), 400
+
+@app.route('/balance-by-date/batch', methods=['POST'])
+@login_required
+def balance_by_date_batch():
+    try:
+        date_strs = (request.get_json(silent=True) or {}).get('dates') or []
+        if len(date_strs) > MAX_BALANCE_DATES:
+            raise ValueError(f'At most {MAX_BALANCE_DATES} dates per request')
+        target_dates = [parse_date(d) for d in date_strs]
+
+        initial_amount = user_cache.initial_balance_amount(current_user.id)
+
+        balances = ledger.balances_as_of(current_user.id, target_dates)
+        return jsonify({
+            'success': True,
+            'balances': [{'date': d.isoformat(), 'balance': initial_amount + b}
+                         for d, b in zip(target_dates, balances)]
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     
+def _analytics():
+    """FinancialAnalytics for the configured API key; returns (analytics, None) or (None, error response)."""
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        return None, (jsonify({
+            'error': 'API key not found. Please set the ANTHROPIC_API_KEY environment variable.'
+        }), 500)
+    return FinancialAnalytics(api_key=api_key, cache=analysis_cache.shared,
+                              timeout=app.config['ANALYSIS_TIMEOUT']), None
+
+def _forecast_analysis():
+    """
+    Numeric analysis for /forecast, from the ledger's daily and monthly totals.
+
+    Optional ?model=<src.forecasting.MODELS name>&horizon=<days>; defaults come from the config.
+    Returns (analytics, analysis, None), or (None, None, error response).
+    """
+    model = request.args.get('model') or app.config['FORECAST_MODEL']
+    if model not in forecasting.MODELS:
+        return None, None, (jsonify({'error': f"Unknown forecasting model: {model}"}), 400)
+    try:
+        horizon = int(request.args.get('horizon') or app.config['FORECAST_HORIZON'])
+    except ValueError:
+        return None, None, (jsonify({'error': 'Horizon must be a whole number of days'}), 400)
+    if not 1 <= horizon <= 365:
+        return None, None, (jsonify({'error': 'Horizon must be between 1 and 365 days'}), 400)
+
+    # Net cash flow per day with categorised transactions, straight from the prefix-sum table
+    history = [{'date': day.isoformat(), 'amount': net} for day, net in ledger.daily_net(current_user.id)]
+    if not history:
+        return None, None, (jsonify({
+            'error': 'No transactions found. Please add some transactions first.'
+        }), 400)
+
+    analytics, error = _analytics()
+    if error:
+        return None, None, error
+
+    summary = ledger.get_summary(current_user.id)
+    initial_balance = user_cache.initial_balance_amount(current_user.id)
+    current_balance = initial_balance + summary.total_cfo + summary.total_cfi + summary.total_cff
+
+    # Mock working capital data (you may want to replace this with actual data)
+    working_capital = {
+        'current_assets': current_balance,
+        'current_liabilities': 0,
+        'cash': current_balance
+    }
+
+    monthly_flows = runway.monthly_net_flows(current_user.id)
+    # Fixed seed: the runway goes into the prompt, and the prompt is the narrative's cache key
+    simulation = runway.simulate(current_balance, monthly_flows, months=app.config['RUNWAY_MONTHS'],
+                                 paths=app.config['RUNWAY_PATHS'], seed=ANALYSIS_RUNWAY_SEED)
+
+    analysis = analytics.analyze(
+        initial_balance=initial_balance,
+        current_balance=current_balance,
+        transaction_history=history,
+        monthly_flows=monthly_flows,
+        working_capital=working_capital,
+        simulation=simulation,
+        forecast_model=model,
+        horizon=horizon,
+        level=app.config['FORECAST_LEVEL']
+    )
+    return analytics, analysis, None
+
+def _refresh_requested():
+    # ?refresh=1 asks the model again even when an analysis of the same numbers is cached
+    return request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+
 @app.route('/forecast', methods=['GET'])
 @login_required
 def forecast():
+    # The numbers return at once; the narrative comes from the cache or, via stream_url, from /forecast/stream
     try:
-        # Get all transactions for the current user
-        transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date).all()
-        
-        if not transactions:
-            return jsonify({
-                'error': 'No transactions found. Please add some transactions first.'
-            }), 400
-            
-        # Convert transactions to a format suitable for analysis
-        transaction_data = [{
-            'date': t.date.strftime('%Y-%m-%d') if isinstance(t.date, datetime) else t.date,
-            'amount': t.amount,
-            'type': t.type,
-            'description': t.description
-        } for t in transactions]
-        
-        # Initialize financial analytics with API key
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
-            return jsonify({
-                'error': 'API key not found. Please set the ANTHROPIC_API_KEY environment variable.'
-            }), 500
-            
-        analytics = FinancialAnalytics(api_key=api_key)
-        
-        # Get initial balance
-        initial_balance_record = InitialBalance.query.filter_by(user_id=current_user.id).first()
-        initial_balance = initial_balance_record.balance if initial_balance_record else 0.0
-        
-        # Calculate current balance
-        current_balance = initial_balance + sum(t.amount for t in transactions)
-        
-        # Mock working capital data (you may want to replace this with actual data)
-        working_capital = {
-            'current_assets': current_balance,
-            'current_liabilities': 0,
-            'cash': current_balance
-        }
-        
-        # Get analysis results using the correct method
-        analysis_results = analytics.generate_advanced_financial_analysis(
-            initial_balance=initial_balance,
-            current_balance=current_balance,
-            transaction_history=transaction_data,
-            working_capital=working_capital
-        )
-        
+        analytics, analysis, error = _forecast_analysis()
+        if error:
+            return error
+
+        refresh = _refresh_requested()
+        ai_analysis = None if refresh else analytics.cached_narrative(analysis['cache_key'])
+        stream_url = None
+        if ai_analysis is None:
+            analytics.remember_prompt(analysis['cache_key'], current_user.id, analysis['prompt'])
+            stream_url = url_for('forecast_stream', key=analysis['cache_key'], **request.args.to_dict())
+
         return jsonify({
             'success': True,
-            'ai_analysis': analysis_results.get('ai_analysis', 'No insights available'),
-            'patterns': analysis_results.get('patterns', {'seasonal_pattern': [0] * 12}),
-            'forecasts': analysis_results.get('forecasts', {'90_days': [0] * 90}),
-            'risk_metrics': analysis_results.get('risk_metrics', {
-                'liquidity_ratio': 0,
-                'cash_flow_volatility': 0,
-                'burn_rate': 0,
-                'runway_months': 0
-            })
+            'ai_analysis': ai_analysis,
+            'cached': ai_analysis is not None,
+            'cache_key': analysis['cache_key'],
+            'stream_url': stream_url,
+            'patterns': analysis['patterns'],
+            'forecasts': analysis['forecasts'],
+            'risk_metrics': analysis['risk_metrics']
         })
     except Exception as e:
         return jsonify({
             'error': str(e)
         }), 500
 
+def _narrative_prompt(cache_key):
+    """
+    Prompt for /forecast/stream: the one /forecast kept under cache_key, or the
+    analysis redone from the query when it is gone (expired, or the cache is off).
+    Returns (analytics, cache_key, prompt, None), or (None, None, None, error response).
+    """
+    analytics, error = _analytics()
+    if error:
+        return None, None, None, error
+    prompt = analytics.remembered_prompt(cache_key, current_user.id) if cache_key else None
+    if prompt is not None:
+        return analytics, cache_key, prompt, None
+    analytics, analysis, error = _forecast_analysis()
+    if error:
+        return None, None, None, error
+    return analytics, analysis['cache_key'], analysis['prompt'], None
+
+@app.route('/forecast/stream', methods=['GET'])
+@login_required
+def forecast_stream():
+    # Server-Sent Events carrying the AI narrative for a /forecast response's ?key= (see src.narrative).
+    # The response stays open for the whole model call: serve the app with threaded (gthread) or
+    # gevent workers, see gunicorn.conf.py, or each open stream ties up a whole worker process.
+    try:
+        analytics, cache_key, prompt, error = _narrative_prompt(request.args.get('key'))
+    except Exception as e:
+        error = (jsonify({'error': str(e)}), 500)
+    if error:
+        response, status = error
+        events = [narrative.event('failed', response.get_json())]
+    else:
+        cached = None if _refresh_requested() else analytics.cached_narrative(cache_key)
+        if cached is not None:
+            events = narrative.cached_events(cached)
+        elif not narrative.acquire_slot(app):
+            events = [narrative.event('failed', {'error': 'The analysis service is busy; please try again shortly.'})]
+        else:
+            events = narrative.stream_events(app, functools.partial(analytics.stream_narrative, prompt, cache_key))
+
+    # EventSource reconnects after a non-2xx response, so failures are reported as events
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/generate_cashflow_statement', methods=['GET'])
 @login_required
 def generate_cashflow_statement_route():
+    # Optional ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD; open ends default to the first/last transaction
+    try:
+        start_date = parse_date(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = parse_date(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+
     try:
-        transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date).all()
-        if not transactions:
+        initial_balance = user_cache.initial_balance_amount(current_user.id)
+        statement = build_cashflow_statement(current_user.id, initial_balance, start_date, end_date)
+        if statement is None:
             app.logger.warning("No transactions found when generating cash flow statement")
             return jsonify({'error': 'No transactions found'}), 400
 
-        initial_balance_record = InitialBalance.query.filter_by(user_id=current_user.id).first()
-        initial_balance = initial_balance_record.balance if initial_balance_record else 0.0
-
-        start_date = transactions[0].date
-        end_date = transactions[-1].date
-
-        transaction_data = "\n".join([f"Date: {t.date}, Description: {t.description}, Amount: {t.amount}, Type: {t.type}" for t in transactions])
-
-        app.logger.info(f"Generating cash flow statement for period {start_date} to {end_date}")
-        
-        # Initialize FinancialAnalytics
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
-            app.logger.error("ANTHROPIC_API_KEY not found in environment variables")
-            return jsonify({'error': 'API key not found'}), 500
-            
-        analytics = FinancialAnalytics(api_key=api_key)
-        
-        # Generate cash flow statement using AI
-        statement_data, ending_balance = analytics.generate_cashflow_statement(
-            initial_balance=initial_balance,
-            start_date=start_date,
-            end_date=end_date,
-            transaction_data=transaction_data
-        )
-        
-        if not statement_data:
-            app.logger.error("generate_cashflow_statement returned None")
-            return jsonify({'error': 'Failed to generate statement: No data returned'}), 500
-
-        app.logger.info("Cash flow statement generated successfully")
-        app.logger.debug(f"Statement data: {statement_data}")
-
-        # Create a new workbook and select the active sheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Cash Flow Statement"
-
-        # Set column widths
-        ws.column_dimensions['A'].width = 40
-        ws.column_dimensions['B'].width = 15
-
-        # Add title
-        ws['A1'] = f"Cash Flow Statement - {start_date} to {end_date}"
-        ws['A1'].font = Font(bold=True, size=14)
-        ws.merge_cells('A1:B1')
-
-        # Add headers
-        headers = ['Category', 'Amount']
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-
-        # Helper function to add a row with formatting
-        def add_row(row, category, amount, is_total=False, indent=0):
-            ws.cell(row=row, column=1, value=category).alignment = Alignment(indent=indent)
-            ws.cell(row=row, column=2, value=amount)
-            if is_total:
-                for col in range(1, 3):
-                    ws.cell(row=row, column=col).font = Font(bold=True)
-
-        # Add Beginning Cash Balance
-        row = 4
-        add_row(row, "Beginning Cash Balance", initial_balance, True)
-        row += 2
-
-        # Process and add data for each category
-        categories = ['CFO', 'CFI', 'CFF']
-        for category in categories:
-            ws.cell(row=row, column=1, value=f"Cash Flow from {'Operating' if category == 'CFO' else 'Investing' if category == 'CFI' else 'Financing'} Activities ({category})")
-            ws.cell(row=row, column=1).font = Font(bold=True)
-            ws.cell(row=row, column=1).fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-            row += 1
-
-            category_total = 0
-            for item in statement_data:
-                if item['Category'] == category:
-                    add_row(row, item['Subcategory'], item['Amount'], indent=1)
-                    category_total += item['Amount']
-                    row += 1
-
-            add_row(row, f"Net Cash from {'Operating' if category == 'CFO' else 'Investing' if category == 'CFI' else 'Financing'}", category_total, True)
-            row += 2
-
-        # Add Total Net Cash Flow
-        total_net_cash_flow = sum(item['Amount'] for item in statement_data)
-        add_row(row, "Total Net Cash Flow", total_net_cash_flow, True)
-        row += 2
-
-        # Add Ending Cash Balance
-        ending_balance = initial_balance + total_net_cash_flow
-        add_row(row, "Ending Cash Balance", ending_balance, True)
-
-        # Apply currency formatting to amount column
-        for row in ws['B4:B' + str(ws.max_row)]:
-            for cell in row:
-                cell.number_format = '#,##0.00'
-
-        # Apply right alignment to amount column
-        for row in ws['B1:B' + str(ws.max_row)]:
-            for cell in row:
-                cell.alignment = Alignment(horizontal='right')
-
-        # Add borders
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-        for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=2):
-            for cell in row:
-                cell.border = thin_border
-
-        # Save to BytesIO object
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+        app.logger.info(f"Generating cash flow statement for period {statement['start_date']} to {statement['end_date']}")
+        output = workbook.write_cashflow_statement(statement)
 
         app.logger.info("Excel file created successfully")
         return send_file(
             output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            mimetype=workbook.XLSX_MIMETYPE,
             as_attachment=True,
             download_name='cash_flow_statement.xlsx'
         )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Failed to generate cash flow statement: {str(e)}")
         app.logger.error(traceback.format_exc())
@@ -520,36 +612,19 @@ def generate_cashflow_statement_route():
 
 # Generate monthly chart function    
 def generate_monthly_balance_chart():
-    # Get transactions for the current user
-    transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date).all()
-    
     # Get initial balance for the current user
-    initial_balance_record = InitialBalance.query.filter_by(user_id=current_user.id).first()
-    initial_balance = initial_balance_record.balance if initial_balance_record else 0.0
+    initial_balance = user_cache.initial_balance_amount(current_user.id)
 
     monthly_balances = []
     current_balance = initial_balance
-    current_month = None
 
-    for transaction in transactions:
-        transaction_date = transaction.date if isinstance(transaction.date, datetime) else datetime.strptime(transaction.date, '%Y-%m-%d')
-        
-        if current_month != transaction_date.replace(day=1):
-            if current_month:
-                last_day = calendar.monthrange(current_month.year, current_month.month)[1]
-                monthly_balances.append({
-                    'date': current_month.replace(day=last_day),
-                    'balance': current_balance
-                })
-            current_month = transaction_date.replace(day=1)
-
-        current_balance += transaction.amount
-
-    # Add the last month's balance
-    if current_month:
-        last_day = calendar.monthrange(current_month.year, current_month.month)[1]
+    # Month-end balances from the monthly rollup
+    for month, inflow, outflow in ledger.monthly_totals(current_user.id):
+        month_start = datetime.strptime(month, '%Y-%m')
+        last_day = calendar.monthrange(month_start.year, month_start.month)[1]
+        current_balance += inflow - outflow
         monthly_balances.append({
-            'date': current_month.replace(day=last_day),
+            'date': month_start.replace(day=last_day),
             'balance': current_balance
         })
 
@@ -613,20 +688,13 @@ def generate_monthly_balance_chart():
 def monthly_balances():
     try:
         app.logger.info("Starting to generate monthly balance data")
-        transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date).all()
-        initial_balance_record = InitialBalance.query.filter_by(user_id=current_user.id).first()
-        initial_balance = initial_balance_record.balance if initial_balance_record else 0.0
+        initial_balance = user_cache.initial_balance_amount(current_user.id)
 
         monthly_data = {}
         current_balance = initial_balance
 
-        for transaction in transactions:
-            month = transaction.date.strftime('%Y-%m') if isinstance(transaction.date, datetime) else datetime.strptime(transaction.date, '%Y-%m-%d').strftime('%Y-%m')
-            
-            if month not in monthly_data:
-                monthly_data[month] = current_balance
-            
-            current_balance += transaction.amount
+        for month, inflow, outflow in ledger.monthly_totals(current_user.id):
+            current_balance += inflow - outflow
             monthly_data[month] = current_balance
 
         app.logger.info(f"Monthly balance data generated: {monthly_data}")
@@ -644,7 +712,7 @@ def monthly_balances():
 @app.route('/settings')
 @login_required
 def settings():
-    user_preferences = UserPreferences.query.filter_by(user_id=current_user.id).first()
+    user_preferences = user_cache.get_preferences(current_user.id)
     return render_template('settings.html', user_preferences=user_preferences)
 
 @app.route('/update_profile', methods=['POST'])
@@ -653,6 +721,7 @@ def update_profile():
     current_user.username = request.form.get('username')
     current_user.email = request.form.get('email')
     db.session.commit()
+    user_cache.invalidate(current_user.id, user_cache.USER)
     flash('Profile updated successfully', 'success')
     return redirect(url_for('settings'))
 
@@ -663,6 +732,7 @@ def change_password():
         if request.form.get('new_password') == request.form.get('confirm_password'):
             current_user.password = generate_password_hash(request.form.get('new_password'))
             db.session.commit()
+            user_cache.invalidate(current_user.id, user_cache.USER)
             flash('Password changed successfully', 'success')
         else:
             flash('New passwords do not match', 'danger')
@@ -673,12 +743,13 @@ def change_password():
 @app.route('/update_modules', methods=['POST'])
 @login_required
 def update_modules():
-    user_preferences = UserPreferences.query.filter_by(user_id=current_user.id).first()
+    user_preferences = user_cache.get_preferences(current_user.id)
     if not user_preferences:
         user_preferences = UserPreferences(user_id=current_user.id)
         db.session.add(user_preferences)
     user_preferences.modules = request.form.getlist('modules')
     db.session.commit()
+    user_cache.invalidate(current_user.id, user_cache.PREFERENCES)
     flash('Module preferences updated successfully', 'success')
     return redirect(url_for('settings'))
 
@@ -686,11 +757,10 @@ def update_modules():
 def utility_processor():
     def get_user_preferences():
         if current_user.is_authenticated:
-            prefs = UserPreferences.query.filter_by(user_id=current_user.id).first()
+            prefs = user_cache.get_preferences(current_user.id)
             if not prefs:
-                prefs = UserPreferences(user_id=current_user.id)
-                db.session.add(prefs)
-                db.session.commit()
+                # Unsaved defaults; /update_modules creates the row
+                prefs = UserPreferences(user_id=current_user.id, modules=[], email_notifications=True)
             return prefs
         return None
     return dict(user_preferences=get_user_preferences())
@@ -699,22 +769,27 @@ def utility_processor():
 @login_required
 def cash_overview():
     # Get or create initial balance for the current user
-    initial_balance = InitialBalance.query.filter_by(user_id=current_user.id).first()
+    initial_balance = user_cache.get_initial_balance(current_user.id)
     if not initial_balance:
         initial_balance = InitialBalance(user_id=current_user.id, balance=0)
         db.session.add(initial_balance)
         db.session.commit()
+        user_cache.invalidate(current_user.id, user_cache.INITIAL_BALANCE)
 
-    # Get all transactions for the current user
-    transactions = Transaction.query.filter_by(user_id=current_user.id).all()
-    
-    # Calculate totals
-    total_cfo, total_cfi, total_cff = calculate_totals(transactions)
+    summary = ledger.get_summary(current_user.id)
+    total_cfo, total_cfi, total_cff = summary.total_cfo, summary.total_cfi, summary.total_cff
     balance = initial_balance.balance + total_cfo + total_cfi + total_cff
 
-    # Calculate burn rate and runway
-    burn_rate = calculate_burn_rate(transactions)
+    # Calculate burn rate (average monthly outflow over the last three months) and runway
+    burn_rate = 0
+    if summary.last_date:
+        burn_rate = aggregates.outflow_total(
+            current_user.id,
+            start_date=summary.last_date - timedelta(days=BURN_RATE_MONTHS * 30)
+        ) / BURN_RATE_MONTHS
     runway_months = calculate_runway(balance, burn_rate)
+    simulation = runway.simulate_user(current_user.id, balance,
+                                      months=app.config['RUNWAY_MONTHS'], paths=app.config['RUNWAY_PATHS'])
 
     return render_template('cash_overview.html', 
                          initial_balance=initial_balance.balance,
@@ -723,19 +798,84 @@ def cash_overview():
                          total_cff=total_cff, 
                          balance=balance,
                          burn_rate=burn_rate,
-                         runway_months=runway_months)
+                         runway_months=runway_months,
+                         simulation=simulation)
+
+@app.route('/runway-simulation', methods=['GET'])
+@login_required
+def runway_simulation():
+    # Optional ?months=&paths=&method=bootstrap|normal&seed= (seed makes the result reproducible)
+    try:
+        months = int(request.args.get('months') or app.config['RUNWAY_MONTHS'])
+        paths = int(request.args.get('paths') or app.config['RUNWAY_PATHS'])
+        seed = int(request.args['seed']) if request.args.get('seed') else None
+    except ValueError:
+        return jsonify({'error': 'months, paths and seed must be whole numbers'}), 400
+    method = request.args.get('method') or 'bootstrap'
+    if method not in runway.METHODS:
+        return jsonify({'error': f"method must be one of {', '.join(runway.METHODS)}"}), 400
+    if not 1 <= months <= 120:
+        return jsonify({'error': 'months must be between 1 and 120'}), 400
+    if not 1 <= paths <= app.config['RUNWAY_MAX_PATHS']:
+        return jsonify({'error': f"paths must be between 1 and {app.config['RUNWAY_MAX_PATHS']}"}), 400
+
+    summary = ledger.get_summary(current_user.id)
+    balance = (user_cache.initial_balance_amount(current_user.id)
+               + summary.total_cfo + summary.total_cfi + summary.total_cff)
+    simulation = runway.simulate_user(current_user.id, balance, months=months, paths=paths,
+                                      method=method, seed=seed)
+    if simulation is None:
+        return jsonify({'error': 'No transactions found'}), 400
+    return jsonify({'success': True, 'simulation': runway.to_dict(simulation)})
 
 @app.route('/cash-activities')
 @login_required
 def cash_activities():
-    page = request.args.get('page', 1, type=int)
     per_page = 8
     
     # Get paginated transactions for the current user
-    paginated_transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date.desc()).paginate(page=page, per_page=per_page)
+    try:
+        paginated_transactions = paginate_transactions(
+            current_user.id, per_page,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            total=ledger.get_summary(current_user.id).transaction_count
+        )
+    except ValueError:
+        return redirect(url_for('cash_activities'))
     
     return render_template('cash_activities.html', transactions=paginated_transactions)
 
+@app.route('/transactions', methods=['GET'])
+@login_required
+def list_transactions():
+    try:
+        per_page = min(request.args.get('limit', 50, type=int), MAX_PAGE_SIZE)
+        total = None
+        if request.args.get('total', type=int):
+            total = ledger.get_summary(current_user.id).transaction_count
+        page = paginate_transactions(
+            current_user.id, per_page,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            total=total
+        )
+        return jsonify({
+            'success': True,
+            'transactions': [{
+                'id': t.id,
+                'date': t.date.isoformat(),
+                'description': t.description,
+                'amount': t.amount,
+                'type': t.type
+            } for t in page.items],
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+            'total': page.total
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 @app.route('/ai-analysis')
 @login_required
 def ai_analysis():
@@ -747,12 +887,12 @@ def create_transaction():
     try:
         new_transaction = Transaction(
             user_id=current_user.id,
-            date=request.form.get('date'),
+            date=parse_date(request.form.get('date')),
             description=request.form.get('description'),
             amount=float(request.form.get('amount')),
             type=request.form.get('type')
         )
-        db.session.add(new_transaction)
+        ledger.add_transaction(new_transaction)
         db.session.commit()
         flash('Transaction added successfully', 'success')
     except Exception as e:
@@ -765,19 +905,10 @@ def create_transaction():
 @login_required
 def monthly_income_expense():
     try:
-        transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date).all()
         monthly_data = {}
 
-        for transaction in transactions:
-            month = transaction.date.strftime('%Y-%m') if isinstance(transaction.date, datetime) else datetime.strptime(transaction.date, '%Y-%m-%d').strftime('%Y-%m')
-            
-            if month not in monthly_data:
-                monthly_data[month] = {'income': 0, 'expense': 0}
-            
-            if transaction.amount > 0:
-                monthly_data[month]['income'] += transaction.amount
-            else:
-                monthly_data[month]['expense'] += abs(transaction.amount)
+        for month, inflow, outflow in ledger.monthly_totals(current_user.id):
+            monthly_data[month] = {'income': inflow, 'expense': outflow}
 
         return jsonify({
             'success': True,
@@ -794,18 +925,7 @@ def monthly_income_expense():
 @login_required
 def cashout_categories():
     try:
-        # Fix the filter syntax for negative amounts
-        transactions = Transaction.query.filter(
-            Transaction.user_id == current_user.id,
-            Transaction.amount < 0  # Correct syntax for filtering negative amounts
-        ).all()
-
-        categories_data = {}
-        for transaction in transactions:
-            category = transaction.type
-            if category not in categories_data:
-                categories_data[category] = 0
-            categories_data[category] += abs(transaction.amount)
+        categories_data = dict(ledger.outflow_by_type(current_user.id))
 
         return jsonify({
             'success': True,
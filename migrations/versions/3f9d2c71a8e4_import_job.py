@@ -0,0 +1,46 @@
+"""Add import_job for background upload imports
+
+Revision ID: 3f9d2c71a8e4
+Revises: abcc84cf7f61
+Create Date: 2026-10-18 14:02:11.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9d2c71a8e4'
+down_revision = 'abcc84cf7f61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # main.py runs db.create_all() on import, so the table may already be there
+    if sa.inspect(op.get_bind()).has_table('import_job'):
+        return
+    op.create_table(
+        'import_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('upload_path', sa.String(length=500), nullable=True),
+        sa.Column('state', sa.String(length=10), nullable=False),
+        sa.Column('rows_read', sa.Integer(), nullable=False),
+        sa.Column('rows_imported', sa.Integer(), nullable=False),
+        sa.Column('rows_skipped', sa.Integer(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_import_job_user'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_import_job_user_id', 'import_job', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_import_job_user_id', table_name='import_job')
+    op.drop_table('import_job')
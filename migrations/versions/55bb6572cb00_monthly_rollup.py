@@ -0,0 +1,53 @@
+"""Add monthly_rollup of per-user, per-month, per-type inflow/outflow
+
+Revision ID: 55bb6572cb00
+Revises: 9eb8429181d2
+Create Date: 2026-10-18 10:41:09.204116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '55bb6572cb00'
+down_revision = '9eb8429181d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # main.py runs db.create_all() on import, so the table may already be there
+    if not sa.inspect(bind).has_table('monthly_rollup'):
+        op.create_table(
+            'monthly_rollup',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('month', sa.String(length=7), nullable=False),
+            sa.Column('type', sa.String(length=10), nullable=False),
+            sa.Column('inflow', sa.Float(), nullable=False),
+            sa.Column('outflow', sa.Float(), nullable=False),
+            sa.Column('inflow_count', sa.Integer(), nullable=False),
+            sa.Column('outflow_count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_monthly_rollup_user'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'month', 'type', name='uq_monthly_rollup_user_month_type'),
+        )
+
+    # Backfill existing history; summaries built before this revision have no rollups yet
+    if bind.execute(sa.text('SELECT COUNT(*) FROM monthly_rollup')).scalar() == 0:
+        op.execute("""
+            INSERT INTO monthly_rollup (user_id, month, type, inflow, outflow, inflow_count, outflow_count)
+            SELECT user_id, strftime('%Y-%m', date), type,
+                   SUM(CASE WHEN amount > 0 THEN amount ELSE 0.0 END),
+                   SUM(CASE WHEN amount > 0 THEN 0.0 ELSE -amount END),
+                   SUM(CASE WHEN amount > 0 THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN amount > 0 THEN 0 ELSE 1 END)
+            FROM "transaction"
+            GROUP BY user_id, strftime('%Y-%m', date), type
+        """)
+
+
+def downgrade():
+    op.drop_table('monthly_rollup')
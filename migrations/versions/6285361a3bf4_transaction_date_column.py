@@ -0,0 +1,93 @@
+"""Store transaction.date as DATE and index (user_id, date) / (user_id, type)
+
+Revision ID: 6285361a3bf4
+Revises:
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6285361a3bf4'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Formats seen in rows written before dates were normalised on input
+LEGACY_DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S')
+
+transaction_table = sa.table(
+    'transaction',
+    sa.column('id', sa.Integer),
+    sa.column('date', sa.String),
+    sa.column('date_value', sa.String),
+)
+
+
+def _normalise(value):
+    for fmt in LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _existing_indexes(bind):
+    return {index['name'] for index in sa.inspect(bind).get_indexes('transaction')}
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Changing the type in place makes the SQLite batch copy CAST the text to
+    # NUMERIC ('2024-02-05' -> 2024), so the ISO values are written to a new
+    # DATE column first and swapped in afterwards.
+    op.add_column('transaction', sa.Column('date_value', sa.Date(), nullable=True))
+
+    rows = bind.execute(sa.select(transaction_table.c.id, transaction_table.c.date)).fetchall()
+    unparseable = []
+    for row_id, value in rows:
+        normalised = _normalise(str(value))
+        if normalised is None:
+            unparseable.append(row_id)
+            continue
+        bind.execute(
+            transaction_table.update()
+            .where(transaction_table.c.id == row_id)
+            .values(date_value=normalised)
+        )
+    if unparseable:
+        raise RuntimeError(f"Cannot convert transaction.date for ids {unparseable}; fix these rows and rerun")
+
+    # A fresh database may already carry the indexes from db.create_all()
+    existing = _existing_indexes(bind)
+    for name in ('ix_transaction_user_date', 'ix_transaction_user_type'):
+        if name in existing:
+            op.drop_index(name, table_name='transaction')
+
+    with op.batch_alter_table('transaction') as batch_op:
+        batch_op.drop_column('date')
+
+    with op.batch_alter_table('transaction') as batch_op:
+        batch_op.alter_column('date_value',
+                              new_column_name='date',
+                              existing_type=sa.Date(),
+                              nullable=False)
+
+    op.create_index('ix_transaction_user_date', 'transaction', ['user_id', 'date'])
+    op.create_index('ix_transaction_user_type', 'transaction', ['user_id', 'type'])
+
+
+def downgrade():
+    op.drop_index('ix_transaction_user_type', table_name='transaction')
+    op.drop_index('ix_transaction_user_date', table_name='transaction')
+    with op.batch_alter_table('transaction') as batch_op:
+        batch_op.alter_column('date',
+                              existing_type=sa.Date(),
+                              type_=sa.String(length=10),
+                              existing_nullable=False)
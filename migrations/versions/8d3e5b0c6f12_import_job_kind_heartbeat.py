@@ -0,0 +1,32 @@
+"""Add import_job.kind and import_job.updated_at for review jobs and orphan expiry
+
+Revision ID: 8d3e5b0c6f12
+Revises: e7a2f4c9b318
+Create Date: 2026-10-18 18:41:37.905214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3e5b0c6f12'
+down_revision = 'e7a2f4c9b318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # main.py runs db.create_all() on import, so a fresh table may already have the columns
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('import_job')}
+    if 'kind' not in columns:
+        op.add_column('import_job', sa.Column('kind', sa.String(length=10), nullable=False, server_default='import'))
+    if 'updated_at' not in columns:
+        # Left empty: jobs from before the upgrade count as orphaned
+        op.add_column('import_job', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('import_job') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('kind')
@@ -0,0 +1,41 @@
+"""Add ledger_summary with per-user running totals
+
+Revision ID: 9eb8429181d2
+Revises: 6285361a3bf4
+Create Date: 2026-10-18 10:03:27.540911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9eb8429181d2'
+down_revision = '6285361a3bf4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # main.py runs db.create_all() on import, so the table may already be there
+    if sa.inspect(op.get_bind()).has_table('ledger_summary'):
+        return
+    op.create_table(
+        'ledger_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_cfo', sa.Float(), nullable=False),
+        sa.Column('total_cfi', sa.Float(), nullable=False),
+        sa.Column('total_cff', sa.Float(), nullable=False),
+        sa.Column('transaction_count', sa.Integer(), nullable=False),
+        sa.Column('first_date', sa.Date(), nullable=True),
+        sa.Column('last_date', sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_ledger_summary_user'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id'),
+    )
+    # Summaries are built lazily on first access; `flask ledger rebuild` fills them eagerly
+
+
+def downgrade():
+    op.drop_table('ledger_summary')
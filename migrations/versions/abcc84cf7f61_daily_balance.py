@@ -0,0 +1,60 @@
+"""Add daily_balance prefix sums for as-of-date balance lookups
+
+Revision ID: abcc84cf7f61
+Revises: 55bb6572cb00
+Create Date: 2026-10-18 11:26:52.377410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'abcc84cf7f61'
+down_revision = '55bb6572cb00'
+branch_labels = None
+depends_on = None
+
+# Types counted towards the balance (CFO + CFI + CFF as of this revision)
+ACTIVITY_TYPES = (
+    "Cash-customer", "Salary-suppliers", "Income-tax", "Other-cfo",
+    "Buy-property-equipments", "Sell-property-equipments", "Buy-investment", "Sell-investment", "Other-cfi",
+    "Issue-shares", "borrowings", "Repay-borrowings", "Pay-dividends", "Interest-paid", "Other-cff",
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    # main.py runs db.create_all() on import, so the table may already be there
+    if not sa.inspect(bind).has_table('daily_balance'):
+        op.create_table(
+            'daily_balance',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('net', sa.Float(), nullable=False),
+            sa.Column('transaction_count', sa.Integer(), nullable=False),
+            sa.Column('cumulative', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_daily_balance_user'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'day', name='uq_daily_balance_user_day'),
+        )
+
+    if bind.execute(sa.text('SELECT COUNT(*) FROM daily_balance')).scalar() == 0:
+        types = ', '.join(f"'{t}'" for t in ACTIVITY_TYPES)
+        op.execute(f"""
+            INSERT INTO daily_balance (user_id, day, net, transaction_count, cumulative)
+            SELECT user_id, day, net, transaction_count,
+                   SUM(net) OVER (PARTITION BY user_id ORDER BY day)
+            FROM (
+                SELECT user_id, date AS day,
+                       SUM(CASE WHEN type IN ({types}) THEN amount ELSE 0.0 END) AS net,
+                       COUNT(id) AS transaction_count
+                FROM "transaction"
+                GROUP BY user_id, date
+            )
+        """)
+
+
+def downgrade():
+    op.drop_table('daily_balance')
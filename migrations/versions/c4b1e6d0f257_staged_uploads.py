@@ -0,0 +1,57 @@
+"""Add staged_upload and staged_row for server-side upload review
+
+Revision ID: c4b1e6d0f257
+Revises: 3f9d2c71a8e4
+Create Date: 2026-10-18 14:31:40.227615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4b1e6d0f257'
+down_revision = '3f9d2c71a8e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # main.py runs db.create_all() on import, so the tables may already be there
+    if not inspector.has_table('staged_upload'):
+        op.create_table(
+            'staged_upload',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('token', sa.String(length=32), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('row_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_staged_upload_user'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('token'),
+        )
+        op.create_index('ix_staged_upload_expires_at', 'staged_upload', ['expires_at'])
+
+    if not inspector.has_table('staged_row'):
+        op.create_table(
+            'staged_row',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('upload_id', sa.Integer(), nullable=False),
+            sa.Column('row_index', sa.Integer(), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('description', sa.String(length=100), nullable=False),
+            sa.Column('amount', sa.Float(), nullable=False),
+            sa.Column('type', sa.String(length=10), nullable=False),
+            sa.ForeignKeyConstraint(['upload_id'], ['staged_upload.id'], name='fk_staged_row_upload', ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('upload_id', 'row_index', name='uq_staged_row_upload_index'),
+        )
+
+
+def downgrade():
+    op.drop_table('staged_row')
+    op.drop_index('ix_staged_upload_expires_at', table_name='staged_upload')
+    op.drop_table('staged_upload')
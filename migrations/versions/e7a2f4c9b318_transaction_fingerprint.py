@@ -0,0 +1,41 @@
+"""Add transaction.fingerprint and staged_row.base_fingerprint for import dedupe
+
+Revision ID: e7a2f4c9b318
+Revises: c4b1e6d0f257
+Create Date: 2026-10-18 16:05:12.480391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a2f4c9b318'
+down_revision = 'c4b1e6d0f257'
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table):
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # main.py runs db.create_all() on import, so a fresh table may already have the columns
+    if 'fingerprint' not in _columns(inspector, 'transaction'):
+        op.add_column('transaction', sa.Column('fingerprint', sa.String(length=40), nullable=True))
+    if 'ix_transaction_fingerprint' not in {index['name'] for index in inspector.get_indexes('transaction')}:
+        op.create_index('ix_transaction_fingerprint', 'transaction', ['fingerprint'], unique=True)
+
+    if 'base_fingerprint' not in _columns(inspector, 'staged_row'):
+        op.add_column('staged_row', sa.Column('base_fingerprint', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('staged_row') as batch_op:
+        batch_op.drop_column('base_fingerprint')
+
+    op.drop_index('ix_transaction_fingerprint', table_name='transaction')
+    with op.batch_alter_table('transaction') as batch_op:
+        batch_op.drop_column('fingerprint')
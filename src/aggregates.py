@@ -0,0 +1,108 @@
+"""
+Aggregations computed in the database.
+
+Totals are produced with GROUP BY type (optionally by period) and mapped to
+CFO/CFI/CFF through src.categories, so aggregate paths never load
+Transaction objects.
+"""
+from collections import namedtuple
+from itertools import groupby
+from operator import attrgetter
+
+from sqlalchemy import Integer, String, cast, func
+
+from src.categories import ACTIVITIES, TYPE_ACTIVITY
+from src.models import db, Transaction
+
+PERIODS = ('day', 'month', 'quarter', 'year')
+
+TypeTotal = namedtuple('TypeTotal', ['period', 'type', 'total', 'count', 'first_date', 'last_date'])
+
+
+def period_key(period, column=Transaction.date):
+    """SQL expression naming the period a date falls in: '2024-03-05', '2024-03', '2024-Q1' or '2024'."""
+    if period == 'day':
+        return func.strftime('%Y-%m-%d', column)
+    if period == 'month':
+        return func.strftime('%Y-%m', column)
+    if period == 'quarter':
+        quarter = (cast(func.strftime('%m', column), Integer) + 2) // 3
+        return func.strftime('%Y-Q', column).concat(cast(quarter, String))
+    if period == 'year':
+        return func.strftime('%Y', column)
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def totals_by_type(user_id, start_date=None, end_date=None, period=None):
+    """
+    Sum a user's transactions per type, optionally per period.
+
+    Args:
+        user_id: owner of the transactions
+        start_date, end_date: optional inclusive date bounds
+        period: None or one of PERIODS
+
+    Returns:
+        list of TypeTotal ordered by period and type (period is None when
+        not grouping by period)
+    """
+    key = period_key(period) if period is not None else None
+    columns = [
+        Transaction.type,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id),
+        func.min(Transaction.date),
+        func.max(Transaction.date),
+    ]
+    group_by = [Transaction.type]
+    if key is not None:
+        columns.insert(0, key)
+        group_by.insert(0, key)
+
+    query = db.session.query(*columns).filter(Transaction.user_id == user_id)
+    if start_date is not None:
+        query = query.filter(Transaction.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Transaction.date <= end_date)
+    rows = query.group_by(*group_by).order_by(*group_by).all()
+
+    if key is None:
+        return [TypeTotal(None, *row) for row in rows]
+    return [TypeTotal(*row) for row in rows]
+
+
+def by_activity(type_totals):
+    """{'CFO': x, 'CFI': y, 'CFF': z} of TypeTotal rows; uncategorised types add nothing."""
+    totals = dict.fromkeys(ACTIVITIES, 0.0)
+    for row in type_totals:
+        activity = TYPE_ACTIVITY.get(row.type)
+        if activity:
+            totals[activity] += row.total
+    return totals
+
+
+def activity_totals(user_id, start_date=None, end_date=None, period=None):
+    """
+    Sum a user's transactions per cash-flow activity.
+
+    Returns:
+        {'CFO': x, 'CFI': y, 'CFF': z}, or {period: {...}} oldest first when
+        period is given (periods without transactions are left out)
+    """
+    rows = totals_by_type(user_id, start_date, end_date, period)
+    if period is None:
+        return by_activity(rows)
+    return {key: by_activity(group) for key, group in groupby(rows, key=attrgetter('period'))}
+
+
+def outflow_total(user_id, start_date=None, end_date=None):
+    """Sum of negative amounts (as a positive number) within optional date bounds."""
+    query = db.session.query(func.coalesce(func.sum(Transaction.amount), 0.0)).filter(
+        Transaction.user_id == user_id,
+        Transaction.amount < 0,
+    )
+    if start_date is not None:
+        query = query.filter(Transaction.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Transaction.date <= end_date)
+    return abs(query.scalar())
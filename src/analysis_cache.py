@@ -0,0 +1,149 @@
+"""
+Persistent, content-addressed cache of AI analysis results.
+
+A model call costs seconds and money, but its answer depends only on the
+prompt, and the prompt only on the user's numbers. So results are stored
+under a fingerprint of the model name and the prompt inputs, and a repeat
+view of unchanged data is a single SQLite lookup.
+
+The cache lives in its own SQLite file (ANALYSIS_CACHE_PATH) rather than the
+ledger database: it is disposable, needs no migrations, and is shared by
+every worker process, unlike the per-process user_cache. Entries expire
+after ANALYSIS_CACHE_TTL seconds, and past ANALYSIS_CACHE_SIZE entries the
+least recently used are evicted (size 0 disables the cache). Hit and miss
+counters are kept in the same file. The file also hands each prompt from
+/forecast to /forecast/stream (keys starting 'prompt:'), since the two
+requests may reach different workers.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_analysis_cache_accessed_at ON analysis_cache (accessed_at);
+CREATE TABLE IF NOT EXISTS analysis_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def fingerprint(model, inputs):
+    """Stable key for a model and JSON-serialisable prompt inputs (dict key order does not matter)."""
+    payload = json.dumps({'model': model, 'inputs': inputs}, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """SQLite-backed LRU with a TTL, storing JSON values."""
+
+    def __init__(self, path, ttl=86400, maxsize=1000):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections must not cross threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, connection, name):
+        connection.execute(
+            "INSERT INTO analysis_cache_stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key, count=True):
+        """The cached value, or None on a miss (including an expired entry); count=False keeps it out of stats()."""
+        if not self.enabled:
+            return None
+        connection = self._connect()
+        now = time.time()
+        row = connection.execute(
+            "SELECT value FROM analysis_cache WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            if count:
+                self._count(connection, 'misses')
+            return None
+        connection.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        if count:
+            self._count(connection, 'hits')
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a value, then drop expired entries and the least recently used past maxsize."""
+        if not self.enabled:
+            return
+        connection = self._connect()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            connection.execute("DELETE FROM analysis_cache WHERE created_at <= ?", (now - self.ttl,))
+            connection.execute(
+                "DELETE FROM analysis_cache WHERE key IN ("
+                "SELECT key FROM analysis_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def stats(self):
+        """{'entries', 'hits', 'misses', 'hit_rate'}"""
+        connection = self._connect()
+        counters = dict(connection.execute("SELECT name, value FROM analysis_cache_stats"))
+        entries = connection.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'entries': entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def clear(self, reset_stats=False):
+        """Delete every entry (and the counters when reset_stats); returns the number of entries removed."""
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            removed = connection.execute("DELETE FROM analysis_cache").rowcount
+            if reset_stats:
+                connection.execute("DELETE FROM analysis_cache_stats")
+        return removed
+
+
+shared = None
+
+
+def init_app(app):
+    """Open the shared cache at ANALYSIS_CACHE_PATH, sized by ANALYSIS_CACHE_TTL / ANALYSIS_CACHE_SIZE."""
+    global shared
+    shared = AnalysisCache(
+        app.config['ANALYSIS_CACHE_PATH'],
+        ttl=app.config['ANALYSIS_CACHE_TTL'],
+        maxsize=app.config['ANALYSIS_CACHE_SIZE'],
+    )
@@ -3,34 +3,60 @@ from flask import current_app
 import json
 import ast
 from datetime import datetime,timedelta
+import time
 import numpy as np
-from scipy import stats
+
+from src import analysis_cache, forecasting, seasonality
 
 class FinancialAnalytics:
-    def __init__(self, api_key):
-        self.anthropic = Anthropic(api_key=api_key)
+    MODEL = "claude-3-5-sonnet-20241022"
+    MAX_TOKENS = 2000
+
+    def __init__(self, api_key, cache=None, timeout=None):
+        # timeout: seconds per API request (connect and between reads); the SDK default when None.
+        # No retries: a retried call would outlive the deadline the caller reported to the user.
+        options = {'timeout': timeout} if timeout else {}
+        self.anthropic = Anthropic(api_key=api_key, max_retries=0, **options)
+        # Optional src.analysis_cache.AnalysisCache for model responses
+        self.cache = cache
         self.seasonal_periods = 12 # Monthly seasonality
+        # Decompositions from the last analyze_patterns call, reused by generate_forecasts
+        self.components = None
+
+    def decompose(self, transaction_history):
+        """
+        Monthly (calendar seasons) and daily (weekday seasons) decompositions of net cash flow.
+
+        transaction_history is [{'date', 'amount'}]: single transactions, or one net amount per day.
+        """
+        dates = np.array([t['date'] for t in transaction_history], dtype='datetime64[D]')
+        amounts = np.array([t['amount'] for t in transaction_history], dtype=float)
+        self.components = {
+            'monthly': seasonality.decompose_transactions(dates, amounts, 'M', self.seasonal_periods),
+            'daily': seasonality.decompose_transactions(dates, amounts, 'D'),
+        }
+        return self.components
 
     def analyze_patterns(self, transaction_history):
         """Analyze transaction patterns and seasonality"""
-        amounts = [t['amount'] for t in transaction_history]
-        dates = [datetime.strptime(t['date'], '%Y-%m-%d') for t in transaction_history]
+        components = self.decompose(transaction_history)
+        monthly, daily = components['monthly'], components['daily']
 
-        #Detect seasonality
-        if len(amounts) >= self.seasonal_periods * 2:
-            seasonal_decomposition = stats.seasonal_decompose(amounts, period=self.seasonal_periods)
-            seasonal_pattern = seasonal_decomposition.seasonal.tolist()
+        # Straight line through daily net cash flow: [slope per day, intercept at the first day]
+        if daily.observed.size >= 2:
+            trend = np.polyfit(np.arange(daily.observed.size), daily.observed, 1).tolist()
         else:
-            seasonal_pattern = []
+            trend = [0.0, float(daily.observed.mean()) if daily.observed.size else 0.0]
 
         return {
-            'seasonal_pattern': seasonal_pattern,
-            'trend': np.polyfit(range(len(amounts)), amounts, 1).tolist(),
-            'volatility': np.std(amounts)
+            # Average deviation per calendar month, January first; empty with under two years of history
+            'seasonal_pattern': monthly.seasonal_indices.tolist(),
+            'trend': trend,
+            'volatility': float(np.std(monthly.observed)) if monthly.observed.size else 0.0
         }
     
-    def calculate_risk_metrics(self, cash_flows, working_capital):
-        """Calculate various risk metrics"""
+    def calculate_risk_metrics(self, cash_flows, working_capital, simulation=None):
+        """Calculate various risk metrics; the runway is the median of a src.runway simulation when given"""
         # Avoid division by zero for liquidity ratio
         current_liabilities = working_capital['current_liabilities']
         liquidity_ratio = (working_capital['current_assets'] / current_liabilities 
@@ -40,32 +66,26 @@ class FinancialAnalytics:
         negative_flows = [cf for cf in cash_flows if cf < 0]
         burn_rate = float(abs(sum(negative_flows)) / len(cash_flows)) if negative_flows else 0
         
-        # Avoid division by zero for runway months
-        min_cash_flow = min(cash_flows) if cash_flows else 0
-        runway_months = (working_capital['cash'] / abs(min_cash_flow) 
-                        if min_cash_flow < 0 else 999.99)
-        
+        # Median months until cash runs out; None when most paths outlast the simulation
+        runway_months = None
+        if simulation is not None and np.isfinite(simulation.runway_median):
+            runway_months = float(simulation.runway_median)
+
         return {
             'liquidity_ratio': float(liquidity_ratio),
             'cash_flow_volatility': float(np.std(cash_flows) if cash_flows else 0),
             'burn_rate': float(burn_rate),
-            'runway_months': float(runway_months)
+            'runway_months': runway_months
         }
 
-    def generate_advanced_financial_analysis(self, initial_balance, current_balance, transaction_history, working_capital):
-        patterns = self.analyze_patterns(transaction_history)
-        risk_metrics = self.calculate_risk_metrics(
-            [t['amount'] for t in transaction_history],
-            working_capital
-        )
-
-        prompt = f"""As a financial analyst, provide a concise analysis of the following financial data:
+    def build_prompt(self, initial_balance, current_balance, patterns, risk_metrics, horizon=forecasting.DEFAULT_HORIZON):
+        return f"""As a financial analyst, provide a concise analysis of the following financial data:
 
         Financial Metrics:
         - Initial Balance: ${initial_balance}
         - Current Balance: ${current_balance}
         - Liquidity Ratio: {risk_metrics['liquidity_ratio']:.2f}
-        - Cash Runway: {risk_metrics['runway_months']:.2f} months
+        - Cash Runway (median of simulated paths): {self._runway_text(risk_metrics['runway_months'])}
 
         Pattern Analysis:
         - Seasonal Pattern: {patterns['seasonal_pattern']}
@@ -77,185 +97,107 @@ class FinancialAnalytics:
         2. Risk Assessment (evaluate liquidity and cash flow risks)
         3. Seasonal Trends (analyze monthly/quarterly patterns)
         4. Working Capital Optimization (suggest improvements)
-        5. 90-day Forecast (based on historical patterns)
+        5. {horizon}-day Forecast (based on historical patterns)
 
         Format the response with clear sections and actionable insights."""
 
-        try:
-            message = self.anthropic.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            analysis_result = {
-                'ai_analysis': message.content[0].text,
-                'patterns': patterns,
-                'risk_metrics': risk_metrics,
-                'forecasts': self.generate_forecasts(transaction_history, patterns)
-            }
-            return analysis_result
-        except Exception as e:
-            current_app.logger.error(f"Analysis failed: {str(e)}")
-            import traceback
-            current_app.logger.error(f"Traceback: {traceback.format_exc()}")
-            raise
-    
-    def generate_forecasts(self, transaction_history, patterns):
-        """Generate detailed forecasts using pattern analysis"""
-        recent_transactions = transaction_history[-90:]  # Last 90 days
-        trend = patterns['trend']
-        seasonal_pattern = patterns['seasonal_pattern']
-        
-        forecasts = {
-            '30_days': [],
-            '60_days': [],
-            '90_days': []
-        }
-        
-        # Calculate base trend
-        slope, intercept = trend
-        
-        # Generate daily forecasts for next 90 days
-        for day in range(90):
-            # Calculate trend component
-            trend_value = slope * (len(recent_transactions) + day) + intercept
-            
-            # Add seasonal component if available
-            seasonal_value = 0
-            if seasonal_pattern:
-                seasonal_idx = day % len(seasonal_pattern)
-                seasonal_value = seasonal_pattern[seasonal_idx]
-            
-            # Combine trend and seasonality
-            forecast_value = trend_value + seasonal_value
-            
-            # Add to appropriate forecast period
-            if day < 30:
-                forecasts['30_days'].append(forecast_value)
-            if day < 60:
-                forecasts['60_days'].append(forecast_value)
-            forecasts['90_days'].append(forecast_value)
-        
-        return forecasts
+    @staticmethod
+    def _runway_text(runway_months):
+        return 'beyond the simulated horizon' if runway_months is None else f'{runway_months:.0f} months'
 
-    def generate_cashflow_statement(self, initial_balance, start_date, end_date, transaction_data):
-        """Generate a cash flow statement with strict categorization and proper financial reporting structure."""
-        # Parse transaction data into a structured format
-        transactions = []
-        for line in transaction_data.split('\n'):
-            if line.strip():
-                parts = line.split(', ')
-                transaction = {}
-                for part in parts:
-                    key, value = part.split(': ', 1)
-                    transaction[key.lower()] = value
-                transactions.append(transaction)
+    def analyze(self, initial_balance, current_balance, transaction_history, monthly_flows, working_capital,
+                simulation=None, forecast_model='holt_winters_add',
+                horizon=forecasting.DEFAULT_HORIZON, level=forecasting.DEFAULT_LEVEL):
+        """
+        The numeric analysis, plus the prompt for the narrative and its cache key; no model call.
 
-        # Define the categorization structure exactly matching utils.py
-        categories = {
-            'CFO': {
-                'types': ["Cash-customer", "Salary-suppliers", "Income-tax", "Other-cfo"],
-                'items': []
-            },
-            'CFI': {
-                'types': ["Buy-property-equipments", "Sell-property-equipments", "Buy-investment", "Sell-investment", "Other-cfi"],
-                'items': []
-            },
-            'CFF': {
-                'types': ["Issue-shares", "borrowings", "Repay-borrowings", "Pay-dividends", "Interest-paid", "Other-cff"],
-                'items': []
-            }
+        Patterns and forecasts come from transaction_history (see decompose), burn rate and
+        volatility from monthly_flows, the net cash flow of each month.
+        """
+        patterns = self.analyze_patterns(transaction_history)
+        risk_metrics = self.calculate_risk_metrics(
+            [float(flow) for flow in monthly_flows],
+            working_capital,
+            simulation
+        )
+        prompt = self.build_prompt(initial_balance, current_balance, patterns, risk_metrics, horizon)
+        return {
+            'patterns': patterns,
+            'risk_metrics': risk_metrics,
+            'forecasts': self.generate_forecasts(transaction_history, forecast_model, horizon, level),
+            'prompt': prompt,
+            # The prompt embeds every input (metrics, patterns, horizon), so it plus the model is the cache key
+            'cache_key': analysis_cache.fingerprint(self.MODEL, {'prompt': prompt, 'max_tokens': self.MAX_TOKENS})
         }
 
-        # Categorize transactions strictly by type
-        for t in transactions:
-            t_type = t['type']
-            t_amount = float(t['amount'])
-            t_date = t['date']
-            t_desc = t['description']
-
-            for category, info in categories.items():
-                if t_type in info['types']:
-                    info['items'].append({
-                        'type': t_type,
-                        'amount': t_amount,
-                        'date': t_date,
-                        'description': t_desc
-                    })
-
-        # Calculate totals
-        statement_data = []
-        category_totals = {'CFO': 0, 'CFI': 0, 'CFF': 0}
-
-        # Process each category
-        for category, info in categories.items():
-            # Group transactions by type within each category
-            type_totals = {}
-            for item in info['items']:
-                t_type = item['type']
-                if t_type not in type_totals:
-                    type_totals[t_type] = 0
-                type_totals[t_type] += item['amount']
-
-            # Add each type's total to the statement
-            for t_type, total in type_totals.items():
-                statement_data.append({
-                    'Category': category,
-                    'Subcategory': t_type,
-                    'Amount': total
-                })
-                category_totals[category] += total
-
-        # Calculate final totals
-        total_net_cash_flow = sum(category_totals.values())
-        ending_balance = initial_balance + total_net_cash_flow
-
-        return statement_data, ending_balance
-
-def parse_response(response):
-    lines = response.strip().split('\n')
-    statement_data = []
-    totals = {}
-
-    for line in lines:
+    def cached_narrative(self, cache_key):
+        """A previously generated narrative for these inputs, or None"""
+        return self.cache.get(cache_key) if self.cache else None
+
+    def remember_prompt(self, cache_key, user_id, prompt):
+        """Keep a prompt under its cache key, so the stream request need not redo the analysis"""
+        if self.cache:
+            self.cache.set(self._prompt_key(cache_key), {'user_id': user_id, 'prompt': prompt})
+
+    def remembered_prompt(self, cache_key, user_id):
+        """The user's prompt kept by remember_prompt, or None"""
+        entry = self.cache.get(self._prompt_key(cache_key), count=False) if self.cache else None
+        if entry is None or entry['user_id'] != user_id:
+            return None
+        return entry['prompt']
+
+    @staticmethod
+    def _prompt_key(cache_key):
+        return f'prompt:{cache_key}'
+
+    def stream_narrative(self, prompt, cache_key, deadline=None, on_open=None):
+        """
+        Yield the narrative's text as the model produces it; the whole text is cached once it completes.
+
+        deadline: time.monotonic() value the call may not outlive; each read waits at most until then
+        on_open: called with a function that aborts the call from another thread, once the request is sent
+        """
+        options = {}
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError('No time left for the analysis')
+            options['timeout'] = remaining
+        parts = []
+        with self.anthropic.messages.stream(
+            model=self.MODEL,
+            max_tokens=self.MAX_TOKENS,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            **options
+        ) as stream:
+            if on_open:
+                on_open(stream.close)
+            for text in stream.text_stream:
+                parts.append(text)
+                yield text
+        if self.cache:
+            self.cache.set(cache_key, ''.join(parts))
+
+    def generate_forecasts(self, transaction_history, model='holt_winters_add',
+                           horizon=forecasting.DEFAULT_HORIZON, level=forecasting.DEFAULT_LEVEL):
+        """Forecast daily net cash flow with a src.forecasting model, falling back to simple smoothing when it cannot fit"""
+        components = self.components or self.decompose(transaction_history)
+        daily = components['daily']
         try:
-            if ':' not in line:
-                continue
-            
-            if line.count(':') == 2:  # This is a transaction line
-                category, subcategory_and_amount = line.split(':', 1)
-                subcategory, amount_str = subcategory_and_amount.rsplit(':', 1)
-                
-                category = category.strip()
-                subcategory = subcategory.strip()
-                amount = parse_amount(amount_str)
-                
-                statement_data.append({
-                    'Category': category,
-                    'Subcategory': subcategory,
-                    'Amount': amount
-                })
-            elif line.count(':') == 1:  # This is a total line
-                key, value_str = line.split(':')
-                key = key.strip()
-                value = parse_amount(value_str)
-                totals[key] = value
-        except Exception as e:
-            current_app.logger.warning(f"Error parsing line '{line}': {str(e)}")
+            result = forecasting.forecast(daily.index, daily.observed, model, horizon, level)
+        except ValueError:
+            # Too little history for the model (or a non-positive series for a multiplicative one)
+            if model == 'ses':
+                raise
+            result = forecasting.forecast(daily.index, daily.observed, 'ses', horizon, level)
 
-    if not statement_data:
-        current_app.logger.error("No valid statement data found in response")
-    if not totals:
-        current_app.logger.error("No valid totals found in response")
-
-    return statement_data, totals
-
-def parse_amount(amount_str):
-    try:
-        return float(amount_str.replace('$', '').replace(',', '').strip())
-    except ValueError:
-        current_app.logger.warning(f"Could not parse amount: {amount_str}")
-        return 0.0
\ No newline at end of file
+        return {
+            'model': result.model,
+            'level': result.level,
+            'dates': np.datetime_as_string(result.dates).tolist(),
+            'mean': result.mean.tolist(),
+            'lower': result.lower.tolist(),
+            'upper': result.upper.tolist()
+        }
@@ -0,0 +1,139 @@
+"""
+Bulk write path for imported transactions.
+
+Items are validated and coerced column-wise with pandas up front, then the
+valid rows are inserted with executemany in fixed-size batches. Each batch
+runs in a SAVEPOINT (or its own commit); when a batch fails, only that batch
+is retried row by row, so one bad row costs its own insert rather than the
+whole import, and every rejected row is reported with its index. Rows whose
+fingerprint (see src.fingerprint) is already in the ledger are counted as
+duplicates and not inserted again.
+"""
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src import date_parser, fingerprint, ledger
+from src.categories import ACTIVITY_TYPES
+from src.models import db, Transaction
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+class ImportReport:
+    """Outcome of a bulk import: rows written and per-row errors."""
+
+    def __init__(self, total):
+        self.total = total
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = []  # [{'row': index, 'error': message}], in row order
+
+    def reject(self, row, message):
+        self.errors.append({'row': int(row), 'error': message})
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def to_dict(self, max_errors=100):
+        return {
+            'total': self.total,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda e: e['row'])[:max_errors],
+        }
+
+
+def validate_items(items, user_id, report):
+    """
+    Coerce a list of {'date', 'description', 'amount', 'type'} dicts into rows.
+
+    Invalid items are recorded on the report and left out.
+
+    Returns:
+        (row indexes, row dicts) of the valid items, in input order
+    """
+    df = pd.DataFrame.from_records(items, columns=['date', 'description', 'amount', 'type'])
+    dates = date_parser.to_datetime(df['date'])
+    amounts = pd.to_numeric(df['amount'], errors='coerce')
+    types = df['type']
+    descriptions = df['description'].fillna('').astype(str)
+
+    checks = (
+        ('date', dates.isna(), 'invalid date'),
+        ('amount', ~amounts.abs().lt(float('inf')), 'invalid amount'),  # also catches NaN
+        ('type', ~types.isin(ACTIVITY_TYPES), 'unknown type'),
+    )
+    invalid = pd.Series(False, index=df.index)
+    for field, mask, message in checks:
+        # Report only the first problem of each row
+        for index in df.index[mask & ~invalid]:
+            report.reject(index, f"{message}: {items[index].get(field)!r}")
+        invalid |= mask
+
+    valid = df.index[~invalid]
+    rows = [
+        {'user_id': user_id, 'date': day, 'description': description, 'amount': float(amount), 'type': t_type}
+        for day, description, amount, t_type in zip(
+            dates[valid].dt.date, descriptions[valid], amounts[valid], types[valid])
+    ]
+    return list(valid), fingerprint.assign(rows, user_id)
+
+
+def insert_batches(user_id, indexes, rows, report, batch_size=DEFAULT_BATCH_SIZE, commit_each_batch=False):
+    """
+    Insert rows in batches, isolating failures to the rows that caused them.
+
+    With commit_each_batch the work is committed after every batch, so an
+    interrupted import keeps what it already wrote and the write lock is
+    released between batches. Otherwise the caller owns the final commit and
+    the derived ledger tables are updated once, after the last batch.
+    """
+    transactions = Transaction.__table__
+    ledger.prepare(user_id)
+    pending = []
+
+    def write(batch):
+        with db.session.begin_nested():
+            db.session.execute(insert(transactions), batch)
+        pending.extend((row['date'], row['amount'], row['type']) for row in batch)
+        report.inserted += len(batch)
+
+    for start in range(0, len(rows), batch_size):
+        batch_indexes, batch = indexes[start:start + batch_size], rows[start:start + batch_size]
+        existing = set(db.session.execute(
+            select(transactions.c.fingerprint)
+            .where(transactions.c.fingerprint.in_([row['fingerprint'] for row in batch]))
+        ).scalars())
+        if existing:
+            kept = [(index, row) for index, row in zip(batch_indexes, batch) if row['fingerprint'] not in existing]
+            report.duplicates += len(batch) - len(kept)
+            batch_indexes, batch = [index for index, _ in kept], [row for _, row in kept]
+        try:
+            if batch:
+                write(batch)
+        except SQLAlchemyError:
+            # Find the offending rows; each retry gets its own savepoint
+            for index, row in zip(batch_indexes, batch):
+                try:
+                    write([row])
+                except SQLAlchemyError as e:
+                    report.reject(index, str(e.orig if getattr(e, 'orig', None) else e))
+        if commit_each_batch:
+            ledger.record_changes(user_id, added=pending)
+            pending = []
+            db.session.commit()
+
+    ledger.record_changes(user_id, added=pending)
+
+
+def import_items(user_id, items, batch_size=DEFAULT_BATCH_SIZE, commit_each_batch=False):
+    """Validate and bulk insert posted transaction items; returns an ImportReport."""
+    report = ImportReport(len(items))
+    if not items:
+        return report
+    indexes, rows = validate_items(items, user_id, report)
+    insert_batches(user_id, indexes, rows, report, batch_size=batch_size, commit_each_batch=commit_each_batch)
+    return report
@@ -0,0 +1,28 @@
+"""
+Registry of transaction types and the cash-flow activity each one belongs to.
+
+This is the only place type membership is defined; totals, rollups, balances
+and the cash flow statement all classify types through it.
+"""
+
+ACTIVITIES = {
+    'CFO': ("Cash-customer", "Salary-suppliers", "Income-tax", "Other-cfo"),
+    'CFI': ("Buy-property-equipments", "Sell-property-equipments", "Buy-investment", "Sell-investment", "Other-cfi"),
+    'CFF': ("Issue-shares", "borrowings", "Repay-borrowings", "Pay-dividends", "Interest-paid", "Other-cff"),
+}
+
+ACTIVITY_LABELS = {
+    'CFO': 'Operating',
+    'CFI': 'Investing',
+    'CFF': 'Financing',
+}
+
+TYPE_ACTIVITY = {t_type: activity for activity, types in ACTIVITIES.items() for t_type in types}
+
+# Every type that counts towards a balance
+ACTIVITY_TYPES = tuple(TYPE_ACTIVITY)
+
+
+def activity_for(t_type):
+    """Return 'CFO', 'CFI', 'CFF' or None for an unrecognised type."""
+    return TYPE_ACTIVITY.get(t_type)
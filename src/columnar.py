@@ -0,0 +1,94 @@
+"""
+Parquet and Arrow IPC import/export of transactions.
+
+Uploads are read column-projected (only the date/description/amount/type
+columns are decoded, whatever else the file carries) and batch by batch, so
+they flow through upload_handler's chunked clean_data path like CSVs.
+Exports write one row group (Parquet) or record batch (Arrow) per query
+batch, so memory stays bounded by the batch size.
+"""
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Upload extension -> reader kind
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow', 'feather': 'arrow'}
+
+MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+# Columns clean_data understands; matched case-insensitively
+UPLOAD_COLUMNS = ('date', 'description', 'amount', 'type')
+
+# Rows per row group / record batch when exporting
+EXPORT_BATCH_SIZE = 65536
+
+SCHEMA = pa.schema([
+    ('Date', pa.date32()),
+    ('Description', pa.string()),
+    ('Amount', pa.float64()),
+    ('Type', pa.string()),
+])
+
+
+def _projection(names):
+    """The file's own names for the columns clean_data uses."""
+    return [name for name in names if str(name).strip().lower() in UPLOAD_COLUMNS]
+
+
+def read_chunks(stream, kind, chunksize):
+    """Yield a Parquet or Arrow IPC upload as DataFrames of at most `chunksize` rows."""
+    if kind == 'parquet':
+        parquet_file = pq.ParquetFile(stream)
+        columns = _projection(parquet_file.schema_arrow.names)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    try:
+        reader = pa.ipc.open_file(stream)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        # Arrow IPC stream format rather than the (Feather v2) file format
+        stream.seek(0)
+        reader = pa.ipc.open_stream(stream)
+        batches = iter(reader)
+    columns = _projection(reader.schema.names)
+    for batch in batches:
+        batch = batch.select(columns)
+        for start in range(0, batch.num_rows, chunksize):
+            yield batch.slice(start, chunksize).to_pandas()
+
+
+def _record_batch(rows):
+    dates, descriptions, amounts, types = zip(*rows)
+    return pa.record_batch([
+        pa.array(dates, pa.date32()),
+        pa.array(descriptions, pa.string()),
+        pa.array(amounts, pa.float64()),
+        pa.array(types, pa.string()),
+    ], schema=SCHEMA)
+
+
+def write_parquet(batches, compression='zstd'):
+    """Write batches of (date, description, amount, type) rows, one row group each; returns a rewound temp file."""
+    output = tempfile.TemporaryFile()
+    with pq.ParquetWriter(output, SCHEMA, compression=compression) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(rows))
+    output.seek(0)
+    return output
+
+
+def write_arrow(batches, compression='zstd'):
+    """As write_parquet, as an Arrow IPC (Feather v2) file with one record batch per batch."""
+    output = tempfile.TemporaryFile()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.ipc.new_file(output, SCHEMA, options=options) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(rows))
+    output.seek(0)
+    return output
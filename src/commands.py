@@ -0,0 +1,130 @@
+import click
+
+from src import analysis_cache, fingerprint, forecasting, ledger, seasonality, sharding, staging
+from src.models import db, Transaction
+
+
+def register_commands(app):
+    """Attach the maintenance commands to `flask` (e.g. `flask ledger rebuild`)."""
+
+    @app.cli.group('ledger')
+    def ledger_group():
+        """Maintain the derived per-user ledger tables."""
+
+    @ledger_group.command('rebuild')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+    def rebuild_command(user_id):
+        """Recompute ledger summaries and monthly rollups from the Transaction table."""
+        user_ids = []
+        for _ in sharding.each_shard(db, user_id):
+            user_ids += ledger.rebuild(user_id)
+        click.echo(f"Rebuilt ledger tables for {len(user_ids)} user(s)")
+
+    @ledger_group.command('check')
+    @click.option('--user-id', type=int, default=None, help='Only check this user.')
+    def check_command(user_id):
+        """Diff the derived ledger tables against the Transaction table."""
+        problems = []
+        for shard in sharding.each_shard(db, user_id):
+            problems += [f"{shard}: {problem}" if shard else problem for problem in ledger.check(user_id)]
+        for problem in problems:
+            click.echo(problem)
+        if problems:
+            raise click.ClickException(f"{len(problems)} mismatch(es); run `flask ledger rebuild` to repair")
+        click.echo("Ledger tables are consistent")
+
+    @ledger_group.command('fingerprint')
+    @click.option('--user-id', type=int, default=None, help='Only fingerprint this user.')
+    @click.option('--force', is_flag=True, help='Recompute fingerprints that are already set.')
+    @click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows per UPDATE batch.')
+    def fingerprint_command(user_id, force, batch_size):
+        """Backfill import fingerprints so re-uploads of old data are skipped."""
+        updated = 0
+        for _ in sharding.each_shard(db, user_id):
+            updated += fingerprint.backfill(user_id, force=force, batch_size=batch_size)
+            db.session.commit()
+        click.echo(f"Fingerprinted {updated} transaction(s)")
+
+    @app.cli.group('shards')
+    def shards_group():
+        """Manage per-tenant ledger shards (SHARD_COUNT)."""
+
+    @shards_group.command('split')
+    @click.option('--keep-source', is_flag=True, help='Copy rows without deleting them from cash_flow.db.')
+    @click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows per INSERT.')
+    def split_command(keep_source, batch_size):
+        """Move ledger rows from the monolithic database into the shard files."""
+        try:
+            copied = sharding.split_database(db, keep_source=keep_source, batch_size=batch_size)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        for key, count in copied.items():
+            click.echo(f"{key}: {count} row(s)")
+        click.echo(f"Copied {sum(copied.values())} row(s) into {len(copied)} shard(s)")
+
+    @app.cli.group('staging')
+    def staging_group():
+        """Manage uploads staged for review."""
+
+    @staging_group.command('purge')
+    def purge_command():
+        """Delete staged uploads whose STAGED_UPLOAD_TTL has passed."""
+        purged = 0
+        for _ in sharding.each_shard(db):
+            purged += staging.purge_expired()
+            db.session.commit()
+        click.echo(f"Purged {purged} expired staged upload(s)")
+
+    @app.cli.group('forecast')
+    def forecast_group():
+        """Evaluate the cash flow forecasting models."""
+
+    @forecast_group.command('backtest')
+    @click.option('--user-id', type=int, default=None, help='Only backtest this user.')
+    @click.option('--model', 'models', type=click.Choice(list(forecasting.MODELS)), multiple=True,
+                  help='Model to score (repeatable); all models by default.')
+    @click.option('--horizon', type=int, default=30, show_default=True, help='Days forecast from each origin.')
+    @click.option('--folds', type=int, default=4, show_default=True, help='Rolling origins per user.')
+    def backtest_command(user_id, models, horizon, folds):
+        """Rolling-origin MAE/MAPE of each model on users' daily net cash flow."""
+        for _ in sharding.each_shard(db, user_id):
+            if user_id is None:
+                user_ids = [uid for (uid,) in db.session.query(Transaction.user_id).distinct().order_by(Transaction.user_id)]
+            else:
+                user_ids = [user_id]
+            for uid in user_ids:
+                rows = ledger.daily_net(uid)
+                _, values = seasonality.resample([row.day for row in rows], [row.net for row in rows], 'D')
+                click.echo(f"User {uid}: {values.size} day(s)")
+                try:
+                    scores = forecasting.backtest(values, models or None, horizon, folds)
+                except ValueError as e:
+                    click.echo(f"  {e}")
+                    continue
+                for score in scores:
+                    if score.error:
+                        click.echo(f"  {score.model:<18} {score.error}")
+                        continue
+                    mape = f"{score.mape:9.1f}%" if score.mape is not None else f"{'n/a':>10}"
+                    click.echo(f"  {score.model:<18} MAE {score.mae:12.2f}  MAPE {mape}  folds {score.folds}")
+                scored = [score for score in scores if not score.error]
+                if scored:
+                    click.echo(f"  best by MAE: {min(scored, key=lambda score: score.mae).model}")
+
+    @app.cli.group('analysis-cache')
+    def analysis_cache_group():
+        """Inspect the persistent AI analysis cache (ANALYSIS_CACHE_PATH)."""
+
+    @analysis_cache_group.command('stats')
+    def analysis_cache_stats_command():
+        """Show the entry count and hit/miss counters."""
+        stats = analysis_cache.shared.stats()
+        click.echo(f"{stats['entries']} entr{'y' if stats['entries'] == 1 else 'ies'}, "
+                   f"{stats['hits']} hit(s), {stats['misses']} miss(es), hit rate {stats['hit_rate']:.1%}")
+
+    @analysis_cache_group.command('clear')
+    @click.option('--reset-stats', is_flag=True, help='Also zero the hit/miss counters.')
+    def analysis_cache_clear_command(reset_stats):
+        """Delete every cached analysis."""
+        removed = analysis_cache.shared.clear(reset_stats=reset_stats)
+        click.echo(f"Removed {removed} cached analysis result(s)")
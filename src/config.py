@@ -1,16 +1,104 @@
 import os
 from dotenv import load_dotenv
+from src.database import engine_options
+from src.sharding import shard_uris
 
 # Load .env file explicitly at the start
 load_dotenv()
 
 basedir = os.path.abspath(os.path.dirname(__file__))
-db_path = os.path.join(basedir, '..', 'instance', 'cash_flow.db')
+# INSTANCE_DIR moves the databases elsewhere, e.g. to a scratch directory for the test suite
+instance_dir = os.environ.get('INSTANCE_DIR') or os.path.join(basedir, '..', 'instance')
+db_path = os.path.join(instance_dir, 'cash_flow.db')
+shard_dir = os.path.join(instance_dir, 'shards')
+analysis_cache_path = os.path.join(instance_dir, 'analysis_cache.db')
+
+# SQLite engine profiles, selected with DB_PROFILE. Any setting can be
+# overridden with an SQLITE_<SETTING> environment variable, e.g.
+# SQLITE_BUSY_TIMEOUT=10000.
+SQLITE_PROFILES = {
+    # Stock pysqlite behaviour: one engine, rollback journal
+    'default': {},
+    # Several gunicorn workers: WAL so readers never wait on the writer,
+    # a separate reader pool, and writers that queue for the lock with backoff
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative means KiB
+        'busy_timeout': 5000,  # ms
+        'reader_pool_size': 8,
+        'writer_pool_size': 1,
+        'write_retries': 5,
+        'write_retry_backoff': 0.05,  # seconds, doubled per retry
+    },
+}
+
+def load_sqlite_profile(name):
+    if name not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}', expected one of {sorted(SQLITE_PROFILES)}")
+    profile = dict(SQLITE_PROFILES[name])
+    for key, value in list(profile.items()):
+        override = os.environ.get(f"SQLITE_{key.upper()}")
+        if override is not None:
+            profile[key] = type(value)(override)
+    return profile
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-default-secret-key-for-development'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'default')
+    SQLITE_PROFILE = load_sqlite_profile(DB_PROFILE)
+
+    # Number of SQLite files the ledger tables are spread over; 0 keeps everything in cash_flow.db.
+    # Changing it for an existing install needs `flask shards split` on a monolithic database.
+    SHARD_COUNT = int(os.environ.get('SHARD_COUNT', 0))
+    SQLALCHEMY_ENGINE_OPTIONS, SQLALCHEMY_BINDS = engine_options(
+        SQLITE_PROFILE, SQLALCHEMY_DATABASE_URI, shard_uris(shard_dir, SHARD_COUNT))
+
+    # Cross-request cache of User/UserPreferences/InitialBalance rows (src.user_cache); size 0 disables it
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))  # seconds
+
+    # Rows per executemany in /save_transactions, and whether each batch is committed on its own
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+    IMPORT_COMMIT_EACH_BATCH = os.environ.get('IMPORT_COMMIT_EACH_BATCH', '').lower() in ('1', 'true', 'yes')
+
+    # Background upload imports: worker threads per process, and queued/running jobs allowed per user
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 2))
+    IMPORT_MAX_PENDING = int(os.environ.get('IMPORT_MAX_PENDING', 3))
+    # Seconds without a heartbeat after which a queued or running job counts as orphaned and is failed
+    IMPORT_JOB_STALE_AFTER = int(os.environ.get('IMPORT_JOB_STALE_AFTER', 120))
+
+    # Rows fetched per batch (yield_per) and written per chunk when streaming an export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Seconds a reviewed-but-unsaved upload is kept server-side
+    STAGED_UPLOAD_TTL = int(os.environ.get('STAGED_UPLOAD_TTL', 3600))
+
+    # /forecast defaults: model name from src.forecasting.MODELS, days ahead and prediction interval level
+    FORECAST_MODEL = os.environ.get('FORECAST_MODEL', 'holt_winters_add')
+    FORECAST_HORIZON = int(os.environ.get('FORECAST_HORIZON', 90))
+    FORECAST_LEVEL = float(os.environ.get('FORECAST_LEVEL', 0.8))
+
+    # Monte Carlo runway: paths and months simulated by default, and the most paths a request may ask for
+    RUNWAY_PATHS = int(os.environ.get('RUNWAY_PATHS', 10000))
+    RUNWAY_MONTHS = int(os.environ.get('RUNWAY_MONTHS', 36))
+    RUNWAY_MAX_PATHS = int(os.environ.get('RUNWAY_MAX_PATHS', 100000))
+
+    # Persistent AI analysis cache (src.analysis_cache): SQLite file, seconds an entry is reused, LRU size (0 disables)
+    ANALYSIS_CACHE_PATH = os.environ.get('ANALYSIS_CACHE_PATH', analysis_cache_path)
+    ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', 7 * 24 * 3600))
+    ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', 1000))
+
+    # Streamed AI narratives (src.narrative): concurrent model calls per process, seconds to wait
+    # for a free slot, and seconds before a call is abandoned. The limit only means something with
+    # threaded or gevent workers (gunicorn.conf.py); a sync worker serves one stream at a time.
+    ANALYSIS_MAX_CONCURRENT = int(os.environ.get('ANALYSIS_MAX_CONCURRENT', 4))
+    ANALYSIS_QUEUE_TIMEOUT = float(os.environ.get('ANALYSIS_QUEUE_TIMEOUT', 2))
+    ANALYSIS_TIMEOUT = float(os.environ.get('ANALYSIS_TIMEOUT', 120))
     
     # Load API key with more detailed logging
     ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
@@ -22,5 +110,7 @@ class Config:
     # Enhanced debugging information
     print(f"Configuration initialized:")
     print(f"- Database path: {db_path}")
+    print(f"- Database profile: {DB_PROFILE}")
+    print(f"- Ledger shards: {SHARD_COUNT or 'disabled'}")
     print(f"- Anthropic API Key status: {'Set' if ANTHROPIC_API_KEY else 'Not set'}")
     print(f"- API Key length: {len(ANTHROPIC_API_KEY) if ANTHROPIC_API_KEY else 0}")
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+SQLite engine tuning and read/write routing.
+
+The active profile (see Config.SQLITE_PROFILE) decides which PRAGMAs run on
+every new connection. When a profile asks for a reader pool, a second engine
+on the same file is registered as the 'reader' bind: plain reads go there,
+while flushes, DML and anything after the first write in a transaction use
+the writer engine. Writer transactions start with BEGIN IMMEDIATE, so the
+file lock is taken up front and can be retried with backoff, instead of
+failing halfway through a unit of work with 'database is locked'.
+
+Tables marked as sharded (see src.sharding) bypass both and go to the
+current tenant's shard engine.
+"""
+import sqlite3
+import time
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+
+from src import sharding
+
+READER_BIND = 'reader'
+
+# Profile keys that map straight onto PRAGMA statements, in the order they run
+PRAGMA_SETTINGS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'busy_timeout')
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the reader bind when one is configured."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engines = self._db.engines
+        if bind is None and sharding.shard_keys(engines) and sharding.is_sharded(mapper, clause):
+            return engines[sharding.current_shard(engines)]
+
+        writer = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        reader = engines.get(READER_BIND)
+        if bind is not None or reader is None:
+            return writer
+        if self._flushing or isinstance(clause, UpdateBase) or self.info.get('writing'):
+            # Stay on the writer until the transaction ends so later reads see our own writes
+            self.info['writing'] = True
+            return writer
+        return reader
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _reset_writing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('writing', None)
+
+
+def engine_options(profile, uri, shard_uris=()):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS and SQLALCHEMY_BINDS for a profile.
+
+    Args:
+        profile: settings dict from Config.SQLITE_PROFILE
+        uri: main database URI
+        shard_uris: one URI per shard when sharding is enabled
+
+    Returns:
+        (engine_options, binds)
+    """
+    binds = {f"{sharding.SHARD_PREFIX}{i}": shard_uri for i, shard_uri in enumerate(shard_uris)}
+    if not profile:
+        return {}, binds
+
+    timeout = profile.get('busy_timeout', 5000) / 1000
+    options = {'connect_args': {'timeout': timeout, 'check_same_thread': False}}
+    for key, shard_uri in list(binds.items()):
+        # Shards keep deferred transactions, so their readers don't queue behind one connection
+        binds[key] = {
+            'url': shard_uri,
+            'pool_size': profile.get('reader_pool_size', 5),
+            'max_overflow': profile.get('reader_max_overflow', 0),
+            'connect_args': {'timeout': timeout, 'check_same_thread': False},
+        }
+    if profile.get('reader_pool_size'):
+        # SQLite has one writer at a time; queue writers in-process instead of on the file lock
+        options.update(pool_size=profile.get('writer_pool_size', 1), max_overflow=0, pool_timeout=max(timeout, 30))
+        binds[READER_BIND] = {
+            'url': uri,
+            'pool_size': profile['reader_pool_size'],
+            'max_overflow': profile.get('reader_max_overflow', 0),
+            'connect_args': {'timeout': timeout, 'check_same_thread': False},
+        }
+    return options, binds
+
+
+def install_profile(engine, profile, role='writer', split=False):
+    """
+    Attach the profile's PRAGMAs and transaction handling to an engine.
+
+    Args:
+        engine: SQLAlchemy engine on a SQLite file
+        profile: settings dict from Config.SQLITE_PROFILE
+        role: 'writer' or 'reader'
+        split: whether reads and writes use separate engines
+    """
+    if not profile or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name in PRAGMA_SETTINGS:
+            if name in profile:
+                cursor.execute(f"PRAGMA {name}={profile[name]}")
+        if role == 'reader':
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+        if split:
+            # Let the 'begin' hook below issue BEGIN instead of pysqlite
+            dbapi_connection.isolation_level = None
+
+    if not split:
+        return
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(connection):
+        if role == 'reader':
+            connection.exec_driver_sql("BEGIN")
+        else:
+            begin_immediate(connection, profile.get('write_retries', 0), profile.get('write_retry_backoff', 0.05))
+
+
+def begin_immediate(connection, retries, backoff):
+    """Take the write lock, retrying with exponential backoff while another writer holds it."""
+    for attempt in range(retries + 1):
+        try:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            return
+        except (OperationalError, sqlite3.OperationalError) as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+def configure_engines(app, db):
+    """Install the configured SQLite profile on every engine of the app."""
+    profile = app.config.get('SQLITE_PROFILE') or {}
+    with app.app_context():
+        engines = db.engines
+        split = READER_BIND in engines
+        shards = sharding.shard_keys(engines)
+        for key, engine in engines.items():
+            role = 'reader' if key == READER_BIND else 'writer'
+            install_profile(engine, profile, role=role, split=split and key not in shards)
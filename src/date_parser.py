@@ -0,0 +1,220 @@
+"""
+Date column parsing for uploaded files.
+
+Bank exports use one or two date formats per file, but rarely ISO 8601, and
+pandas without a format either parses element by element or applies the
+format guessed from the first value and turns every other row into NaT.
+DateParser instead infers the formats from a sample of distinct values and
+parses the column's distinct values with one vectorised pass per format,
+re-inferring only for values no known format accepts (so later chunks can
+add formats).
+
+Day/month order is one decision per upload: the per-upload `dayfirst`
+override when given, otherwise the first chunk with values that settle it
+(25/12 vs 12/25; the majority wins if a chunk has both). Until then dates are
+read month first and counted as ambiguous, and if the settled order turns out
+to be day first those rows stay reported as ambiguous. Values that contradict
+the order, like values no format accepts, are counted and sampled in report()
+instead of disappearing.
+"""
+import warnings
+from datetime import date, datetime
+
+import pandas as pd
+from pandas.api.types import infer_dtype, is_datetime64_any_dtype
+
+# Formats that cannot be misread, tried before the day/month pairs
+UNAMBIGUOUS_FORMATS = (
+    'ISO8601',
+    '%Y/%m/%d', '%Y.%m.%d', '%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S',
+    '%d %b %Y', '%d %B %Y', '%d-%b-%Y', '%d-%b-%y', '%b %d %Y', '%b %d, %Y', '%B %d, %Y',
+)
+
+# (day first, month first) variants of the same layout
+DAY_MONTH_PAIRS = tuple(
+    (f'%d{sep}%m{sep}{year}{time}', f'%m{sep}%d{sep}{year}{time}')
+    for sep in '/-.'
+    for year in ('%Y', '%y')
+    for time in ('', ' %H:%M', ' %H:%M:%S')
+)
+# Month first variant -> day first variant
+DAY_FIRST_VARIANTS = {month_first: day_first for day_first, month_first in DAY_MONTH_PAIRS}
+
+SAMPLE_SIZE = 500
+MAX_EXAMPLES = 5
+
+
+class DateParser:
+    """Parses date columns chunk after chunk, remembering the formats it found."""
+
+    def __init__(self, dayfirst=None, sample_size=SAMPLE_SIZE):
+        """
+        Args:
+            dayfirst: True/False to force the day/month order, None to infer it
+            sample_size: distinct values tried against each candidate format
+        """
+        # Stays None until the data settles the order; month first is used meanwhile
+        self.dayfirst = dayfirst
+        self.sample_size = sample_size
+        self.formats = []
+        self.ambiguous_rows = 0
+        self.rows = 0
+        self.failed = 0
+        self.examples = []
+
+    def parse(self, values):
+        """Parse a Series of dates into datetime64 (NaT where no format fits)."""
+        values = pd.Series(values)
+        self.rows += len(values)
+        if is_datetime64_any_dtype(values):
+            result = values.dt.tz_localize(None) if values.dt.tz is not None else values
+        else:
+            # Exports repeat a few thousand dates at most: parse each distinct value once
+            codes, uniques = pd.factorize(values)
+            parsed, guessed = self._parse_distinct(pd.Series(uniques, dtype=object))
+            result = pd.Series(parsed.to_numpy().take(codes), index=values.index)
+            result[codes == -1] = pd.NaT
+            self.ambiguous_rows += int(guessed.to_numpy()[codes[codes != -1]].sum())
+        self._record_failures(values, result)
+        return result
+
+    def _parse_distinct(self, values):
+        """Parsed values, and which of them were read in a day/month order the data has not settled."""
+        result = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+        guessed = pd.Series(False, index=values.index)
+        pending = values.notna()
+        if infer_dtype(values, skipna=True) != 'string':
+            # Excel cells arrive as datetime objects; those need no format
+            is_date = values.map(lambda value: isinstance(value, (datetime, date)))
+            if is_date.any():
+                result[is_date] = pd.to_datetime(values[is_date], errors='coerce')
+                pending &= ~is_date
+        text = values[pending].astype(str).str.strip()
+        text = text[text.ne('')]
+        if self.dayfirst is None and not text.empty:
+            self._settle_order(text)
+
+        for fmt in self.formats:
+            text = self._apply(fmt, text, result, guessed)
+        if not text.empty:
+            for fmt in self._infer(text):
+                self.formats.append(fmt)
+                text = self._apply(fmt, text, result, guessed)
+        return result, guessed
+
+    def report(self):
+        return {
+            'formats': list(self.formats),
+            'dayfirst': self.dayfirst,
+            'ambiguous': self.ambiguous_rows > 0,
+            'ambiguous_rows': self.ambiguous_rows,
+            'rows': self.rows,
+            'failed': self.failed,
+            'examples': list(self.examples),
+        }
+
+    def _apply(self, fmt, text, result, guessed):
+        """Parse what fmt accepts into result; returns the values still unparsed."""
+        parsed = to_datetime(text, fmt)
+        ok = parsed.notna()
+        result[ok[ok].index] = parsed[ok]
+        if self.dayfirst is None and fmt in DAY_FIRST_VARIANTS:
+            guessed[ok[ok].index] = True
+        return text[~ok]
+
+    def _settle_order(self, text):
+        """Fix the day/month order if some values can only be read one way."""
+        sample = text.head(self.sample_size)
+        day_only = pd.Series(False, index=text.index)
+        month_only = pd.Series(False, index=text.index)
+        for day_first, month_first in DAY_MONTH_PAIRS:
+            # Layouts absent from the sample are not tried on every value
+            if not (to_datetime(sample, day_first).notna().any() or to_datetime(sample, month_first).notna().any()):
+                continue
+            as_day = to_datetime(text, day_first).notna()
+            as_month = to_datetime(text, month_first).notna()
+            day_only |= as_day & ~as_month
+            month_only |= as_month & ~as_day
+        days, months = int(day_only.sum()), int(month_only.sum())
+        if not days and not months:
+            return
+        self.dayfirst = days > months
+        if self.dayfirst:
+            # Rows already read month first keep counting as ambiguous; read the rest day first
+            self.formats = [DAY_FIRST_VARIANTS.get(fmt, fmt) for fmt in self.formats]
+        else:
+            # What was read month first was read right
+            self.ambiguous_rows = 0
+
+    def _candidates(self):
+        candidates = list(UNAMBIGUOUS_FORMATS)
+        for day_first, month_first in DAY_MONTH_PAIRS:
+            candidates.append(day_first if self.dayfirst else month_first)
+        return candidates
+
+    def _infer(self, text):
+        """Formats covering a sample of the (distinct) values, greedily, most values first."""
+        sample = pd.Series(text.head(self.sample_size).to_numpy())
+        matches = {}
+        for fmt in self._candidates():
+            if fmt in self.formats:
+                continue
+            matches[fmt] = to_datetime(sample, fmt).notna()
+            # One format that reads the whole sample ends the search
+            if matches[fmt].all():
+                break
+
+        chosen = []
+        uncovered = pd.Series(True, index=sample.index)
+        while uncovered.any():
+            # max() keeps the first of equal counts, so ties go to candidate order
+            best = max(matches, key=lambda fmt: (matches[fmt] & uncovered).sum(), default=None)
+            if best is None or not (matches[best] & uncovered).any():
+                break
+            chosen.append(best)
+            uncovered &= ~matches.pop(best)
+        return chosen
+
+    def _record_failures(self, values, result):
+        failed = result.isna()
+        self.failed += int(failed.sum())
+        if len(self.examples) >= MAX_EXAMPLES or not failed.any():
+            return
+        for value in values[failed].drop_duplicates().head(MAX_EXAMPLES):
+            if len(self.examples) >= MAX_EXAMPLES:
+                break
+            value = '' if pd.isna(value) else str(value)
+            if value not in self.examples:
+                self.examples.append(value)
+
+
+def to_datetime(text, fmt='ISO8601'):
+    """
+    Parse a Series with one format into naive datetimes; NaT where it does not fit.
+
+    Offset-aware values keep their own wall-clock time, even when mixed with
+    naive ones or other offsets (which pandas would not put in one column).
+    """
+    try:
+        with warnings.catch_warnings():
+            # Mixed UTC offsets are handled value by value below
+            warnings.simplefilter('ignore', FutureWarning)
+            parsed = pd.to_datetime(text, format=fmt, errors='coerce')
+    except (ValueError, TypeError, OverflowError):
+        parsed = None
+    if parsed is None or not is_datetime64_any_dtype(parsed):
+        # Offset-aware and naive values together: keep each one's own wall-clock time
+        return pd.to_datetime(text.map(lambda value: _wall_time(value, fmt)), errors='coerce')
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed
+
+
+def _wall_time(value, fmt):
+    try:
+        parsed = pd.to_datetime(value, format=fmt)
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    if parsed is None or pd.isna(parsed):
+        return pd.NaT
+    return parsed.tz_localize(None) if parsed.tzinfo is not None else parsed
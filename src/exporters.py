@@ -0,0 +1,68 @@
+"""
+Streaming export of a user's transactions.
+
+Rows are read with yield_per, so only one batch is held at a time, and are
+written out as they arrive by generators that Flask streams to the client:
+the header is sent before the first query batch and memory stays flat
+however many rows the user has. The CSV stream can be gzip-compressed on
+the fly.
+"""
+import csv
+import io
+import zlib
+
+from sqlalchemy import select
+
+from src.models import db, Transaction
+
+COLUMNS = ('Date', 'Description', 'Amount', 'Type')
+DEFAULT_BATCH_SIZE = 1000
+
+
+def export_query(user_id, start=None, end=None, types=None):
+    """A user's transactions, oldest first, optionally within [start, end] and of the given types."""
+    query = select(Transaction.date, Transaction.description, Transaction.amount, Transaction.type).where(
+        Transaction.user_id == user_id)
+    if start is not None:
+        query = query.where(Transaction.date >= start)
+    if end is not None:
+        query = query.where(Transaction.date <= end)
+    if types:
+        query = query.where(Transaction.type.in_(types))
+    return query.order_by(Transaction.date, Transaction.id)
+
+
+def iter_batches(query, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the query's rows as lists of (date, description, amount, type) tuples."""
+    result = db.session.execute(query, execution_options={'yield_per': batch_size})
+    try:
+        for rows in result.partitions():
+            yield rows
+    finally:
+        result.close()
+
+
+def csv_chunks(batches):
+    """Encode batches of rows as CSV text, one chunk per batch, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk.encode('utf-8')
+
+    writer.writerow(COLUMNS)
+    yield take()
+    for rows in batches:
+        writer.writerows((day.isoformat(), description, amount, t_type) for day, description, amount, t_type in rows)
+        yield take()
+
+
+def gzip_chunks(chunks, level=6):
+    """gzip-compress a byte stream, flushing after every chunk so the client sees progress."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,116 @@
+"""
+Content fingerprints that make re-importing overlapping exports idempotent.
+
+A row's base fingerprint hashes its user, ISO date, amount in cents and
+normalised description. Identical rows are legitimate (two coffees on one
+day), so the stored fingerprint is '<base>:<n>' where n counts earlier rows
+with the same base in the same import (or, for backfills, the same ledger).
+Transaction.fingerprint is unique, so importing the same export twice adds
+nothing, while a file with a repeated row still keeps both copies.
+
+Rows entered by hand have no fingerprint and are never treated as duplicates
+until `flask ledger fingerprint` backfills them.
+"""
+import hashlib
+import re
+from collections import Counter
+
+from sqlalchemy import String, bindparam, cast, func, select, update
+
+from src.models import db, Transaction
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalise_description(description):
+    return _WHITESPACE.sub(' ', str(description or '')).strip().lower()
+
+
+def base_fingerprint(user_id, day, amount, description):
+    """Hex digest identifying a row's content, before the occurrence number."""
+    key = f"{user_id}|{day.isoformat()}|{round(float(amount) * 100)}|{normalise_description(description)}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def fingerprint(base, occurrence):
+    return f"{base}:{occurrence}"
+
+
+def assign(rows, user_id, seen=None):
+    """
+    Set 'fingerprint' on row dicts (date, amount, description), numbering repeats in order.
+
+    Args:
+        rows: list of row dicts, updated in place
+        seen: Counter of bases already numbered, to continue an earlier call
+    """
+    seen = Counter() if seen is None else seen
+    for row in rows:
+        base = base_fingerprint(user_id, row['date'], row['amount'], row['description'])
+        row['fingerprint'] = fingerprint(base, seen[base])
+        seen[base] += 1
+    return rows
+
+
+def numbered(base_column, order_column):
+    """SQL expression for '<base>:<n>' with n numbered per base in order_column order."""
+    occurrence = func.row_number().over(partition_by=base_column, order_by=order_column) - 1
+    return base_column + ':' + cast(occurrence, String)
+
+
+def backfill(user_id=None, force=False, batch_size=1000):
+    """
+    Fingerprint existing transactions that have none, in id order per user.
+
+    Occurrence numbers continue after the user's existing fingerprints, so
+    backfilled rows never collide with imported ones. With force, every
+    fingerprint is recomputed. Works on the current shard; the caller commits.
+
+    Returns:
+        number of transactions fingerprinted
+    """
+    transactions = Transaction.__table__
+    scope = [transactions.c.user_id == user_id] if user_id is not None else []
+    if force:
+        db.session.execute(update(transactions).where(*scope).values(fingerprint=None))
+
+    user_ids = db.session.execute(
+        select(transactions.c.user_id).distinct()
+        .where(transactions.c.fingerprint.is_(None), *scope)
+        .order_by(transactions.c.user_id)
+    ).scalars().all()
+
+    set_fingerprint = (
+        update(transactions)
+        .where(transactions.c.id == bindparam('row_id'))
+        .values(fingerprint=bindparam('value'))
+    )
+    updated = 0
+    for owner in user_ids:
+        seen = Counter()
+        for value in db.session.execute(
+            select(transactions.c.fingerprint)
+            .where(transactions.c.user_id == owner, transactions.c.fingerprint.is_not(None))
+        ).scalars():
+            base, _, occurrence = value.rpartition(':')
+            seen[base] = max(seen[base], int(occurrence) + 1)
+
+        # Keyset pages rather than one open cursor, since the rows change under it
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(transactions.c.id, transactions.c.date, transactions.c.amount, transactions.c.description)
+                .where(transactions.c.user_id == owner, transactions.c.fingerprint.is_(None),
+                       transactions.c.id > last_id)
+                .order_by(transactions.c.id)
+                .limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            assigned = assign([dict(row) for row in rows], owner, seen)
+            db.session.execute(set_fingerprint, [
+                {'row_id': row['id'], 'value': row['fingerprint']} for row in assigned
+            ])
+            updated += len(assigned)
+            last_id = rows[-1]['id']
+    return updated
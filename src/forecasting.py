@@ -0,0 +1,250 @@
+"""
+Cash flow forecasting models behind one interface.
+
+Every model is fitted to a regular series (daily net cash flow, from
+ledger.daily_net or src.seasonality.resample) and predicts a horizon with a
+prediction interval:
+
+    model = get_model('holt_winters_add').fit(values)
+    mean, lower, upper = model.predict(horizon=90, level=0.8)
+
+The exponential smoothing models choose their smoothing parameters by grid
+search. Their recursion is sequential in time, so the whole grid runs at
+once: each time step updates arrays holding every parameter combination,
+and the combination with the lowest one-step-ahead squared error wins.
+Intervals scale the one-step error variance to each step of the horizon.
+
+backtest() scores models by rolling origin (fit on the history before an
+origin, forecast the next horizon, move the origin on), so the model for a
+tenant can be chosen from its own data.
+"""
+from collections import namedtuple
+from functools import partial
+from itertools import product
+from statistics import NormalDist
+
+import numpy as np
+
+DEFAULT_HORIZON = 90
+DEFAULT_LEVEL = 0.8
+
+# Smoothing parameter grids searched by ExponentialSmoothing.fit
+ALPHAS = np.linspace(0.05, 0.95, 10)
+BETAS = np.array([0.0, 0.01, 0.05, 0.1, 0.2])
+GAMMAS = np.array([0.01, 0.05, 0.1, 0.2, 0.4])
+
+Forecast = namedtuple('Forecast', ['model', 'dates', 'mean', 'lower', 'upper', 'level'])
+
+Score = namedtuple('Score', ['model', 'mae', 'mape', 'folds', 'error'])
+
+
+def _z(level):
+    if not 0 < level < 1:
+        raise ValueError("Prediction interval level must be between 0 and 1")
+    return NormalDist().inv_cdf(0.5 + level / 2)
+
+
+class LinearTrend:
+    """Least-squares straight line through the series, with the OLS prediction interval."""
+
+    min_observations = 2
+
+    def fit(self, values):
+        y = np.asarray(values, dtype=float)
+        if y.size < self.min_observations:
+            raise ValueError(f"Linear trend needs at least {self.min_observations} observations")
+        x = np.arange(y.size)
+        self.slope, self.intercept = np.polyfit(x, y, 1)
+        resid = y - (self.slope * x + self.intercept)
+        self.sigma = np.sqrt(resid @ resid / (y.size - 2)) if y.size > 2 else 0.0
+        self.n = y.size
+        self.x_mean = x.mean()
+        self.sxx = ((x - self.x_mean) ** 2).sum()
+        return self
+
+    def predict(self, horizon, level=DEFAULT_LEVEL):
+        """(mean, lower, upper) arrays for the next `horizon` steps."""
+        x = np.arange(self.n, self.n + horizon)
+        mean = self.slope * x + self.intercept
+        half = _z(level) * self.sigma * np.sqrt(1 + 1 / self.n + (x - self.x_mean) ** 2 / self.sxx)
+        return mean, mean - half, mean + half
+
+
+class ExponentialSmoothing:
+    """
+    Exponential smoothing: simple (level only), or Holt-Winters with a trend
+    and additive ('add') or multiplicative ('mul') seasonality of `period` steps.
+
+    Multiplicative seasonality needs a strictly positive series; daily net
+    cash flow rarely is, so it suits inflow-only or coarser series.
+    """
+
+    def __init__(self, trend=False, seasonal=None, period=7):
+        if seasonal not in (None, 'add', 'mul'):
+            raise ValueError(f"Unsupported seasonality: {seasonal}")
+        self.trend = trend
+        self.seasonal = seasonal
+        self.period = period if seasonal else 1
+
+    @property
+    def min_observations(self):
+        return 2 * self.period if self.seasonal else (2 if self.trend else 1)
+
+    def _initial_state(self, y):
+        m = self.period
+        if self.seasonal:
+            level = y[:m].mean()
+            trend = (y[m:2 * m].mean() - level) / m if self.trend else 0.0
+            season = y[:m] / level if self.seasonal == 'mul' else y[:m] - level
+            return level, trend, season
+        trend = y[1] - y[0] if self.trend else 0.0
+        return y[0], trend, np.zeros(1)
+
+    def fit(self, values):
+        y = np.asarray(values, dtype=float)
+        if y.size < self.min_observations:
+            raise ValueError(f"{self.describe()} needs at least {self.min_observations} observations")
+        if self.seasonal == 'mul' and np.any(y <= 0):
+            raise ValueError("Multiplicative seasonality needs a strictly positive series")
+
+        grid = np.array(list(product(
+            ALPHAS,
+            BETAS if self.trend else [0.0],
+            GAMMAS if self.seasonal else [0.0],
+        )))
+        alpha, beta, gamma = grid.T
+        level0, trend0, season0 = self._initial_state(y)
+        level = np.full(len(grid), level0)
+        trend = np.full(len(grid), trend0)
+        season = np.tile(season0, (len(grid), 1))
+        # The first season (or value) only seeds the state, so it is not scored
+        burn_in = self.period if self.seasonal else 1
+        sse = np.zeros(len(grid))
+
+        m = self.period
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for t, value in enumerate(y):
+                position = t % m
+                s = season[:, position]
+                base = level + trend
+                if self.seasonal == 'mul':
+                    fitted = base * s
+                    new_level = alpha * value / s + (1 - alpha) * base
+                else:
+                    fitted = base + s
+                    new_level = alpha * (value - s) + (1 - alpha) * base
+                if t >= burn_in:
+                    sse += (value - fitted) ** 2
+                if self.trend:
+                    trend = beta * (new_level - level) + (1 - beta) * trend
+                if self.seasonal == 'mul':
+                    season[:, position] = gamma * value / new_level + (1 - gamma) * s
+                elif self.seasonal:
+                    season[:, position] = gamma * (value - new_level) + (1 - gamma) * s
+                level = new_level
+
+        sse[~np.isfinite(sse)] = np.inf
+        best = int(np.argmin(sse))
+        if not np.isfinite(sse[best]):
+            raise ValueError(f"{self.describe()} could not be fitted to this series")
+        self.alpha, self.beta, self.gamma = grid[best]
+        self.level, self.trend_slope = level[best], trend[best]
+        self.season = season[best]
+        self.sigma = np.sqrt(sse[best] / max(y.size - burn_in, 1))
+        self.n = y.size
+        return self
+
+    def predict(self, horizon, level=DEFAULT_LEVEL):
+        """(mean, lower, upper) arrays for the next `horizon` steps."""
+        steps = np.arange(1, horizon + 1)
+        base = self.level + steps * self.trend_slope
+        s = self.season[(self.n + steps - 1) % self.period]
+        mean = base * s if self.seasonal == 'mul' else base + s
+
+        # Forecast error variance h steps ahead: sigma^2 * (1 + sum_{j<h} c_j^2), where
+        # c_j is the weight an error carries j steps on (exact for additive models)
+        c = np.full(horizon, self.alpha)
+        if self.trend:
+            c += self.beta * self.alpha * steps
+        if self.seasonal:
+            c += self.gamma * (1 - self.alpha) * (steps % self.period == 0)
+        variance = self.sigma ** 2 * (1 + np.r_[0.0, np.cumsum(c[:-1] ** 2)])
+        half = _z(level) * np.sqrt(variance)
+        return mean, mean - half, mean + half
+
+    def describe(self):
+        if not self.seasonal:
+            return "Holt's linear smoothing" if self.trend else "Simple exponential smoothing"
+        return f"Holt-Winters ({'multiplicative' if self.seasonal == 'mul' else 'additive'})"
+
+
+# Model name -> factory; every model has fit(values) -> self and predict(horizon, level)
+MODELS = {
+    'linear': LinearTrend,
+    'ses': ExponentialSmoothing,
+    'holt_winters_add': partial(ExponentialSmoothing, trend=True, seasonal='add'),
+    'holt_winters_mul': partial(ExponentialSmoothing, trend=True, seasonal='mul'),
+}
+
+
+def get_model(name):
+    """A new, unfitted model by name."""
+    try:
+        return MODELS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown forecasting model: {name}") from None
+
+
+def forecast(dates, values, model='holt_winters_add', horizon=DEFAULT_HORIZON, level=DEFAULT_LEVEL):
+    """
+    Forecast a daily series `horizon` days past its last date.
+
+    Args:
+        dates: datetime64[D] array, one per value, consecutive days
+        values: the series (e.g. daily net cash flow with empty days as zero)
+
+    Returns:
+        Forecast with the model name, the forecast dates and mean/lower/upper arrays
+    """
+    mean, lower, upper = get_model(model).fit(values).predict(horizon, level)
+    start = np.datetime64(dates[-1], 'D') if len(dates) else np.datetime64('today', 'D')
+    return Forecast(model, start + np.arange(1, horizon + 1), mean, lower, upper, level)
+
+
+def backtest(values, models=None, horizon=30, folds=4):
+    """
+    Rolling-origin evaluation of each model on one series.
+
+    The last `folds` non-overlapping windows of `horizon` values are each
+    forecast from the history before them.
+
+    Returns:
+        [Score] in model order; mae over every forecast value, mape (percent)
+        over values that are not zero, or error when no fold could be fitted
+    """
+    values = np.asarray(values, dtype=float)
+    origins = [origin for origin in range(values.size - folds * horizon, values.size, horizon) if origin > 0]
+    if not origins:
+        raise ValueError(f"Not enough history to backtest a {horizon}-step horizon")
+
+    scores = []
+    for name in models or MODELS:
+        errors, actuals, problem = [], [], None
+        for origin in origins:
+            actual = values[origin:origin + horizon]
+            try:
+                mean = get_model(name).fit(values[:origin]).predict(actual.size)[0]
+            except ValueError as e:
+                problem = str(e)
+                continue
+            errors.append(mean - actual)
+            actuals.append(actual)
+        if not errors:
+            scores.append(Score(name, None, None, 0, problem))
+            continue
+        fitted_folds = len(errors)
+        errors, actuals = np.abs(np.concatenate(errors)), np.abs(np.concatenate(actuals))
+        nonzero = actuals > 0
+        mape = float(np.mean(errors[nonzero] / actuals[nonzero]) * 100) if nonzero.any() else None
+        scores.append(Score(name, float(errors.mean()), mape, fitted_folds, None))
+    return scores
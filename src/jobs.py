@@ -0,0 +1,214 @@
+"""
+Background import jobs.
+
+An upload is spooled to UPLOAD_FOLDER and an ImportJob row is created, then
+the import runs on a bounded thread pool (IMPORT_WORKERS threads) while the
+request returns the job id at once. The worker commits after every chunk
+together with the job's row counters, so /jobs/<id> shows live progress from
+any web process and other requests are not locked out for the whole import.
+Chunks are staged and only reach the ledger at the end, in one statement that
+skips rows imported before, so a failed job adds no transactions; what it
+staged expires with the other staged uploads. A 'review' job stops after
+staging: its result is the first preview page, with the token that
+/commit-staged/<token> saves.
+
+Jobs live only in the thread pool of the process that accepted them. Each
+process writes a heartbeat (updated_at) for its queued and running jobs
+every HEARTBEAT_INTERVAL seconds; a job whose heartbeat is older than
+IMPORT_JOB_STALE_AFTER lost its process (a restart or a crash) and is
+marked failed, at startup and whenever its user submits or polls a job, so
+it stops counting against IMPORT_MAX_PENDING.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, update
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from src import sharding
+from src.models import db, ImportJob
+from src.upload_handler import allowed_file, ingest_upload, process_upload
+
+ACTIVE_STATES = ('queued', 'running')
+KINDS = ('import', 'review')
+# Seconds between the heartbeats a process writes for the jobs it owns
+HEARTBEAT_INTERVAL = 30
+ORPHANED_ERROR = 'The import was interrupted when the server restarted; please upload the file again'
+
+
+class TooManyJobs(Exception):
+    """The user already has IMPORT_MAX_PENDING imports queued or running."""
+
+
+def init_app(app):
+    app.extensions['import_jobs'] = ThreadPoolExecutor(
+        max_workers=app.config.get('IMPORT_WORKERS', 2), thread_name_prefix='import-job')
+    # Ids of the queued and running jobs this process owns, kept alive by the heartbeat
+    app.extensions['import_job_ids'] = set()
+    threading.Thread(target=_heartbeat, args=(app,), name='import-job-heartbeat', daemon=True).start()
+    with app.app_context():
+        try:
+            expire_orphans()
+        except SQLAlchemyError as e:
+            # e.g. `flask db upgrade` has not added the heartbeat column yet
+            app.logger.warning(f"Could not expire orphaned import jobs: {str(e)}")
+            db.session.rollback()
+
+
+def submit_import(file, user_id, dayfirst=None, kind='import'):
+    """
+    Spool an upload to disk, record an ImportJob and queue it; returns the job.
+
+    kind 'import' saves the rows to the ledger; 'review' only stages them.
+    """
+    if kind not in KINDS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    if not (file and allowed_file(file.filename)):
+        raise ValueError('Invalid file type')
+    expire_orphans(user_id)
+    active = ImportJob.query.filter(ImportJob.user_id == user_id, ImportJob.state.in_(ACTIVE_STATES)).count()
+    if active >= current_app.config.get('IMPORT_MAX_PENDING', 3):
+        raise TooManyJobs(f"{active} imports are already in progress; wait for one to finish")
+
+    filename = secure_filename(file.filename)
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"job-{uuid.uuid4().hex}-{filename}")
+    file.save(path)
+
+    job = ImportJob(user_id=user_id, kind=kind, filename=filename, upload_path=path, state='queued')
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    app.extensions['import_job_ids'].add(job.id)
+    app.extensions['import_jobs'].submit(_run_import, app, job.id, dayfirst)
+    return job
+
+
+def get_job(job_id, user_id):
+    """The user's job, or None (also for other users' jobs)."""
+    expire_orphans(user_id)
+    return ImportJob.query.filter_by(id=job_id, user_id=user_id).first()
+
+
+def expire_orphans(user_id=None):
+    """
+    Mark failed the queued or running jobs whose process stopped sending heartbeats.
+
+    Limited to one user's jobs when user_id is given. Returns the number of jobs expired.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get('IMPORT_JOB_STALE_AFTER', 120))
+    query = ImportJob.query.filter(ImportJob.state.in_(ACTIVE_STATES),
+                                   or_(ImportJob.updated_at.is_(None), ImportJob.updated_at < cutoff))
+    if user_id is not None:
+        query = query.filter(ImportJob.user_id == user_id)
+    orphans = query.all()
+    for job in orphans:
+        job.state = 'failed'
+        job.error = ORPHANED_ERROR
+        job.finished_at = datetime.utcnow()
+        if job.upload_path:
+            try:
+                os.remove(job.upload_path)
+            except OSError:
+                pass
+    if orphans:
+        current_app.logger.warning(f"Expired {len(orphans)} orphaned import job(s)")
+        db.session.commit()
+    return len(orphans)
+
+
+def recent_jobs(user_id, limit=20):
+    return ImportJob.query.filter_by(user_id=user_id).order_by(ImportJob.id.desc()).limit(limit).all()
+
+
+def _run_import(app, job_id, dayfirst=None):
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        upload_path = job.upload_path
+        job.state = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        def progress(stats):
+            job.rows_read = stats['rows_read']
+            job.rows_imported = stats.get('rows_imported', 0)
+            job.rows_skipped = stats['rows_skipped']
+            # Commits the chunk just staged together with the counters
+            db.session.commit()
+
+        # Everything that may flush ledger or staging rows has to run while the
+        # user's shard is selected, commits and rollbacks included
+        try:
+            with sharding.tenant(db, job.user_id):
+                try:
+                    with open(upload_path, 'rb') as stream:
+                        upload = FileStorage(stream=stream, filename=job.filename)
+                        if job.kind == 'review':
+                            result = process_upload(upload, job.user_id, dayfirst=dayfirst, progress=progress)
+                        else:
+                            result = ingest_upload(upload, job.user_id, progress=progress, dayfirst=dayfirst)
+                            job.rows_imported = result['stats']['rows_imported']
+                            job.rows_skipped = result['stats']['rows_skipped']
+                    job.state = 'succeeded'
+                    job.result = result
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+                except Exception as e:
+                    app.logger.error(f"Import job {job_id} failed: {str(e)}")
+                    db.session.rollback()
+                    job.state = 'failed'
+                    job.error = str(e)
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+        finally:
+            app.extensions['import_job_ids'].discard(job_id)
+            _finish(app, job_id)
+            try:
+                os.remove(upload_path)
+            except OSError:
+                pass
+            db.session.remove()
+
+
+def _finish(app, job_id):
+    """Make sure the job does not stay 'running' when recording its outcome failed."""
+    try:
+        db.session.rollback()
+        db.session.execute(
+            update(ImportJob)
+            .where(ImportJob.id == job_id, ImportJob.finished_at.is_(None))
+            .values(state='failed', error='The import stopped unexpectedly', finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+    except Exception as e:
+        app.logger.error(f"Could not mark import job {job_id} finished: {str(e)}")
+        db.session.rollback()
+
+
+def _heartbeat(app):
+    """Keep updated_at fresh on the jobs this process owns, so they are not taken for orphans."""
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        job_ids = list(app.extensions['import_job_ids'])
+        if not job_ids:
+            continue
+        with app.app_context():
+            try:
+                db.session.execute(
+                    update(ImportJob)
+                    .where(ImportJob.id.in_(job_ids), ImportJob.finished_at.is_(None))
+                    .values(updated_at=datetime.utcnow())
+                )
+                db.session.commit()
+            except Exception as e:
+                app.logger.error(f"Import job heartbeat failed: {str(e)}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
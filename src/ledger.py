@@ -0,0 +1,531 @@
+"""
+Write path for transactions and the derived per-user tables built from them.
+
+Every insert, edit and delete of a Transaction goes through this module so the
+derived rows are changed in the same database transaction as the raw row.
+Callers still own the commit.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src import aggregates
+from src.categories import ACTIVITY_TYPES, TYPE_ACTIVITY
+from src.models import db, Transaction, LedgerSummary, MonthlyRollup, DailyBalance
+
+# Which LedgerSummary column a transaction type rolls up into
+ACTIVITY_COLUMNS = {t_type: f'total_{activity.lower()}' for t_type, activity in TYPE_ACTIVITY.items()}
+
+SUMMARY_FIELDS = ('total_cfo', 'total_cfi', 'total_cff', 'transaction_count', 'first_date', 'last_date')
+
+# Relative tolerance when comparing float sums in check()
+CHECK_TOLERANCE = 1e-6
+
+# Past this many distinct days in one change set, regenerating the user's
+# daily balances in one windowed INSERT beats shifting the suffix per day
+DAILY_REBUILD_THRESHOLD = 50
+
+
+def entry(transaction):
+    """The (date, amount, type) triple the derived tables are computed from."""
+    return transaction.date, transaction.amount, transaction.type
+
+
+def add_transactions(user_id, transactions):
+    """Add new Transaction objects for a user and fold them into the derived tables."""
+    transactions = list(transactions)
+    _ensure_derived(user_id)
+    db.session.add_all(transactions)
+    record_changes(user_id, added=[entry(t) for t in transactions])
+    return transactions
+
+
+def add_transaction(transaction):
+    return add_transactions(transaction.user_id, [transaction])[0]
+
+
+def update_transaction(transaction, **fields):
+    """Apply field changes to an existing Transaction, adjusting derived tables."""
+    _ensure_derived(transaction.user_id)
+    before = entry(transaction)
+    for name, value in fields.items():
+        setattr(transaction, name, value)
+    record_changes(transaction.user_id, added=[entry(transaction)], removed=[before])
+    return transaction
+
+
+def delete_transaction(transaction):
+    _ensure_derived(transaction.user_id)
+    removed = entry(transaction)
+    db.session.delete(transaction)
+    record_changes(transaction.user_id, removed=[removed])
+
+
+def record_changes(user_id, added=(), removed=()):
+    """
+    Fold added/removed (date, amount, type) entries into the user's derived rows.
+
+    Used directly by write paths that insert rows without the ORM. The caller
+    must have called prepare(user_id) before writing the raw rows.
+    """
+    apply_changes(user_id, Changes.from_entries(added, removed))
+
+
+def apply_changes(user_id, changes):
+    """Fold grouped Changes into the user's derived rows, after the raw rows are written."""
+    if not changes.by_day:
+        return
+    _update_summary(user_id, changes)
+    _update_rollups(user_id, changes)
+    _update_daily_balances(user_id, changes)
+
+
+class Changes:
+    """
+    Added/removed transactions grouped the way the derived tables need them.
+
+    Their size grows with the months and days touched, not with the number of
+    transactions, so a large import can be grouped in SQL (from_select) and
+    never loaded row by row.
+    """
+
+    def __init__(self):
+        # (month, type) -> [inflow, outflow, inflow_count, outflow_count]
+        self.by_month = defaultdict(lambda: [0.0, 0.0, 0, 0])
+        # day -> [categorised net, transaction count]
+        self.by_day = defaultdict(lambda: [0.0, 0])
+        self.first_added = self.last_added = None
+        self.removed = False
+
+    @classmethod
+    def from_entries(cls, added=(), removed=()):
+        changes = cls()
+        for sign, entries in ((1, added), (-1, removed)):
+            for t_date, amount, t_type in entries:
+                inflow = amount > 0
+                changes._add(sign, t_date, t_date.strftime('%Y-%m'), t_type,
+                             amount if inflow else 0.0, 0.0 if inflow else -amount,
+                             int(inflow), int(not inflow),
+                             amount if t_type in ACTIVITY_COLUMNS else 0.0)
+        return changes
+
+    @classmethod
+    def from_select(cls, rows):
+        """Group added rows in SQL; `rows` is a subquery with date, amount and type columns."""
+        changes = cls()
+        inflow = rows.c.amount > 0
+        groups = db.session.execute(select(
+            rows.c.date,
+            func.strftime('%Y-%m', rows.c.date),
+            rows.c.type,
+            func.sum(case((inflow, rows.c.amount), else_=0.0)),
+            func.sum(case((inflow, 0.0), else_=-rows.c.amount)),
+            func.sum(case((inflow, 1), else_=0)),
+            func.sum(case((inflow, 0), else_=1)),
+            func.sum(case((rows.c.type.in_(ACTIVITY_TYPES), rows.c.amount), else_=0.0)),
+        ).group_by(rows.c.date, rows.c.type))
+        for t_date, month, t_type, inflow_sum, outflow_sum, inflow_count, outflow_count, net in groups:
+            changes._add(1, t_date, month, t_type, inflow_sum, outflow_sum, inflow_count, outflow_count, net)
+        return changes
+
+    def _add(self, sign, t_date, month, t_type, inflow, outflow, inflow_count, outflow_count, net):
+        bucket = self.by_month[(month, t_type)]
+        bucket[0] += sign * inflow
+        bucket[1] += sign * outflow
+        bucket[2] += sign * inflow_count
+        bucket[3] += sign * outflow_count
+        day = self.by_day[t_date]
+        day[0] += sign * net
+        day[1] += sign * (inflow_count + outflow_count)
+        if sign < 0:
+            self.removed = True
+        else:
+            self.first_added = t_date if self.first_added is None else min(self.first_added, t_date)
+            self.last_added = t_date if self.last_added is None else max(self.last_added, t_date)
+
+    @property
+    def count(self):
+        """Net number of transactions added."""
+        return sum(count for _, count in self.by_day.values())
+
+
+def prepare(user_id):
+    """Make sure the user's derived rows exist before raw rows are written."""
+    _ensure_derived(user_id)
+
+
+def get_summary(user_id):
+    """
+    Return the user's LedgerSummary, building it from raw rows if missing.
+
+    A missing summary is built in the caller's transaction and only flushed;
+    the caller's commit keeps it. If a concurrent request stored one first,
+    that one is returned instead.
+    """
+    summary = LedgerSummary.query.filter_by(user_id=user_id).first()
+    if summary is None:
+        _create_derived(user_id)
+        summary = LedgerSummary.query.filter_by(user_id=user_id).one()
+    return summary
+
+
+def monthly_totals(user_id, types=None):
+    """[(month, inflow, outflow)] across all types (or only `types`), oldest month first."""
+    get_summary(user_id)
+    query = db.session.query(
+        MonthlyRollup.month,
+        func.sum(MonthlyRollup.inflow),
+        func.sum(MonthlyRollup.outflow),
+    ).filter(MonthlyRollup.user_id == user_id)
+    if types is not None:
+        query = query.filter(MonthlyRollup.type.in_(types))
+    return query.group_by(MonthlyRollup.month).order_by(MonthlyRollup.month).all()
+
+
+def daily_net(user_id):
+    """
+    [(day, net)] for every day with transactions, oldest first.
+
+    net sums only categorised types, so a day with nothing but uncategorised
+    transactions is still listed, with a net of 0.0.
+    """
+    get_summary(user_id)
+    return db.session.query(DailyBalance.day, DailyBalance.net).filter(
+        DailyBalance.user_id == user_id,
+    ).order_by(DailyBalance.day).all()
+
+
+def outflow_by_type(user_id):
+    """[(type, outflow)] for types with any cash going out."""
+    get_summary(user_id)
+    return db.session.query(
+        MonthlyRollup.type,
+        func.sum(MonthlyRollup.outflow),
+    ).filter(MonthlyRollup.user_id == user_id).group_by(MonthlyRollup.type).having(
+        func.sum(MonthlyRollup.outflow) > 0
+    ).all()
+
+
+def balance_as_of(user_id, day):
+    """Sum of categorised amounts dated on or before `day` (one index seek)."""
+    get_summary(user_id)
+    return _cumulative_at(user_id, day)
+
+
+def balances_as_of(user_id, days):
+    """
+    balance_as_of for many days in one call, in the order given.
+
+    One seek for the balance before the earliest day and one range read of
+    the daily balances up to the latest, then a bisect per day.
+    """
+    days = list(days)
+    if not days:
+        return []
+    get_summary(user_id)
+    first, last = min(days), max(days)
+    rows = db.session.query(DailyBalance.day, DailyBalance.cumulative).filter(
+        DailyBalance.user_id == user_id,
+        DailyBalance.day > first,
+        DailyBalance.day <= last,
+    ).order_by(DailyBalance.day).all()
+    known_days = [first] + [day for day, _ in rows]
+    cumulatives = [_cumulative_at(user_id, first)] + [cumulative for _, cumulative in rows]
+    return [cumulatives[bisect_right(known_days, day) - 1] for day in days]
+
+
+def _cumulative_at(user_id, day):
+    cumulative = db.session.query(DailyBalance.cumulative).filter(
+        DailyBalance.user_id == user_id,
+        DailyBalance.day <= day,
+    ).order_by(DailyBalance.day.desc()).limit(1).scalar()
+    return cumulative or 0.0
+
+
+def rebuild(user_id=None):
+    """Recompute derived rows from the Transaction table; returns the users rebuilt."""
+    user_ids = [user_id] if user_id is not None else [
+        row[0] for row in db.session.query(Transaction.user_id).distinct()
+    ] + [
+        row[0] for row in db.session.query(LedgerSummary.user_id)
+    ]
+    user_ids = sorted(set(user_ids))
+    for uid in user_ids:
+        _build_derived(uid)
+    db.session.commit()
+    return user_ids
+
+
+def check(user_id=None):
+    """
+    Diff the derived tables against aggregates of the raw Transaction table.
+
+    Returns:
+        list of human-readable mismatch descriptions (empty when consistent)
+    """
+    problems = []
+
+    expected_rollups = {}
+    for uid, month, t_type, inflow, outflow, inflow_count, outflow_count in db.session.execute(_rollup_select(user_id)):
+        expected_rollups[(uid, month, t_type)] = (inflow, outflow, inflow_count, outflow_count)
+    actual_query = db.session.query(
+        MonthlyRollup.user_id, MonthlyRollup.month, MonthlyRollup.type,
+        MonthlyRollup.inflow, MonthlyRollup.outflow, MonthlyRollup.inflow_count, MonthlyRollup.outflow_count)
+    if user_id is not None:
+        actual_query = actual_query.filter(MonthlyRollup.user_id == user_id)
+    actual_rollups = {(uid, month, t_type): tuple(values) for uid, month, t_type, *values in actual_query}
+
+    for key in sorted(set(expected_rollups) | set(actual_rollups)):
+        expected = expected_rollups.get(key, (0.0, 0.0, 0, 0))
+        actual = actual_rollups.get(key, (0.0, 0.0, 0, 0))
+        if not _same(expected, actual):
+            problems.append(f"rollup user={key[0]} month={key[1]} type={key[2]}: expected {expected}, found {actual}")
+
+    expected_days = {(uid, day): (net, count, cumulative)
+                     for uid, day, net, count, cumulative in db.session.execute(_daily_select(user_id))}
+    actual_query = db.session.query(
+        DailyBalance.user_id, DailyBalance.day,
+        DailyBalance.net, DailyBalance.transaction_count, DailyBalance.cumulative)
+    if user_id is not None:
+        actual_query = actual_query.filter(DailyBalance.user_id == user_id)
+    actual_days = {(uid, day): tuple(values) for uid, day, *values in actual_query}
+
+    for key in sorted(set(expected_days) | set(actual_days)):
+        expected = expected_days.get(key, (0.0, 0, None))
+        actual = actual_days.get(key, (0.0, 0, None))
+        if not _same(expected, actual):
+            problems.append(f"daily balance user={key[0]} day={key[1]}: expected {expected}, found {actual}")
+
+    summary_query = LedgerSummary.query
+    if user_id is not None:
+        summary_query = summary_query.filter_by(user_id=user_id)
+    for summary in summary_query:
+        expected = _summary_values(summary.user_id)
+        actual = tuple(getattr(summary, name) for name in SUMMARY_FIELDS)
+        if not _same(expected, actual):
+            problems.append(f"summary user={summary.user_id}: expected {expected}, found {actual}")
+
+    return problems
+
+
+def _same(expected, actual):
+    for e, a in zip(expected, actual):
+        if isinstance(e, float) or isinstance(a, float):
+            if abs((e or 0.0) - (a or 0.0)) > CHECK_TOLERANCE * max(1.0, abs(e or 0.0)):
+                return False
+        elif e != a:
+            return False
+    return True
+
+
+def _ensure_derived(user_id):
+    get_summary(user_id)
+
+
+def _create_derived(user_id):
+    """Build the derived rows of a user who has no summary yet, unless another request just did."""
+    summaries = LedgerSummary.__table__
+    created = db.session.execute(
+        sqlite_insert(summaries)
+        .values(user_id=user_id, **dict(zip(SUMMARY_FIELDS, _summary_values(user_id))))
+        .on_conflict_do_nothing(index_elements=['user_id'])
+    ).rowcount
+    if created:
+        _build_rollups(user_id)
+        _build_daily_balances(user_id)
+
+
+def _build_derived(user_id):
+    """Replace all derived rows for a user with fresh aggregates of the raw rows."""
+    LedgerSummary.query.filter_by(user_id=user_id).delete()
+    summary = _build_summary(user_id)
+    _build_rollups(user_id)
+    _build_daily_balances(user_id)
+    return summary
+
+
+def _rollup_select(user_id=None):
+    month = func.strftime('%Y-%m', Transaction.date)
+    inflow = Transaction.amount > 0
+    stmt = select(
+        Transaction.user_id,
+        month.label('month'),
+        Transaction.type,
+        func.sum(case((inflow, Transaction.amount), else_=0.0)),
+        func.sum(case((inflow, 0.0), else_=-Transaction.amount)),
+        func.sum(case((inflow, 1), else_=0)),
+        func.sum(case((inflow, 0), else_=1)),
+    ).group_by(Transaction.user_id, month, Transaction.type)
+    if user_id is not None:
+        stmt = stmt.where(Transaction.user_id == user_id)
+    return stmt
+
+
+def _build_rollups(user_id):
+    rollups = MonthlyRollup.__table__
+    db.session.execute(delete(rollups).where(rollups.c.user_id == user_id))
+    db.session.execute(insert(rollups).from_select(
+        ['user_id', 'month', 'type', 'inflow', 'outflow', 'inflow_count', 'outflow_count'],
+        _rollup_select(user_id),
+    ))
+
+
+def _daily_select(user_id=None):
+    net = func.sum(case((Transaction.type.in_(ACTIVITY_TYPES), Transaction.amount), else_=0.0))
+    per_day = select(
+        Transaction.user_id.label('user_id'),
+        Transaction.date.label('day'),
+        net.label('net'),
+        func.count(Transaction.id).label('transaction_count'),
+    ).group_by(Transaction.user_id, Transaction.date)
+    if user_id is not None:
+        per_day = per_day.where(Transaction.user_id == user_id)
+    per_day = per_day.subquery()
+    return select(
+        per_day.c.user_id,
+        per_day.c.day,
+        per_day.c.net,
+        per_day.c.transaction_count,
+        func.sum(per_day.c.net).over(partition_by=per_day.c.user_id, order_by=per_day.c.day),
+    )
+
+
+def _build_daily_balances(user_id):
+    balances = DailyBalance.__table__
+    db.session.execute(delete(balances).where(balances.c.user_id == user_id))
+    db.session.execute(insert(balances).from_select(
+        ['user_id', 'day', 'net', 'transaction_count', 'cumulative'],
+        _daily_select(user_id),
+    ))
+
+
+def _summary_values(user_id):
+    type_totals = aggregates.totals_by_type(user_id)
+    values = {f'total_{activity.lower()}': total for activity, total in aggregates.by_activity(type_totals).items()}
+    values.update(transaction_count=0, first_date=None, last_date=None)
+    for row in type_totals:
+        values['transaction_count'] += row.count
+        values['first_date'] = row.first_date if values['first_date'] is None else min(values['first_date'], row.first_date)
+        values['last_date'] = row.last_date if values['last_date'] is None else max(values['last_date'], row.last_date)
+    return tuple(values[name] for name in SUMMARY_FIELDS)
+
+
+def _build_summary(user_id):
+    summary = LedgerSummary(user_id=user_id, **dict(zip(SUMMARY_FIELDS, _summary_values(user_id))))
+    db.session.add(summary)
+    db.session.flush()
+    return summary
+
+
+def _update_summary(user_id, changes):
+    deltas = {'total_cfo': 0.0, 'total_cfi': 0.0, 'total_cff': 0.0}
+    for (_, t_type), (inflow, outflow, _, _) in changes.by_month.items():
+        column = ACTIVITY_COLUMNS.get(t_type)
+        if column:
+            deltas[column] += inflow - outflow
+
+    values = {column: getattr(LedgerSummary, column) + delta for column, delta in deltas.items()}
+    values['transaction_count'] = LedgerSummary.transaction_count + changes.count
+    if changes.first_added is not None:
+        first, last = changes.first_added, changes.last_added
+        values['first_date'] = case(
+            (or_(LedgerSummary.first_date.is_(None), LedgerSummary.first_date > first), first),
+            else_=LedgerSummary.first_date)
+        values['last_date'] = case(
+            (or_(LedgerSummary.last_date.is_(None), LedgerSummary.last_date < last), last),
+            else_=LedgerSummary.last_date)
+
+    db.session.execute(
+        update(LedgerSummary)
+        .where(LedgerSummary.user_id == user_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+    if changes.removed:
+        # Removing a boundary row needs the new MIN/MAX; the (user_id, date)
+        # index answers both without a scan.
+        first, last = db.session.query(
+            func.min(Transaction.date), func.max(Transaction.date)
+        ).filter(Transaction.user_id == user_id).one()
+        db.session.execute(
+            update(LedgerSummary)
+            .where(LedgerSummary.user_id == user_id)
+            .values(first_date=first, last_date=last)
+            .execution_options(synchronize_session=False)
+        )
+
+    for summary in db.session.identity_map.values():
+        if isinstance(summary, LedgerSummary) and summary.user_id == user_id:
+            db.session.expire(summary)
+
+
+def _update_rollups(user_id, changes):
+    buckets = changes.by_month
+    rollups = MonthlyRollup.__table__
+    stmt = sqlite_insert(rollups)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'month', 'type'],
+        set_={
+            'inflow': rollups.c.inflow + stmt.excluded.inflow,
+            'outflow': rollups.c.outflow + stmt.excluded.outflow,
+            'inflow_count': rollups.c.inflow_count + stmt.excluded.inflow_count,
+            'outflow_count': rollups.c.outflow_count + stmt.excluded.outflow_count,
+        },
+    )
+    db.session.execute(stmt, [
+        {'user_id': user_id, 'month': month, 'type': t_type, 'inflow': inflow, 'outflow': outflow,
+         'inflow_count': inflow_count, 'outflow_count': outflow_count}
+        for (month, t_type), (inflow, outflow, inflow_count, outflow_count) in buckets.items()
+    ])
+
+    if changes.removed:
+        db.session.execute(delete(rollups).where(
+            rollups.c.user_id == user_id,
+            rollups.c.month.in_({month for month, _ in buckets}),
+            rollups.c.inflow_count + rollups.c.outflow_count <= 0,
+        ))
+
+
+def _update_daily_balances(user_id, changes):
+    # day -> [net delta, count delta]
+    deltas = changes.by_day
+    if len(deltas) > DAILY_REBUILD_THRESHOLD:
+        db.session.flush()
+        _build_daily_balances(user_id)
+        return
+
+    balances = DailyBalance.__table__
+    for day in sorted(deltas):
+        net_delta, count_delta = deltas[day]
+        exists = db.session.execute(select(balances.c.id).where(
+            balances.c.user_id == user_id, balances.c.day == day)).first()
+        if exists is None:
+            # A new day starts from the running balance of the day before it
+            previous = db.session.execute(select(balances.c.cumulative).where(
+                balances.c.user_id == user_id,
+                balances.c.day < day,
+            ).order_by(balances.c.day.desc()).limit(1)).scalar()
+            db.session.execute(insert(balances).values(
+                user_id=user_id, day=day, net=0.0, transaction_count=0, cumulative=previous or 0.0))
+        db.session.execute(
+            update(balances)
+            .where(balances.c.user_id == user_id, balances.c.day == day)
+            .values(net=balances.c.net + net_delta,
+                    transaction_count=balances.c.transaction_count + count_delta)
+        )
+        if net_delta:
+            db.session.execute(
+                update(balances)
+                .where(balances.c.user_id == user_id, balances.c.day >= day)
+                .values(cumulative=balances.c.cumulative + net_delta)
+            )
+
+    if changes.removed:
+        db.session.execute(delete(balances).where(
+            balances.c.user_id == user_id,
+            balances.c.day.in_(list(deltas)),
+            balances.c.transaction_count <= 0,
+        ))
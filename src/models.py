@@ -1,7 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from datetime import datetime
+from src.database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Table info for per-user ledger tables that src.sharding may move to a shard file
+SHARDED = {'sharded': True}
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -11,13 +16,22 @@ class User(UserMixin, db.Model):
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_transaction_user'), nullable=False)
-    date = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
     description = db.Column(db.String(100), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     type = db.Column(db.String(10), nullable=False)
+    fingerprint = db.Column(db.String(40))  # set on imported rows, see src.fingerprint
     
     user = db.relationship('User', backref=db.backref('transactions', lazy=True))
 
+    # Every per-user listing filters on user_id and sorts/ranges on date
+    __table_args__ = (
+        db.Index('ix_transaction_user_date', 'user_id', 'date'),
+        db.Index('ix_transaction_user_type', 'user_id', 'type'),
+        db.Index('ix_transaction_fingerprint', 'fingerprint', unique=True),
+        {'info': SHARDED},
+    )
+
 class InitialBalance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_initial_balance_user'), nullable=False)
@@ -25,10 +39,125 @@ class InitialBalance(db.Model):
     
     user = db.relationship('User', backref=db.backref('initial_balance', lazy=True))
 
+    __table_args__ = {'info': SHARDED}
+
 class UserPreferences(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     modules = db.Column(db.JSON, default=list)
     email_notifications = db.Column(db.Boolean, default=True)
     
-    user = db.relationship('User', backref=db.backref('preferences', lazy=True))
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('preferences', lazy=True))
+
+class LedgerSummary(db.Model):
+    """Per-user running totals, maintained by src.ledger on every Transaction write."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_ledger_summary_user'), nullable=False, unique=True)
+    total_cfo = db.Column(db.Float, nullable=False, default=0.0)
+    total_cfi = db.Column(db.Float, nullable=False, default=0.0)
+    total_cff = db.Column(db.Float, nullable=False, default=0.0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    first_date = db.Column(db.Date)
+    last_date = db.Column(db.Date)
+
+    user = db.relationship('User', backref=db.backref('ledger_summary', lazy=True, uselist=False))
+
+    __table_args__ = {'info': SHARDED}
+
+
+class MonthlyRollup(db.Model):
+    """Per-user, per-month, per-type inflow/outflow sums maintained by src.ledger."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_monthly_rollup_user'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # 'YYYY-MM'
+    type = db.Column(db.String(10), nullable=False)
+    inflow = db.Column(db.Float, nullable=False, default=0.0)
+    outflow = db.Column(db.Float, nullable=False, default=0.0)  # stored as a positive number
+    inflow_count = db.Column(db.Integer, nullable=False, default=0)
+    outflow_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', 'type', name='uq_monthly_rollup_user_month_type'),
+        {'info': SHARDED},
+    )
+
+
+class DailyBalance(db.Model):
+    """Per-user daily net and running (prefix-sum) balance maintained by src.ledger."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_daily_balance_user'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    net = db.Column(db.Float, nullable=False, default=0.0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    cumulative = db.Column(db.Float, nullable=False, default=0.0)  # sum of net for all days <= day
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_daily_balance_user_day'),
+        {'info': SHARDED},
+    )
+
+
+class ImportJob(db.Model):
+    """A background upload import run by src.jobs; polled through /jobs/<id>."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_import_job_user'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    upload_path = db.Column(db.String(500))  # spooled copy of the upload, removed when the job ends
+    kind = db.Column(db.String(10), nullable=False, default='import')  # import: into the ledger; review: staged only
+    state = db.Column(db.String(10), nullable=False, default='queued')  # queued/running/succeeded/failed
+    rows_read = db.Column(db.Integer, nullable=False, default=0)
+    rows_imported = db.Column(db.Integer, nullable=False, default=0)
+    rows_skipped = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Heartbeat of the process that owns the job while it is queued or running (src.jobs)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'filename': self.filename,
+            'state': self.state,
+            'rows_read': self.rows_read,
+            'rows_imported': self.rows_imported,
+            'rows_skipped': self.rows_skipped,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class StagedUpload(db.Model):
+    """A cleaned upload parked server-side until the user commits it (src.staging)."""
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_staged_upload_user'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = {'info': SHARDED}
+
+
+class StagedRow(db.Model):
+    """One cleaned row of a StagedUpload; row_index is dense from 0 in file order."""
+    id = db.Column(db.Integer, primary_key=True)
+    upload_id = db.Column(db.Integer, db.ForeignKey('staged_upload.id', name='fk_staged_row_upload', ondelete='CASCADE'), nullable=False)
+    row_index = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    description = db.Column(db.String(100), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    type = db.Column(db.String(10), nullable=False)
+    base_fingerprint = db.Column(db.String(32))
+
+    __table_args__ = (
+        db.UniqueConstraint('upload_id', 'row_index', name='uq_staged_row_upload_index'),
+        {'info': SHARDED},
+    )
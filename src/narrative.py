@@ -0,0 +1,146 @@
+"""
+AI analysis narratives streamed to the browser as Server-Sent Events.
+
+/forecast returns the numeric analysis at once and keeps the prompt under
+its cache key; the page then opens /forecast/stream?key=..., which runs the
+model call on a background thread and relays its text to the response as it
+arrives:
+
+    event: chunk    data: {"text": "..."}     (repeated)
+    event: done     data: {"cached": false}
+    event: failed   data: {"error": "..."}
+
+At most ANALYSIS_MAX_CONCURRENT model calls run at once per process; a
+request that cannot get a slot within ANALYSIS_QUEUE_TIMEOUT seconds gets a
+'failed' event rather than tying up a worker while it waits. A call that
+has not finished after ANALYSIS_TIMEOUT seconds is aborted, as is one
+whose browser has gone away: no request to the API may outlive that
+deadline, the SDK does not retry, and the relay closes the connection, so
+the slot is free again as soon as the 'failed' event is sent. The limit
+assumes threaded or gevent workers (gunicorn.conf.py): a sync worker is
+held by each open stream, so it never runs two model calls and never
+reaches the semaphore's limit.
+"""
+import json
+import queue
+import threading
+import time
+
+# Seconds of silence after which a comment line is sent to keep proxies from closing the stream
+HEARTBEAT_INTERVAL = 15
+# Seconds the relay waits for an aborted call's thread to let go of its slot
+ABORT_GRACE = 1
+
+_DONE = object()
+
+
+def init_app(app):
+    app.extensions['narrative_slots'] = threading.BoundedSemaphore(app.config.get('ANALYSIS_MAX_CONCURRENT', 4))
+
+
+def event(name, data):
+    """One SSE event with a JSON payload."""
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def cached_events(text):
+    """Events replaying a cached narrative."""
+    yield event('chunk', {'text': text})
+    yield event('done', {'cached': True})
+
+
+def acquire_slot(app):
+    """Reserve one of the app's concurrent model calls; False when none frees up in time."""
+    return app.extensions['narrative_slots'].acquire(timeout=app.config.get('ANALYSIS_QUEUE_TIMEOUT', 2))
+
+
+def stream_events(app, open_stream, timeout=None):
+    """
+    Run a model call on a background thread; returns a generator of SSE events.
+
+    open_stream(deadline, on_open) must return an iterator of text chunks, such
+    as FinancialAnalytics.stream_narrative: it may not outlive `deadline` (a
+    time.monotonic() value), and passes on_open a function that aborts the call.
+    The caller must hold a slot from acquire_slot(); it is released when the
+    thread finishes. Reaching `timeout` seconds, or closing the returned
+    generator (the client disconnected), aborts the call, so the slot is free
+    again right after the 'failed' event rather than when the API gives up.
+    """
+    slots = app.extensions['narrative_slots']
+    timeout = timeout or app.config.get('ANALYSIS_TIMEOUT', 120)
+    deadline = time.monotonic() + timeout
+    updates = queue.Queue()
+    stop = threading.Event()
+    call = _Call()
+
+    def run():
+        try:
+            for text in open_stream(deadline, call.opened):
+                if stop.is_set():
+                    return
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'The analysis did not finish within {timeout} seconds')
+                updates.put(text)
+            updates.put(_DONE)
+        except Exception as e:
+            if not stop.is_set():
+                app.logger.error(f"Narrative stream failed: {e}")
+            updates.put(e)
+        finally:
+            slots.release()
+            call.finished.set()
+
+    # Started here rather than on first iteration, so the slot is released even if the response is never read
+    threading.Thread(target=run, name='analysis-narrative', daemon=True).start()
+    return _relay(updates, stop, call, deadline, timeout)
+
+
+class _Call:
+    """The abort handle of a running model call, shared by its thread and the relay."""
+
+    def __init__(self):
+        self.finished = threading.Event()
+        self._abort = None
+        self._lock = threading.Lock()
+
+    def opened(self, abort):
+        with self._lock:
+            self._abort = abort
+
+    def abort(self):
+        with self._lock:
+            abort, self._abort = self._abort, None
+        if abort is not None and not self.finished.is_set():
+            try:
+                abort()
+            except Exception:
+                pass
+        # Closing the connection ends a blocked read; the thread then releases the slot
+        self.finished.wait(ABORT_GRACE)
+
+
+def _relay(updates, stop, call, deadline, timeout):
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                stop.set()
+                call.abort()
+                yield event('failed', {'error': f'The analysis did not finish within {timeout} seconds'})
+                return
+            try:
+                update = updates.get(timeout=min(remaining, HEARTBEAT_INTERVAL))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if update is _DONE:
+                yield event('done', {'cached': False})
+                return
+            if isinstance(update, Exception):
+                yield event('failed', {'error': str(update)})
+                return
+            yield event('chunk', {'text': update})
+    finally:
+        if not call.finished.is_set():
+            stop.set()
+            call.abort()
@@ -0,0 +1,87 @@
+"""
+Keyset (cursor) pagination over a user's transactions.
+
+Pages are ordered newest first by (date, id) and continue from an opaque
+cursor instead of an OFFSET, so every page is one index range scan on
+(user_id, date) no matter how deep it is, and no COUNT(*) is issued.
+"""
+import base64
+from datetime import date
+
+from sqlalchemy import tuple_
+
+from src.models import Transaction
+
+
+class KeysetPage:
+    """One page of results plus the cursors to reach its neighbours."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(transaction):
+    raw = f"{transaction.date.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (date, id) key encoded in a cursor; raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, transaction_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return date.fromisoformat(day), int(transaction_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def paginate_transactions(user_id, per_page, after=None, before=None, total=None):
+    """
+    Fetch one page of a user's transactions, newest first.
+
+    Args:
+        user_id: owner of the transactions
+        per_page: page size
+        after: cursor of the last row already shown (next page)
+        before: cursor of the first row already shown (previous page)
+        total: optional row count to attach to the page (e.g. from LedgerSummary)
+
+    Returns:
+        KeysetPage
+    """
+    key = tuple_(Transaction.date, Transaction.id)
+    query = Transaction.query.filter(Transaction.user_id == user_id)
+
+    if before:
+        rows = query.filter(key > decode_cursor(before)).order_by(
+            Transaction.date.asc(), Transaction.id.asc()
+        ).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_prev, has_next = has_more, True
+    else:
+        if after:
+            query = query.filter(key < decode_cursor(after))
+        rows = query.order_by(
+            Transaction.date.desc(), Transaction.id.desc()
+        ).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_prev, has_next = bool(after), len(rows) > per_page
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1]) if items and has_next else None,
+        prev_cursor=encode_cursor(items[0]) if items and has_prev else None,
+        total=total,
+    )
@@ -0,0 +1,122 @@
+"""
+Monte Carlo cash runway.
+
+The user's monthly net cash flows are resampled with replacement (or drawn
+from a normal distribution fitted to them) into a (months x paths) array, so
+every simulated path is one column of a single np.cumsum. A path runs out of
+cash in the first month its balance drops below zero. From the paths come the
+probability of cash-out by each month, percentiles of the runway, and
+percentile bands of the balance itself.
+
+Exact percentiles need a partial sort per month, which would cost more than
+the whole simulation at 100k paths, so the balance bands are taken over the
+first BAND_PATHS paths; cash-out probabilities and runway use every path.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from src import ledger, seasonality
+from src.categories import ACTIVITY_TYPES
+
+DEFAULT_PATHS = 10_000
+DEFAULT_MONTHS = 36
+BAND_PATHS = 10_000
+METHODS = ('bootstrap', 'normal')
+
+Simulation = namedtuple('Simulation', [
+    'paths', 'months', 'method', 'starting_balance', 'history_months',
+    'cash_out_probability',  # [P(out of cash by month 1), ..., by month `months`]
+    'runway_p10', 'runway_median', 'runway_p90',  # months; inf when beyond the horizon
+    'balance_p10', 'balance_median', 'balance_p90',  # per month, end-of-month balance
+])
+
+
+def monthly_net_flows(user_id):
+    """Net categorised cash flow of every month from the user's first to last, empty months as zero."""
+    # Same types as the balance on /cash-overview, which is where the simulation starts
+    rows = ledger.monthly_totals(user_id, ACTIVITY_TYPES)
+    _, flows = seasonality.resample([month for month, _, _ in rows],
+                                    [inflow - outflow for _, inflow, outflow in rows], 'M')
+    return flows
+
+
+def simulate_user(user_id, starting_balance, **options):
+    """simulate() over the user's monthly net flows; None when the user has no transactions."""
+    flows = monthly_net_flows(user_id)
+    if flows.size == 0:
+        return None
+    return simulate(starting_balance, flows, **options)
+
+
+def simulate(starting_balance, monthly_flows, months=DEFAULT_MONTHS, paths=DEFAULT_PATHS,
+             method='bootstrap', seed=None):
+    """
+    Simulate `paths` balance paths `months` ahead.
+
+    Args:
+        starting_balance: cash on hand now
+        monthly_flows: historical monthly net flows to sample from
+        method: 'bootstrap' (resample history) or 'normal' (fitted mean and standard deviation)
+        seed: seed for np.random.default_rng, for reproducible results
+
+    Returns:
+        Simulation
+    """
+    flows = np.asarray(monthly_flows, dtype=float)
+    if flows.size == 0:
+        raise ValueError("Runway simulation needs at least one month of cash flow")
+    if method not in METHODS:
+        raise ValueError(f"Unsupported simulation method: {method}")
+
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        draws = flows[rng.integers(0, flows.size, size=(months, paths), dtype=np.int32)]
+    else:
+        draws = rng.normal(flows.mean(), flows.std(), size=(months, paths))
+    balances = np.cumsum(draws, axis=0, out=draws)
+    balances += starting_balance
+
+    if starting_balance < 0:
+        runway = np.zeros(paths)
+    else:
+        # Month of the first negative balance (1-based), inf for paths that never go negative
+        negative = balances < 0
+        runway = np.where(negative.any(axis=0), negative.argmax(axis=0) + 1.0, np.inf)
+    ran_out = np.bincount(np.minimum(runway, months + 1).astype(np.int64), minlength=months + 2)
+    cash_out_probability = np.cumsum(ran_out)[1:months + 1] / paths
+    if starting_balance < 0:
+        cash_out_probability[:] = 1.0
+
+    # inverted_cdf picks observed values, so inf percentiles stay inf instead of becoming NaN
+    runway_p10, runway_median, runway_p90 = np.quantile(runway, [0.1, 0.5, 0.9], method='inverted_cdf')
+    balance_p10, balance_median, balance_p90 = np.percentile(balances[:, :BAND_PATHS], [10, 50, 90], axis=1)
+    return Simulation(paths, months, method, float(starting_balance), int(flows.size),
+                      cash_out_probability, float(runway_p10), float(runway_median), float(runway_p90),
+                      balance_p10, balance_median, balance_p90)
+
+
+def _months_or_none(value):
+    return None if np.isinf(value) else value
+
+
+def to_dict(simulation):
+    """JSON-ready simulation; runway percentiles beyond the horizon become None."""
+    return {
+        'paths': simulation.paths,
+        'months': simulation.months,
+        'method': simulation.method,
+        'starting_balance': simulation.starting_balance,
+        'history_months': simulation.history_months,
+        'cash_out_probability': simulation.cash_out_probability.tolist(),
+        'runway_months': {
+            'p10': _months_or_none(simulation.runway_p10),
+            'median': _months_or_none(simulation.runway_median),
+            'p90': _months_or_none(simulation.runway_p90),
+        },
+        'balance': {
+            'p10': simulation.balance_p10.tolist(),
+            'median': simulation.balance_median.tolist(),
+            'p90': simulation.balance_p90.tolist(),
+        },
+    }
@@ -0,0 +1,137 @@
+"""
+Seasonal decomposition of cash flows in NumPy.
+
+Transactions arrive at irregular dates, so they are first summed onto a
+regular daily, weekly or monthly grid (empty periods count as zero) with
+one np.bincount. The grid is then split additively into
+
+    observed = trend + seasonal + resid
+
+where trend is a centred moving average over one season (2 x period for
+even periods, as in classical decomposition), seasonal repeats the mean
+detrended value at each position in the season (centred to sum to zero),
+and resid is what is left. Every step is a whole-array operation.
+
+Additive rather than multiplicative, since net cash flow changes sign.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# Grid frequency -> default season length in periods
+PERIODS = {'D': 7, 'W': 52, 'M': 12}
+
+Decomposition = namedtuple('Decomposition', [
+    'freq', 'period', 'index', 'observed', 'trend', 'seasonal', 'resid', 'seasonal_indices',
+])
+
+
+def resample(dates, amounts, freq='M'):
+    """
+    Sum amounts per period on a regular grid.
+
+    Args:
+        dates: array-like of dates (anything np.datetime64 accepts)
+        amounts: array-like of amounts, same length
+        freq: 'D', 'W' (weeks starting Monday) or 'M'
+
+    Returns:
+        (period start dates as datetime64[D], totals as float64), oldest first
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    amounts = np.asarray(amounts, dtype=float)
+    if days.size == 0:
+        return np.array([], dtype='datetime64[D]'), np.array([], dtype=float)
+
+    if freq == 'D':
+        keys = days.astype(np.int64)
+    elif freq == 'W':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        keys = (days.astype(np.int64) + 3) // 7
+    elif freq == 'M':
+        keys = days.astype('datetime64[M]').astype(np.int64)
+    else:
+        raise ValueError(f"Unsupported frequency: {freq}")
+
+    first = keys.min()
+    totals = np.bincount(keys - first, weights=amounts)
+    grid = np.arange(first, first + totals.size)
+    if freq == 'D':
+        starts = grid.astype('datetime64[D]')
+    elif freq == 'W':
+        starts = (grid * 7 - 3).astype('datetime64[D]')
+    else:
+        starts = grid.astype('datetime64[M]').astype('datetime64[D]')
+    return starts, totals
+
+
+def moving_average_trend(values, period):
+    """Centred moving average over one season; NaN where the window runs off either end."""
+    if period % 2:
+        weights = np.full(period, 1.0 / period)
+    else:
+        weights = np.r_[0.5, np.ones(period - 1), 0.5] / period
+    trend = np.full(values.size, np.nan)
+    if values.size >= weights.size:
+        half = weights.size // 2
+        trend[half:values.size - half] = np.convolve(values, weights, mode='valid')
+    return trend
+
+
+def seasonal_indices(detrended, period, phase=0):
+    """
+    Mean detrended value at each season position, ignoring NaN, centred to sum to zero.
+
+    `phase` is the season position of the first value (e.g. its month of year - 1).
+    """
+    padded = np.full(-(-(detrended.size + phase) // period) * period, np.nan)
+    padded[phase:phase + detrended.size] = detrended
+    by_position = padded.reshape(-1, period)
+    counts = np.sum(~np.isnan(by_position), axis=0)
+    sums = np.nansum(by_position, axis=0)
+    indices = np.divide(sums, counts, out=np.zeros(period), where=counts > 0)
+    return indices - indices.mean()
+
+
+def decompose(values, period, freq=None, index=None, phase=0):
+    """
+    Additive decomposition of a regular series.
+
+    Needs two full seasons; with less history seasonal is all zeros and
+    seasonal_indices is empty, while trend is still the moving average.
+    seasonal_indices[0] is the season position `phase` puts the first value at.
+    """
+    values = np.asarray(values, dtype=float)
+    trend = moving_average_trend(values, period)
+    if values.size >= 2 * period:
+        indices = seasonal_indices(values - trend, period, phase)
+        seasonal = indices[(np.arange(values.size) + phase) % period]
+    else:
+        indices = np.array([])
+        seasonal = np.zeros(values.size)
+    return Decomposition(freq, period, index, values, trend, seasonal, values - trend - seasonal, indices)
+
+
+def season_position(start, freq, period):
+    """Calendar position of a period start within its season: month of year, weekday, week of year."""
+    start = np.datetime64(start, 'D')
+    if freq == 'M':
+        offset = start.astype('datetime64[M]').astype(np.int64) % 12
+    elif freq == 'D':
+        offset = (start.astype(np.int64) + 3) % 7  # Monday is 0
+    else:
+        offset = (start - start.astype('datetime64[Y]').astype('datetime64[D]')).astype(np.int64) // 7
+    return int(offset % period)
+
+
+def decompose_transactions(dates, amounts, freq='M', period=None):
+    """
+    Resample transactions onto a `freq` grid and decompose it.
+
+    The period defaults per PERIODS, and seasonal_indices are calendar
+    aligned, so for the defaults index 0 is January, Monday or week 1.
+    """
+    period = period or PERIODS[freq]
+    index, values = resample(dates, amounts, freq)
+    phase = season_position(index[0], freq, period) if index.size else 0
+    return decompose(values, period, freq=freq, index=index, phase=phase)
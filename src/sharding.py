@@ -0,0 +1,182 @@
+"""
+Optional per-tenant sharding of the ledger tables.
+
+With SHARD_COUNT > 0 every table marked with info={'sharded': True} lives in
+one of N SQLite files, chosen by a stable hash of the owning user's id, while
+User and UserPreferences stay in the main (directory) database. Each tenant's
+writes then only take its own shard's file lock.
+
+RoutingSession asks current_shard() which shard to use: inside a request that
+is the logged-in user's shard; CLI and background code selects one explicitly
+with tenant(db, user_id) or use_shard(key).
+"""
+import hashlib
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import delete, insert, inspect, select
+from sqlalchemy.sql.util import find_tables
+
+SHARD_PREFIX = 'shard_'
+
+_selected_shard = ContextVar('selected_shard', default=None)
+
+
+def shard_uris(directory, count):
+    """SQLite URIs of the shard files, in shard order."""
+    return [f"sqlite:///{os.path.join(directory, f'{SHARD_PREFIX}{i}.db')}" for i in range(count)]
+
+
+def shard_keys(engines):
+    """Bind keys of the configured shards, in shard order."""
+    keys = [key for key in engines if key and key.startswith(SHARD_PREFIX)]
+    return sorted(keys, key=lambda key: int(key[len(SHARD_PREFIX):]))
+
+
+def shard_for(user_id, count):
+    """Bind key of the shard that owns a user; stable across processes and restarts."""
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return f"{SHARD_PREFIX}{int.from_bytes(digest, 'big') % count}"
+
+
+def is_sharded(mapper=None, clause=None):
+    """Whether a mapper or statement touches a sharded table."""
+    if mapper is not None:
+        return bool(mapper.local_table.info.get('sharded'))
+    if clause is not None:
+        return any(table.info.get('sharded') for table in find_tables(clause, include_crud=True))
+    return False
+
+
+def current_shard(engines):
+    """Bind key for sharded statements in the current context."""
+    key = _selected_shard.get()
+    if key is not None:
+        return key
+    if has_request_context() and current_user.is_authenticated:
+        return shard_for(current_user.id, len(shard_keys(engines)))
+    raise RuntimeError("No tenant selected for a sharded table; wrap the call in sharding.tenant(db, user_id)")
+
+
+@contextmanager
+def use_shard(key):
+    """Send sharded statements to one shard for the duration of the block."""
+    token = _selected_shard.set(key)
+    try:
+        yield key
+    finally:
+        _selected_shard.reset(token)
+
+
+def tenant(db, user_id):
+    """Send sharded statements to the shard that owns user_id (a no-op when sharding is off)."""
+    keys = shard_keys(db.engines)
+    return use_shard(shard_for(user_id, len(keys)) if keys else None)
+
+
+def each_shard(db, user_id=None):
+    """
+    Run a block once per shard holding the user's (or every user's) rows.
+
+    Yields the selected bind key, or None when sharding is off. The session
+    is emptied between shards since primary keys repeat across shard files.
+    """
+    keys = shard_keys(db.engines)
+    if not keys:
+        yield None
+        return
+    if user_id is not None:
+        keys = [shard_for(user_id, len(keys))]
+    for key in keys:
+        with use_shard(key):
+            yield key
+        db.session.expunge_all()
+
+
+def sharded_tables(metadata):
+    """Sharded tables in dependency order."""
+    return [table for table in metadata.sorted_tables if table.info.get('sharded')]
+
+
+def owned_by(table, user_id):
+    """WHERE clause selecting a user's rows of a sharded table, directly or through its parent."""
+    if 'user_id' in table.c:
+        return table.c.user_id == user_id
+    for fk in table.foreign_keys:
+        parent = fk.column.table
+        if parent.info.get('sharded') and 'user_id' in parent.c:
+            return fk.parent.in_(select(fk.column).where(parent.c.user_id == user_id))
+    raise ValueError(f"Cannot tell which user owns rows of {table.name}")
+
+
+def create_shard_tables(db):
+    """
+    Create any missing sharded tables in every shard file.
+
+    Shard files are not under alembic, so nullable columns and indexes added
+    to a model since a shard was created are added here as well.
+    """
+    tables = sharded_tables(db.metadata)
+    for key in shard_keys(db.engines):
+        engine = db.engines[key]
+        db.metadata.create_all(bind=engine, tables=tables)
+        with engine.begin() as connection:
+            _add_missing_columns(connection, tables)
+
+
+def _add_missing_columns(connection, tables):
+    inspector = inspect(connection)
+    for table in tables:
+        present = {column['name'] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in present]
+        for column in missing:
+            if not column.nullable:
+                raise RuntimeError(f"Shard table {table.name} lacks NOT NULL column {column.name}")
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+        if missing:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
+def split_database(db, keep_source=False, batch_size=1000):
+    """
+    Move every user's sharded rows out of the main database into their shard.
+
+    Each user is copied in one shard transaction, replacing whatever an
+    earlier, interrupted run left there, and only then deleted from the
+    source, so the command can simply be re-run after a failure.
+
+    Returns:
+        dict of bind key -> number of rows copied
+    """
+    keys = shard_keys(db.engines)
+    if not keys:
+        raise RuntimeError("Sharding is disabled; set SHARD_COUNT first")
+
+    source = db.engines[None]
+    tables = sharded_tables(db.metadata)
+    users = db.metadata.tables['user']
+    with source.connect() as connection:
+        user_ids = list(connection.execute(select(users.c.id).order_by(users.c.id)).scalars())
+
+    copied = dict.fromkeys(keys, 0)
+    create_shard_tables(db)
+    for user_id in user_ids:
+        key = shard_for(user_id, len(keys))
+        with source.connect() as reader, db.engines[key].begin() as target:
+            for table in reversed(tables):
+                target.execute(delete(table).where(owned_by(table, user_id)))
+            for table in tables:
+                result = reader.execute(select(table).where(owned_by(table, user_id)))
+                for rows in result.mappings().partitions(batch_size):
+                    target.execute(insert(table), [dict(row) for row in rows])
+                    copied[key] += len(rows)
+        if not keep_source:
+            with source.begin() as writer:
+                for table in reversed(tables):
+                    writer.execute(delete(table).where(owned_by(table, user_id)))
+    return copied
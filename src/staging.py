@@ -0,0 +1,152 @@
+"""
+Server-side staging of cleaned uploads awaiting review.
+
+process_upload streams the cleaned rows into staged_row under a random token
+instead of returning them all to the browser. The browser pages through them,
+sends back only the types it changed, and commit_staged moves the rows into
+Transaction with one INSERT ... SELECT, skipping rows already imported
+before (see src.fingerprint). Staged uploads expire after
+STAGED_UPLOAD_TTL seconds; purge_expired() deletes them and runs on every new
+upload as well as from `flask staging purge`.
+"""
+import secrets
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, exists, insert, literal, select, update
+
+from src import fingerprint, ledger
+from src.categories import ACTIVITY_TYPES
+from src.models import db, StagedUpload, StagedRow, Transaction
+
+DEFAULT_TTL = 3600  # seconds
+PREVIEW_PAGE_SIZE = 50
+
+
+def create(user_id, filename):
+    """Start a staged upload; rows are added with add_rows()."""
+    purge_expired()
+    ttl = current_app.config.get('STAGED_UPLOAD_TTL', DEFAULT_TTL)
+    upload = StagedUpload(
+        token=secrets.token_hex(16),
+        user_id=user_id,
+        filename=filename,
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+    )
+    db.session.add(upload)
+    db.session.flush()
+    return upload
+
+
+def add_rows(upload, rows):
+    """Append cleaned rows (dicts with date, description, amount, type) in file order."""
+    if not rows:
+        return
+    start = upload.row_count
+    db.session.execute(insert(StagedRow.__table__), [
+        {'upload_id': upload.id, 'row_index': start + i, 'date': row['date'],
+         'description': row['description'], 'amount': row['amount'], 'type': row['type'],
+         'base_fingerprint': fingerprint.base_fingerprint(upload.user_id, row['date'], row['amount'], row['description'])}
+        for i, row in enumerate(rows)
+    ])
+    upload.row_count = start + len(rows)
+
+
+def get_upload(token, user_id):
+    """The user's unexpired staged upload for a token, or None."""
+    return StagedUpload.query.filter(
+        StagedUpload.token == token,
+        StagedUpload.user_id == user_id,
+        StagedUpload.expires_at > datetime.utcnow(),
+    ).first()
+
+
+def preview(upload, page=1, per_page=PREVIEW_PAGE_SIZE):
+    """One page of staged rows; row_index is dense, so a page is an index range, not an OFFSET."""
+    pages = max(1, -(-upload.row_count // per_page))
+    page = min(max(page, 1), pages)
+    rows = db.session.execute(
+        select(StagedRow.row_index, StagedRow.date, StagedRow.description, StagedRow.amount, StagedRow.type)
+        .where(StagedRow.upload_id == upload.id,
+               StagedRow.row_index >= (page - 1) * per_page,
+               StagedRow.row_index < page * per_page)
+        .order_by(StagedRow.row_index)
+    )
+    return {
+        'token': upload.token,
+        'filename': upload.filename,
+        'total': upload.row_count,
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'expires_at': upload.expires_at.isoformat(),
+        'columns': ['date', 'description', 'amount', 'type'],
+        'rows': [{'row': row_index, 'date': day.isoformat(), 'description': description,
+                  'amount': amount, 'type': t_type}
+                 for row_index, day, description, amount, t_type in rows],
+    }
+
+
+def commit_staged(upload, type_overrides=None):
+    """
+    Move a staged upload into the user's transactions and drop it.
+
+    Args:
+        upload: StagedUpload
+        type_overrides: {row_index: type} chosen by the user in the preview
+
+    Returns:
+        number of transactions inserted; the rest of upload.row_count were duplicates
+    """
+    overrides = {int(row): t_type for row, t_type in (type_overrides or {}).items()}
+    unknown = sorted({t_type for t_type in overrides.values() if t_type not in ACTIVITY_TYPES})
+    if unknown:
+        raise ValueError(f"Unknown transaction type(s): {', '.join(unknown)}")
+
+    staged = StagedRow.__table__
+    if overrides:
+        db.session.execute(
+            update(staged)
+            .where(staged.c.upload_id == upload.id, staged.c.row_index == bindparam('row'))
+            .values(type=bindparam('new_type')),
+            [{'row': row, 'new_type': t_type} for row, t_type in overrides.items()],
+        )
+
+    # Number repeated rows within the file, then keep only fingerprints the ledger lacks
+    # (an anti-join on the unique fingerprint index, so dedupe is one pass)
+    transactions = Transaction.__table__
+    numbered = select(
+        staged.c.row_index, staged.c.date, staged.c.description, staged.c.amount, staged.c.type,
+        fingerprint.numbered(staged.c.base_fingerprint, staged.c.row_index).label('fingerprint'),
+    ).where(staged.c.upload_id == upload.id).subquery()
+    new_rows = ~exists().where(transactions.c.fingerprint == numbered.c.fingerprint)
+
+    ledger.prepare(upload.user_id)
+    # Grouped by day and type in SQL before the insert (which makes the rows no longer new)
+    changes = ledger.Changes.from_select(
+        select(numbered.c.date, numbered.c.amount, numbered.c.type).where(new_rows).subquery()
+    )
+    db.session.execute(insert(transactions).from_select(
+        ['user_id', 'date', 'description', 'amount', 'type', 'fingerprint'],
+        select(
+            literal(upload.user_id), numbered.c.date, numbered.c.description, numbered.c.amount,
+            numbered.c.type, numbered.c.fingerprint,
+        ).where(new_rows).order_by(numbered.c.row_index),
+    ))
+    ledger.apply_changes(upload.user_id, changes)
+    discard(upload)
+    return changes.count
+
+
+def discard(upload):
+    db.session.execute(delete(StagedRow.__table__).where(StagedRow.__table__.c.upload_id == upload.id))
+    db.session.delete(upload)
+
+
+def purge_expired(now=None):
+    """Delete expired staged uploads and their rows; returns how many uploads went."""
+    now = now or datetime.utcnow()
+    uploads = StagedUpload.__table__
+    expired = select(uploads.c.id).where(uploads.c.expires_at <= now)
+    db.session.execute(delete(StagedRow.__table__).where(StagedRow.__table__.c.upload_id.in_(expired)))
+    return db.session.execute(delete(uploads).where(uploads.c.expires_at <= now)).rowcount
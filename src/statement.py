@@ -0,0 +1,54 @@
+"""
+Cash flow statement built from database aggregates.
+
+One GROUP BY type over the requested period (src.aggregates) gives every
+line of the statement; the opening balance is the initial balance plus the
+ledger's running balance the day before the period starts. No transaction
+rows are loaded and no model is called.
+"""
+from datetime import timedelta
+
+from src import aggregates, ledger
+from src.categories import ACTIVITIES
+
+
+def build_cashflow_statement(user_id, initial_balance=0.0, start_date=None, end_date=None):
+    """
+    Statement of a user's cash flows between optional inclusive date bounds.
+
+    Open bounds default to the user's first / last transaction date.
+
+    Returns:
+        dict with start_date, end_date, beginning_balance, lines (list of
+        {'Category', 'Subcategory', 'Amount'} in registry order),
+        activity_totals, net_cash_flow and ending_balance; None when the
+        user has no transactions at all
+    """
+    summary = ledger.get_summary(user_id)
+    if not summary.transaction_count:
+        return None
+    start_date = start_date or summary.first_date
+    end_date = end_date or summary.last_date
+    if start_date > end_date:
+        raise ValueError("start_date must not be after end_date")
+
+    type_totals = aggregates.totals_by_type(user_id, start_date, end_date)
+    totals = {row.type: row.total for row in type_totals}
+    lines = [
+        {'Category': activity, 'Subcategory': t_type, 'Amount': totals[t_type]}
+        for activity, types in ACTIVITIES.items()
+        for t_type in types if t_type in totals
+    ]
+    activity_totals = aggregates.by_activity(type_totals)
+
+    beginning_balance = initial_balance + ledger.balance_as_of(user_id, start_date - timedelta(days=1))
+    net_cash_flow = sum(activity_totals.values())
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'beginning_balance': beginning_balance,
+        'lines': lines,
+        'activity_totals': activity_totals,
+        'net_cash_flow': net_cash_flow,
+        'ending_balance': beginning_balance + net_cash_flow,
+    }
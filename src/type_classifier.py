@@ -0,0 +1,47 @@
+"""
+Keyword-based transaction type classification for uploaded files.
+
+A value gets the first type, in table order, that has any keyword as a
+substring of the lowercased value. The whole table is compiled into one
+regex: an alternation of lookaheads, one branch per type in priority order,
+so the regex engine's own first-branch-wins rule gives the same answer as
+looping over the table. Series are classified per distinct value only.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class TypeClassifier:
+    """Maps free-text type labels onto the allowed transaction types."""
+
+    def __init__(self, keyword_table, default):
+        """
+        Args:
+            keyword_table: ordered {type: [keyword, ...]}; earlier types win
+            default: type for values that match no keyword
+        """
+        self.types = list(keyword_table)
+        self.default = default
+        branches = [
+            rf"(?=[\s\S]*?(?:{'|'.join(re.escape(keyword) for keyword in keywords)}))(?P<t{i}>)"
+            for i, keywords in enumerate(keyword_table.values()) if keywords
+        ]
+        self.pattern = re.compile('(?:' + '|'.join(branches) + ')') if branches else None
+
+    def classify(self, value):
+        """Type for a single value (compared as str(value).lower())."""
+        if self.pattern is None:
+            return self.default
+        match = self.pattern.match(str(value).lower())
+        if match is None:
+            return self.default
+        return self.types[int(match.lastgroup[1:])]
+
+    def classify_series(self, series):
+        """Vectorised classify(): one regex match per distinct value."""
+        codes, uniques = pd.factorize(series.astype(str).str.lower())
+        labels = np.array([self.classify(value) for value in uniques] + [self.default], dtype=object)
+        # factorize never returns -1 here (astype(str) turns NaN into 'nan'), but keep it safe
+        return pd.Series(labels[codes], index=series.index, dtype=object)
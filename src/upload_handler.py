@@ -1,8 +1,17 @@
 import pandas as pd
 from flask import current_app,jsonify,request
-import os
+from openpyxl import load_workbook
 from werkzeug.utils import secure_filename
 
+from src import columnar, ledger, staging
+from src.date_parser import DateParser
+from src.type_classifier import TypeClassifier
+
+# Rows read, cleaned and inserted at a time when importing directly
+CHUNK_SIZE = 10000
+# Rows echoed back to the browser after a direct import
+PREVIEW_ROWS = 20
+
 #The dictionary of selection options and keywords
 ALLOWED_TYPES = {
     "Cash-customer": ["cash", "customer", "receipt"],
@@ -22,12 +31,20 @@ ALLOWED_TYPES = {
     "Other-cff": ["financing", "cff"]
 }
 
-#check allowed file extention type to accept csv and excel
+# First matching type wins, in the order above
+TYPE_CLASSIFIER = TypeClassifier(ALLOWED_TYPES, default="Other-cfo")
+
+#check allowed file extention type to accept csv, excel, parquet and arrow
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'csv', 'xlsx', 'xls'}
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'csv', 'xlsx', 'xls', *columnar.EXTENSIONS}
 
 #key part - data cleaning of each column for uploaded file
-def clean_data(df):
+def clean_data(df, date_parser=None):
+    """
+    Clean one frame of an upload. Pass the same date_parser for every chunk of
+    a file so formats are inferred once and failures are counted per upload.
+    """
+    date_parser = date_parser or DateParser()
     try:
         # Convert column names to lowercase
         df.columns = df.columns.str.lower()
@@ -43,8 +60,8 @@ def clean_data(df):
             current_app.logger.warning("'type' column not found. Adding it with default value 'Other-cfo'")
             df['type'] = 'Other-cfo'
 
-        # Convert 'date' to datetime, then to string format 'YYYY-MM-DD'
-        df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        # Parse 'date' with the formats inferred for this upload; failures become NaT
+        df['date'] = date_parser.parse(df['date'])
 
         # Ensure amount is numeric
         df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
@@ -52,15 +69,8 @@ def clean_data(df):
         # Log original types
         current_app.logger.info(f"Original types: {df['type'].unique().tolist()}")
 
-        # Validate and map 'type' to allowed types
-        def map_type(type_value):
-            type_value = str(type_value).lower()
-            for allowed_type, keywords in ALLOWED_TYPES.items():
-                if any(keyword in type_value for keyword in keywords):
-                    return allowed_type
-            return "Other-cfo"  # Default to Other-cfo if not recognized
-
-        df['type'] = df['type'].apply(map_type)
+        # Validate and map 'type' to allowed types (Other-cfo if not recognized)
+        df['type'] = TYPE_CLASSIFIER.classify_series(df['type'])
 
         # Log the unique types after mapping
         current_app.logger.info(f"Unique types after mapping: {df['type'].unique().tolist()}")
@@ -75,37 +85,143 @@ def clean_data(df):
         current_app.logger.error(f"Error in clean_data: {str(e)}")
         raise
 
-# csv/excel file upload to temp folder and apply cleaning rules
-def process_upload(file):
+# csv/excel file cleaned chunk by chunk and staged server-side for review
+def process_upload(file, user_id, dayfirst=None, progress=None):
+    """
+    Clean an upload into a staged upload and return its first preview page.
+
+    `dayfirst` forces the day/month order of ambiguous dates (None infers it).
+    The caller owns the commit; `progress` is called with the running
+    rows_read/rows_skipped counts after each chunk, as in ingest_upload.
+    """
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
         try:
-            if filename.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            elif filename.endswith(('.xls', '.xlsx')):
-                df = pd.read_excel(file_path)
-            else:
-                raise ValueError('Unsupported file type')
-            
-            current_app.logger.info(f"File read successfully. Shape: {df.shape}")
-            current_app.logger.info(f"Columns: {df.columns.tolist()}")
-            
-            cleaned_df = clean_data(df)
-            
-            return {
-                'message': 'File processed successfully',
-                'data': cleaned_df.to_dict('records'),
-                'columns': cleaned_df.columns.tolist()
-            }
-        
+            upload = staging.create(user_id, secure_filename(file.filename))
+            date_parser = DateParser(dayfirst=dayfirst)
+            rows_read = 0
+            for chunk in read_chunks(file):
+                rows_read += len(chunk)
+                staging.add_rows(upload, transaction_rows(clean_data(chunk, date_parser), user_id))
+                if progress:
+                    progress({'rows_read': rows_read, 'rows_skipped': rows_read - upload.row_count})
+            current_app.logger.info(f"Staged {upload.row_count} rows from {upload.filename}, dates: {date_parser.report()}")
+
+            return {'message': 'File processed successfully', 'dates': date_parser.report(), **staging.preview(upload)}
+
         except Exception as e:
             current_app.logger.error(f"Error processing file: {str(e)}")
             raise
-        
-        finally:
-            os.remove(file_path)  # Remove the uploaded file after processing
     else:
-        raise ValueError('Invalid file type')
\ No newline at end of file
+        raise ValueError('Invalid file type')
+
+
+def read_chunks(file, chunksize=CHUNK_SIZE):
+    """Yield an uploaded CSV/Excel/Parquet/Arrow file as DataFrames of at most `chunksize` rows."""
+    filename = secure_filename(file.filename)
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in columnar.EXTENSIONS:
+        yield from columnar.read_chunks(file.stream, columnar.EXTENSIONS[extension], chunksize)
+    elif filename.endswith('.csv'):
+        with pd.read_csv(file.stream, chunksize=chunksize) as reader:
+            yield from reader
+    elif filename.endswith('.xlsx'):
+        yield from _xlsx_chunks(file.stream, chunksize)
+    elif filename.endswith('.xls'):
+        # The legacy format has no row-streaming reader; read it whole and slice
+        df = pd.read_excel(file.stream)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    else:
+        raise ValueError('Unsupported file type')
+
+
+def _xlsx_chunks(stream, chunksize):
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = ['' if cell is None else str(cell).strip() for cell in next(rows, ())]
+        batch = []
+        for row in rows:
+            if all(cell is None for cell in row):
+                continue
+            batch.append(row[:len(header)])
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def transaction_rows(df, user_id):
+    """Turn a cleaned frame into Transaction row dicts for staging.add_rows."""
+    descriptions = df['description'].astype(str) if 'description' in df.columns else [''] * len(df)
+    return [
+        {'user_id': user_id, 'date': day, 'description': description, 'amount': float(amount), 'type': t_type}
+        for day, description, amount, t_type in zip(
+            df['date'].dt.date, descriptions, df['amount'], df['type'])
+    ]
+
+
+# csv/excel file cleaned and inserted chunk by chunk, without a copy in uploads/ or in the browser
+def ingest_upload(file, user_id, chunksize=CHUNK_SIZE, preview_rows=PREVIEW_ROWS, progress=None, dayfirst=None):
+    """
+    Import an uploaded file straight into the user's transactions.
+
+    Only one chunk is held in memory at a time: chunks are staged as they are
+    read, then moved into the ledger in one statement that skips rows imported
+    before (re-uploading an overlapping export only adds the new rows). The
+    caller owns the commit, so a failure part-way leaves nothing behind once it
+    rolls back, unless `progress` commits: it is called with the running stats
+    after each chunk, and anything staged so far simply expires. `dayfirst`
+    is as for process_upload.
+
+    Returns:
+        dict with import statistics and the first `preview_rows` rows read
+    """
+    if not (file and allowed_file(file.filename)):
+        raise ValueError('Invalid file type')
+
+    stats = {'rows_read': 0, 'rows_imported': 0, 'rows_skipped': 0, 'rows_duplicate': 0, 'chunks': 0,
+             'net_amount': 0.0, 'first_date': None, 'last_date': None}
+    preview = []
+    upload = staging.create(user_id, secure_filename(file.filename))
+    date_parser = DateParser(dayfirst=dayfirst)
+    for chunk in read_chunks(file, chunksize):
+        stats['rows_read'] += len(chunk)
+        rows = transaction_rows(clean_data(chunk, date_parser), user_id)
+        staging.add_rows(upload, rows)
+
+        stats['chunks'] += 1
+        if rows:
+            stats['net_amount'] += sum(row['amount'] for row in rows)
+            first, last = min(row['date'] for row in rows), max(row['date'] for row in rows)
+            stats['first_date'] = first if stats['first_date'] is None else min(stats['first_date'], first)
+            stats['last_date'] = last if stats['last_date'] is None else max(stats['last_date'], last)
+        for row in rows[:preview_rows - len(preview)]:
+            preview.append({'date': row['date'].isoformat(), 'description': row['description'],
+                            'amount': row['amount'], 'type': row['type']})
+        if progress:
+            stats['rows_skipped'] = stats['rows_read'] - upload.row_count
+            progress(stats)
+
+    staged = upload.row_count
+    stats['rows_imported'] = staging.commit_staged(upload)
+    stats['rows_duplicate'] = staged - stats['rows_imported']
+    stats['rows_skipped'] = stats['rows_read'] - staged
+    stats['rows_bad_date'] = date_parser.failed
+    for key in ('first_date', 'last_date'):
+        stats[key] = stats[key].isoformat() if stats[key] else None
+    current_app.logger.info(f"Imported upload in {stats['chunks']} chunk(s): {stats}")
+
+    message = f"Imported {stats['rows_imported']} transactions"
+    if stats['rows_duplicate']:
+        message += f"; {stats['rows_duplicate']} already imported"
+    return {
+        'message': message,
+        'stats': stats,
+        'dates': date_parser.report(),
+        'preview': preview,
+        'columns': ['date', 'description', 'amount', 'type'],
+    }
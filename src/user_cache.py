@@ -0,0 +1,158 @@
+"""
+Cache of per-user metadata: User, UserPreferences and InitialBalance.
+
+Every page needs these rows (the login loader, the navigation's module list,
+the balance header), so they are memoised twice:
+
+- per request in flask.g, so repeated lookups in a view and its templates
+  hit the database at most once;
+- across requests in a bounded LRU with a TTL (USER_CACHE_SIZE entries,
+  USER_CACHE_TTL seconds; size 0 disables it), holding plain column
+  snapshots that are merged back into the session without a query.
+
+Routes that change one of these rows call invalidate() after committing.
+The LRU is per process, so other workers may serve a stale row for up to
+USER_CACHE_TTL seconds.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.models import db, User, UserPreferences, InitialBalance
+
+USER = 'user'
+PREFERENCES = 'preferences'
+INITIAL_BALANCE = 'initial_balance'
+
+MODELS = {USER: User, PREFERENCES: UserPreferences, INITIAL_BALANCE: InitialBalance}
+
+# Marks a cached "no row for this user" result
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+shared = TTLCache()
+
+
+def init_app(app):
+    """Size the shared cache from USER_CACHE_SIZE / USER_CACHE_TTL."""
+    shared.maxsize = app.config.get('USER_CACHE_SIZE', shared.maxsize)
+    shared.ttl = app.config.get('USER_CACHE_TTL', shared.ttl)
+    shared.clear()
+
+
+def get_user(user_id):
+    """User by id, or None. On a miss the user's preferences are loaded in the same query."""
+    return _get(USER, user_id, _load_user)
+
+
+def get_preferences(user_id):
+    """The user's UserPreferences row, or None if it was never created."""
+    return _get(PREFERENCES, user_id, _load_user)
+
+
+def get_initial_balance(user_id):
+    """The user's InitialBalance row, or None if it was never set."""
+    return _get(INITIAL_BALANCE, user_id, _load_initial_balance)
+
+
+def initial_balance_amount(user_id):
+    record = get_initial_balance(user_id)
+    return record.balance if record else 0.0
+
+
+def invalidate(user_id, *kinds):
+    """Forget cached rows for a user (all kinds when none are given)."""
+    memo = g.get('_user_cache')
+    for kind in kinds or MODELS:
+        shared.pop((kind, user_id))
+        if memo is not None:
+            memo.pop((kind, user_id), None)
+
+
+def _get(kind, user_id, loader):
+    memo = g.setdefault('_user_cache', {})
+    key = (kind, user_id)
+    if key in memo:
+        return memo[key]
+
+    snapshot = shared.get(key)
+    if snapshot is None:
+        loaded = loader(user_id)
+        for loaded_kind, instance in loaded.items():
+            _remember(memo, (loaded_kind, user_id), instance)
+        return memo[key]
+
+    memo[key] = None if snapshot is _MISSING else _restore(kind, snapshot)
+    return memo[key]
+
+
+def _remember(memo, key, instance):
+    memo[key] = instance
+    shared.set(key, _MISSING if instance is None else _snapshot(instance))
+
+
+def _load_user(user_id):
+    row = db.session.query(User, UserPreferences).outerjoin(
+        UserPreferences, UserPreferences.user_id == User.id
+    ).filter(User.id == user_id).first()
+    user, preferences = row if row else (None, None)
+    return {USER: user, PREFERENCES: preferences}
+
+
+def _load_initial_balance(user_id):
+    return {INITIAL_BALANCE: InitialBalance.query.filter_by(user_id=user_id).first()}
+
+
+def _snapshot(instance):
+    return {attr.key: copy.deepcopy(getattr(instance, attr.key)) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _restore(kind, snapshot):
+    """Attach a cached row to the session as a persistent object, without a SELECT."""
+    instance = MODELS[kind](**copy.deepcopy(snapshot))
+    make_transient_to_detached(instance)
+    return db.session.merge(instance, load=False)
@@ -0,0 +1,134 @@
+"""
+Excel workbooks written in openpyxl's write-only mode.
+
+Rows go straight to a temporary file as they are appended, so memory does
+not grow with the row count. Formatting uses named styles registered once
+per workbook, and each styled column reuses one cell object whose value is
+replaced row after row, so no Font/Border/Alignment is allocated per cell.
+Both the transaction export and the cash flow statement are written here.
+"""
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from src.categories import ACTIVITIES, ACTIVITY_LABELS
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+AMOUNT_FORMAT = '#,##0.00'
+
+
+def _named_styles():
+    """Fresh NamedStyle objects; openpyxl binds each one to a single workbook."""
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    grey = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
+    right = Alignment(horizontal='right')
+    return [
+        NamedStyle('header', font=Font(bold=True), fill=grey),
+        NamedStyle('amount', number_format=AMOUNT_FORMAT),
+        # Cash flow statement: every cell is boxed, amounts right-aligned
+        NamedStyle('statement_title', font=Font(bold=True, size=14), border=border),
+        NamedStyle('statement_header', font=Font(bold=True), fill=grey, border=border),
+        NamedStyle('statement_section', font=Font(bold=True), fill=grey, border=border),
+        NamedStyle('statement_label', border=border),
+        NamedStyle('statement_item', border=border, alignment=Alignment(indent=1)),
+        NamedStyle('statement_total', font=Font(bold=True), border=border),
+        NamedStyle('statement_amount', number_format=AMOUNT_FORMAT, border=border, alignment=right),
+        NamedStyle('statement_amount_total', font=Font(bold=True), number_format=AMOUNT_FORMAT,
+                   border=border, alignment=right),
+        NamedStyle('statement_blank', border=border, alignment=right),
+    ]
+
+
+class Sheet:
+    """A write-only worksheet that appends rows with per-column named styles."""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self._cells = {}
+
+    def append(self, values, styles=()):
+        """Write one row; styles[i] names column i's style (None or missing: unstyled)."""
+        row = []
+        for column, value in enumerate(values):
+            style = styles[column] if column < len(styles) else None
+            if style is None:
+                row.append(value)
+                continue
+            # The row is serialised on append, so one cell per (column, style) can be reused
+            cell = self._cells.get((column, style))
+            if cell is None:
+                cell = self._cells[column, style] = WriteOnlyCell(self.worksheet)
+                cell.style = style
+            cell.value = value
+            row.append(cell)
+        self.worksheet.append(row)
+
+
+class WorkbookWriter:
+    """A write-only workbook with the shared named styles."""
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        for style in _named_styles():
+            self.workbook.add_named_style(style)
+
+    def add_sheet(self, title, widths=()):
+        """New sheet; column widths must be set before the first row is written."""
+        worksheet = self.workbook.create_sheet(title)
+        for column, width in enumerate(widths, start=1):
+            worksheet.column_dimensions[get_column_letter(column)].width = width
+        return Sheet(worksheet)
+
+    def save(self):
+        """Write the workbook to a temporary file and return it, rewound."""
+        output = tempfile.TemporaryFile()
+        self.workbook.save(output)
+        output.seek(0)
+        return output
+
+
+def write_transactions(batches, columns):
+    """Transaction export: a header row, then rows from batches of (date, description, amount, type)."""
+    writer = WorkbookWriter()
+    sheet = writer.add_sheet('Transactions', widths=(12, 40, 15, 25))
+    sheet.append(columns, styles=('header',) * len(columns))
+    row_styles = (None, None, 'amount', None)
+    for rows in batches:
+        for row in rows:
+            sheet.append(row, row_styles)
+    return writer.save()
+
+
+def write_cashflow_statement(statement):
+    """Cash flow statement workbook for a statement from src.statement.build_cashflow_statement."""
+    writer = WorkbookWriter()
+    sheet = writer.add_sheet('Cash Flow Statement', widths=(40, 15))
+    blank_row = ('statement_label', 'statement_blank')
+    item_row = ('statement_item', 'statement_amount')
+    total_row = ('statement_total', 'statement_amount_total')
+
+    title = f"Cash Flow Statement - {statement['start_date']} to {statement['end_date']}"
+    sheet.append([title, None], ('statement_title', 'statement_blank'))
+    sheet.append([None, None], blank_row)
+    sheet.append(['Category', 'Amount'], ('statement_header', 'statement_header'))
+    sheet.append(["Beginning Cash Balance", statement['beginning_balance']], total_row)
+    sheet.append([None, None], blank_row)
+
+    for category in ACTIVITIES:
+        sheet.append([f"Cash Flow from {ACTIVITY_LABELS[category]} Activities ({category})", None],
+                     ('statement_section', 'statement_blank'))
+        for line in statement['lines']:
+            if line['Category'] == category:
+                sheet.append([line['Subcategory'], line['Amount']], item_row)
+        sheet.append([f"Net Cash from {ACTIVITY_LABELS[category]}", statement['activity_totals'][category]], total_row)
+        sheet.append([None, None], blank_row)
+
+    sheet.append(["Total Net Cash Flow", statement['net_cash_flow']], total_row)
+    sheet.append([None, None], blank_row)
+    sheet.append(["Ending Cash Balance", statement['ending_balance']], total_row)
+    return writer.save()
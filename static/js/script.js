@@ -75,7 +75,7 @@ function handleAIAnalysis() {
             analysisDashboard.style.display = 'none';
             rawAnalysis.innerHTML = '';
             
-            fetch('/forecast')
+            fetch(forecastUrl())
                 .then(response => response.json())
                 .then(data => {
                     loadingDiv.style.display = 'none';
@@ -105,8 +105,8 @@ function handleAIAnalysis() {
                             updateForecastChart(data.forecasts);
                         }
                         
-                        // Display raw analysis
-                        rawAnalysis.innerHTML = `<pre>${data.ai_analysis}</pre>`;
+                        // Display the narrative: cached text at once, otherwise streamed as it is written
+                        showNarrative(rawAnalysis, data);
                     }
                 })
                 .catch(error => {
@@ -117,7 +117,71 @@ function handleAIAnalysis() {
     }
 }
 
-// AI generates cashflow statement
+// Fill `container` with the AI narrative, from the /forecast response or streamed over SSE
+function showNarrative(container, data) {
+    var pre = document.createElement('pre');
+    pre.style.whiteSpace = 'pre-wrap';
+    container.innerHTML = '';
+    container.appendChild(pre);
+    if (data.ai_analysis !== null && data.ai_analysis !== undefined) {
+        pre.textContent = data.ai_analysis;
+        return;
+    }
+    if (!data.stream_url) {
+        return;
+    }
+
+    if (window.narrativeSource) {
+        window.narrativeSource.close();
+    }
+    var source = window.narrativeSource = new EventSource(data.stream_url);
+    pre.textContent = 'Writing analysis...';
+    var started = false;
+    source.addEventListener('chunk', function(event) {
+        if (!started) {
+            pre.textContent = '';
+            started = true;
+        }
+        pre.textContent += JSON.parse(event.data).text;
+    });
+    source.addEventListener('done', function() {
+        source.close();
+    });
+    source.addEventListener('failed', function(event) {
+        source.close();
+        var message = document.createElement('p');
+        message.className = 'text-danger';
+        message.textContent = JSON.parse(event.data).error;
+        container.appendChild(message);
+    });
+    source.onerror = function() {
+        // Connection dropped; do not let EventSource start a second model call
+        source.close();
+    };
+}
+
+// Analysis URL; the refresh box asks for a new narrative even when the numbers are unchanged
+function forecastUrl() {
+    var refreshInput = document.querySelector('#refresh-analysis');
+    return refreshInput && refreshInput.checked ? '/forecast?refresh=1' : '/forecast';
+}
+
+// Statement download URL with the optional date range chosen on the page
+function cashflowStatementUrl() {
+    var params = new URLSearchParams();
+    var startInput = document.querySelector('#statement-start-date');
+    var endInput = document.querySelector('#statement-end-date');
+    if (startInput && startInput.value) {
+        params.set('start_date', startInput.value);
+    }
+    if (endInput && endInput.value) {
+        params.set('end_date', endInput.value);
+    }
+    var query = params.toString();
+    return '/generate_cashflow_statement' + (query ? `?${query}` : '');
+}
+
+// Cash flow statement built from the ledger totals
 function handleCashFlowStatement() {
     var generateButton = document.querySelector('#generate-cashflow-statement');
     if (generateButton) {
@@ -126,7 +190,7 @@ function handleCashFlowStatement() {
             var analysisContent = document.querySelector('#analysis-content');
             loadingDiv.style.display = 'block';
             analysisContent.innerHTML = '';
-            fetch('/generate_cashflow_statement')
+            fetch(cashflowStatementUrl())
                 .then(response => {
                     if (!response.ok) {
                         return response.json().then(err => {
@@ -210,7 +274,7 @@ function handleFileUpload() {
                 if (errorDiv) {
                     errorDiv.style.display = 'none';
                 }
-                displayDataPreview(data.data);
+                pollImportJob(data.status_url);
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -234,16 +298,50 @@ function handleFileUpload() {
     }
 }
 
-function displayDataPreview(data) {
-    console.log("displayDataPreview called with data:", data);
+// Type overrides chosen in the preview, keyed by staged row index
+var stagedTypeOverrides = {};
+// Date parsing report of the staged upload; only the first page carries it
+var stagedDateReport = null;
+
+// Warning text for unreadable or ambiguous dates in an upload, or null
+function dateReportWarning(dates) {
+    if (!dates) {
+        return null;
+    }
+    var warnings = [];
+    if (dates.failed > 0) {
+        var examples = dates.examples.map(value => value === '' ? '(blank)' : value).join(', ');
+        warnings.push(`${dates.failed} row(s) had a date that could not be read and were left out, e.g. ${examples}.`);
+    }
+    if (dates.ambiguous && dates.dayfirst) {
+        warnings.push(`${dates.ambiguous_rows} row(s) were read month first before later dates showed the file ` +
+                      'is day first; choose "Day first" and upload again.');
+    } else if (dates.ambiguous) {
+        warnings.push('Some dates could be day or month first and were read month first; ' +
+                      'choose "Day first" and upload again if that is wrong.');
+    }
+    return warnings.length ? warnings.join(' ') : null;
+}
+
+function displayDataPreview(page) {
+    console.log("displayDataPreview called with page:", page.page, "of", page.pages);
     var previewDiv = document.querySelector('#dataPreview');
+    if (previewDiv.dataset.token !== page.token) {
+        stagedTypeOverrides = {};
+        stagedDateReport = null;
+    }
+    if (page.dates) {
+        stagedDateReport = page.dates;
+    }
+    previewDiv.dataset.token = page.token;
+
     var table = document.createElement('table');
     table.className = 'table table-striped';
     var thead = document.createElement('thead');
     var tbody = document.createElement('tbody');
 
     // Define the correct column order
-    const columnOrder = ['date', 'description', 'amount', 'type'];
+    const columnOrder = page.columns;
 
     // Create table header
     var headerRow = document.createElement('tr');
@@ -290,15 +388,16 @@ function displayDataPreview(data) {
     ];
 
     // Create table body
-    data.forEach((row, rowIndex) => {
+    page.rows.forEach(row => {
         var tr = document.createElement('tr');
+        var currentType = stagedTypeOverrides[row.row] || row.type;
         columnOrder.forEach(key => {
             var td = document.createElement('td');
             if (key === 'type') {
                 // Create a dropdown for the type field
                 var select = document.createElement('select');
                 select.className = 'form-select';
-                select.name = `type_${rowIndex}`;
+                select.name = `type_${row.row}`;
 
                 let optionFound = false;
                 allowedTypes.forEach(group => {
@@ -308,7 +407,7 @@ function displayDataPreview(data) {
                         var optionElement = document.createElement('option');
                         optionElement.value = transactionTypeMapping[option] || option;
                         optionElement.textContent = option;
-                        if (option === row[key] || transactionTypeMapping[option] === row[key]) {
+                        if (option === currentType || transactionTypeMapping[option] === currentType) {
                             optionElement.selected = true;
                             optionFound = true;
                         }
@@ -322,6 +421,15 @@ function displayDataPreview(data) {
                     select.value = transactionTypeMapping["Other operating cashflow"] || "Other-cfo";
                 }
 
+                // Only changed rows are sent back when saving
+                select.addEventListener('change', function() {
+                    if (this.value === row.type) {
+                        delete stagedTypeOverrides[row.row];
+                    } else {
+                        stagedTypeOverrides[row.row] = this.value;
+                    }
+                });
+
                 td.appendChild(select);
             } else {
                 td.textContent = row[key];
@@ -333,51 +441,149 @@ function displayDataPreview(data) {
     table.appendChild(tbody);
 
     previewDiv.innerHTML = '';
+    var summary = document.createElement('p');
+    summary.textContent = `${page.total} rows from ${page.filename} - page ${page.page} of ${page.pages}`;
+    previewDiv.appendChild(summary);
+    var dateWarning = dateReportWarning(stagedDateReport);
+    if (dateWarning) {
+        var warningDiv = document.createElement('div');
+        warningDiv.className = 'alert alert-warning';
+        warningDiv.textContent = dateWarning;
+        previewDiv.appendChild(warningDiv);
+    }
     previewDiv.appendChild(table);
     previewDiv.style.display = 'block';
 
+    // Page through the staged rows
+    [['Previous', page.page - 1, page.page > 1], ['Next', page.page + 1, page.page < page.pages]].forEach(([label, target, enabled]) => {
+        var pageButton = document.createElement('button');
+        pageButton.textContent = label;
+        pageButton.className = 'btn btn-outline-secondary mt-3 me-2';
+        pageButton.disabled = !enabled;
+        pageButton.addEventListener('click', function() {
+            fetch(`/staged/${page.token}?page=${target}`)
+                .then(response => response.json().then(body => {
+                    if (!response.ok) {
+                        throw new Error(body.error || 'Failed to load preview');
+                    }
+                    return body;
+                }))
+                .then(displayDataPreview)
+                .catch(error => alert(error.message));
+        });
+        previewDiv.appendChild(pageButton);
+    });
+
     // Add save button
     var saveButton = document.createElement('button');
     saveButton.textContent = 'Save Transactions';
+    saveButton.id = 'saveStagedButton';
     saveButton.className = 'btn btn-primary mt-3';
     saveButton.addEventListener('click', function() {
-        saveTransactions(getUpdatedData(data));
+        saveTransactions(page.token);
     });
     previewDiv.appendChild(saveButton);
 }
 
-// Update getUpdatedData function to maintain the correct order
-function getUpdatedData(originalData) {
-    const columnOrder = ['date', 'description', 'amount', 'type'];
-    var updatedData = originalData.map((row, index) => {
-        var updatedRow = {};
-        columnOrder.forEach(key => {
-            if (key === 'type') {
-                var typeSelect = document.querySelector(`select[name="type_${index}"]`);
-                updatedRow[key] = typeSelect ? typeSelect.value : row[key];
+// Poll a background upload job until it finishes, showing its row counters, then
+// the staged preview (review jobs) or the import summary
+function pollImportJob(statusUrl) {
+    var previewDiv = document.querySelector('#dataPreview');
+    previewDiv.style.display = 'block';
+
+    fetch(statusUrl)
+        .then(response => response.json())
+        .then(job => {
+            if (job.error && !job.state) {
+                throw new Error(job.error);
+            }
+            if (job.state === 'succeeded') {
+                if (job.kind === 'review') {
+                    displayDataPreview(job.result);
+                } else {
+                    displayImportSummary(job.result);
+                }
+            } else if (job.state === 'failed') {
+                previewDiv.innerHTML = '<div class="alert alert-danger"></div>';
+                previewDiv.firstChild.textContent =
+                    `Upload failed after reading ${job.rows_read} rows: ${job.error}`;
             } else {
-                updatedRow[key] = row[key];
+                previewDiv.innerHTML = `
+                    <div class="alert alert-info">
+                        <span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>
+                        ${job.state === 'queued' ? 'Waiting to start...' : `Read ${job.rows_read} rows so far...`}
+                    </div>
+                `;
+                setTimeout(() => pollImportJob(statusUrl), 1000);
             }
+        })
+        .catch(error => {
+            console.error('Error polling import job:', error);
+            previewDiv.innerHTML = '<div class="alert alert-danger"></div>';
+            previewDiv.firstChild.textContent = error.message;
+        });
+}
+
+function displayImportSummary(result) {
+    var previewDiv = document.querySelector('#dataPreview');
+    var stats = result.stats;
+
+    previewDiv.innerHTML = `
+        <div class="alert alert-success">
+            ${result.message}
+            <div class="small mt-1">
+                Rows read: ${stats.rows_read}, skipped: ${stats.rows_skipped},
+                already imported: ${stats.rows_duplicate},
+                dates: ${stats.first_date || '-'} to ${stats.last_date || '-'},
+                net amount: ${stats.net_amount.toFixed(2)}
+            </div>
+            <div class="mt-2">
+                <a href="/cash-activities" class="btn btn-primary">View Transactions</a>
+            </div>
+        </div>
+    `;
+    var dateWarning = dateReportWarning(result.dates);
+    if (dateWarning) {
+        var warningDiv = document.createElement('div');
+        warningDiv.className = 'alert alert-warning';
+        warningDiv.textContent = dateWarning;
+        previewDiv.appendChild(warningDiv);
+    }
+
+    // First imported rows, read-only
+    var table = document.createElement('table');
+    table.className = 'table table-striped';
+    var headerRow = table.createTHead().insertRow();
+    result.columns.forEach(key => {
+        var th = document.createElement('th');
+        th.textContent = key.charAt(0).toUpperCase() + key.slice(1);
+        headerRow.appendChild(th);
+    });
+    var tbody = table.createTBody();
+    result.preview.forEach(row => {
+        var tr = tbody.insertRow();
+        result.columns.forEach(key => {
+            tr.insertCell().textContent = row[key];
         });
-        return updatedRow;
     });
-    return updatedData;
+    previewDiv.appendChild(table);
+    previewDiv.style.display = 'block';
 }
 
-function saveTransactions(data) {
-    const saveButton = document.querySelector('#dataPreview button');
+function saveTransactions(token) {
+    const saveButton = document.querySelector('#saveStagedButton');
     if (saveButton) {
         saveButton.disabled = true;
         saveButton.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Saving...';
     }
 
-    fetch('/save_transactions', {
+    fetch(`/commit-staged/${token}`, {
         method: 'POST',
         headers: { 
             'Content-Type': 'application/json',
             'X-Requested-With': 'XMLHttpRequest'
         },
-        body: JSON.stringify(data)
+        body: JSON.stringify({ types: stagedTypeOverrides })
     })
     .then(response => {
         if (!response.ok) {
@@ -400,13 +606,21 @@ function saveTransactions(data) {
         const previewDiv = document.getElementById('dataPreview');
         if (previewDiv) {
             previewDiv.innerHTML = `
-                <div class="alert alert-success">
+                <div class="alert ${result.failed ? 'alert-warning' : 'alert-success'}">
                     ${result.message}
+                    <ul class="small mt-2 mb-0" id="saveErrors"></ul>
                     <div class="mt-2">
                         <a href="/cash-activities" class="btn btn-primary">View Transactions</a>
                     </div>
                 </div>
             `;
+            // Rows are numbered from 1 as shown in the preview table
+            const errorList = document.getElementById('saveErrors');
+            (result.errors || []).forEach(err => {
+                const li = document.createElement('li');
+                li.textContent = `Row ${err.row + 1}: ${err.error}`;
+                errorList.appendChild(li);
+            });
         } else {
             alert(result.message || 'Transactions saved successfully');
             window.location.href = '/cash-activities';
@@ -556,7 +770,7 @@ function formatRiskMetrics(metrics) {
             <li><strong>Liquidity Ratio:</strong> ${formatNumber(metrics.liquidity_ratio)}</li>
             <li><strong>Cash Flow Volatility:</strong> $${formatNumber(metrics.cash_flow_volatility)}</li>
             <li><strong>Burn Rate:</strong> $${formatBurnRate(metrics.burn_rate)}/month</li>
-            <li><strong>Cash Runway:</strong> ${formatNumber(metrics.runway_months, true)} months</li>
+            <li><strong>Cash Runway:</strong> ${metrics.runway_months === null ? 'beyond the simulated horizon' : formatNumber(metrics.runway_months, true) + ' months'}</li>
         </ul>
     `;
 }
@@ -607,26 +821,8 @@ function updateForecastChart(forecasts) {
     window.forecastChart = new Chart(ctx, {
         type: 'line',
         data: {
-            labels: Array.from({length: 90}, (_, i) => `Day ${i + 1}`),
-            datasets: [{
-                label: '30-Day Forecast',
-                data: forecasts['30_days'],
-                borderColor: 'rgb(75, 192, 192)',
-                tension: 0.1,
-                fill: false
-            }, {
-                label: '60-Day Forecast',
-                data: forecasts['60_days'],
-                borderColor: 'rgb(255, 159, 64)',
-                tension: 0.1,
-                fill: false
-            }, {
-                label: '90-Day Forecast',
-                data: forecasts['90_days'],
-                borderColor: 'rgb(255, 99, 132)',
-                tension: 0.1,
-                fill: false
-            }]
+            labels: forecasts.dates,
+            datasets: forecastDatasets(forecasts)
         },
         options: {
             responsive: true,
@@ -634,7 +830,7 @@ function updateForecastChart(forecasts) {
                 y: {
                     title: {
                         display: true,
-                        text: 'Projected Amount ($)'
+                        text: 'Projected Daily Net Cash Flow ($)'
                     }
                 }
             }
@@ -642,6 +838,31 @@ function updateForecastChart(forecasts) {
     });
 }
 
+// Mean forecast line with its prediction interval drawn as a shaded band
+function forecastDatasets(forecasts) {
+    const percent = Math.round(forecasts.level * 100);
+    return [{
+        label: `Lower ${percent}% bound`,
+        data: forecasts.lower,
+        borderColor: 'rgba(153, 102, 255, 0.3)',
+        pointRadius: 0,
+        fill: false
+    }, {
+        label: `Upper ${percent}% bound`,
+        data: forecasts.upper,
+        borderColor: 'rgba(153, 102, 255, 0.3)',
+        backgroundColor: 'rgba(153, 102, 255, 0.15)',
+        pointRadius: 0,
+        fill: '-1'
+    }, {
+        label: `Forecast (${forecasts.model})`,
+        data: forecasts.mean,
+        borderColor: 'rgb(153, 102, 255)',
+        tension: 0.1,
+        fill: false
+    }];
+}
+
 function handleMonthlyIncomeExpense() {
     fetch('/monthly-income-expense')
         .then(response => response.json())
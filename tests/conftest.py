@@ -0,0 +1,103 @@
+"""
+Shared fixtures.
+
+main builds its app at import, from the environment, so the suite points
+INSTANCE_DIR at a scratch directory before importing it. The ledger is split
+over two shards unless SHARD_COUNT says otherwise (SHARD_COUNT=0 runs the
+suite against a single database). Every test gets a user of its own, so tests
+share the database without seeing each other's rows.
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix='cashcatalyst-tests-')
+os.environ['INSTANCE_DIR'] = SCRATCH
+os.environ['ANALYSIS_CACHE_PATH'] = os.path.join(SCRATCH, 'analysis_cache.db')
+os.environ.setdefault('SHARD_COUNT', '2')
+sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import main  # noqa: E402
+from src import ledger, sharding  # noqa: E402
+from src.models import db, Transaction, User, UserPreferences  # noqa: E402
+
+PASSWORD = 'secret-pw'
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = main.app
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, UPLOAD_FOLDER=str(tmp_path))
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username=f'user-{uuid.uuid4().hex[:12]}', password=generate_password_hash(PASSWORD))
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(UserPreferences(user_id=user.id))
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def tenant(app, user):
+    """The user's shard, selected for code that runs outside a request."""
+    with sharding.tenant(db, user.id):
+        yield user
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.test_client()
+    response = client.post('/login', data={'username': user.username, 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def add_transactions(tenant):
+    """add_transactions((iso_date, amount, type), ...) through the ledger, committed; returns the Transactions."""
+    def add(*rows):
+        transactions = ledger.add_transactions(tenant.id, [
+            Transaction(user_id=tenant.id, date=date.fromisoformat(day), description=f'Transaction {i}',
+                        amount=amount, type=t_type)
+            for i, (day, amount, t_type) in enumerate(rows)
+        ])
+        db.session.commit()
+        return transactions
+    return add
+
+
+@pytest.fixture
+def review_upload(client):
+    """review_upload(csv_text) posts a file to /upload and waits for its job; returns the staged first page."""
+    def upload(content, filename='upload.csv'):
+        response = client.post('/upload', data={'file': (io.BytesIO(content.encode()), filename)},
+                               content_type='multipart/form-data')
+        assert response.status_code == 202
+        status_url = response.get_json()['status_url']
+        deadline = time.monotonic() + 30
+        while (job := client.get(status_url).get_json())['state'] in ('queued', 'running'):
+            assert time.monotonic() < deadline, f"job still {job['state']}"
+            time.sleep(0.05)
+        assert job['state'] == 'succeeded', job['error']
+        return job['result']
+    return upload
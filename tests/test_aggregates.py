@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from src import aggregates
+from src.statement import build_cashflow_statement
+
+
+def test_totals_by_type_within_bounds(tenant, add_transactions):
+    add_transactions(
+        ('2024-01-05', 1000.0, 'Cash-customer'),
+        ('2024-01-25', 500.0, 'Cash-customer'),
+        ('2024-02-10', -300.0, 'Salary-suppliers'),
+        ('2024-03-01', -50.0, 'Salary-suppliers'),
+    )
+
+    totals = {row.type: row for row in aggregates.totals_by_type(tenant.id)}
+    assert totals['Cash-customer'].total == 1500.0 and totals['Cash-customer'].count == 2
+    assert totals['Salary-suppliers'].first_date == date(2024, 2, 10)
+    assert totals['Salary-suppliers'].last_date == date(2024, 3, 1)
+
+    january = aggregates.totals_by_type(tenant.id, date(2024, 1, 1), date(2024, 1, 31))
+    assert [(row.type, row.total) for row in january] == [('Cash-customer', 1500.0)]
+
+
+def test_outflow_total_is_positive_and_bounded(tenant, add_transactions):
+    add_transactions(
+        ('2024-01-05', 1000.0, 'Cash-customer'),
+        ('2024-02-10', -300.0, 'Salary-suppliers'),
+        ('2024-03-01', -50.0, 'Income-tax'),
+    )
+    assert aggregates.outflow_total(tenant.id) == 350.0
+    assert aggregates.outflow_total(tenant.id, start_date=date(2024, 3, 1)) == 50.0
+
+
+def test_totals_by_type_per_period(tenant, add_transactions):
+    add_transactions(
+        ('2023-12-31', 200.0, 'Cash-customer'),
+        ('2024-01-05', 1000.0, 'Cash-customer'),
+        ('2024-03-31', 500.0, 'Cash-customer'),
+        ('2024-04-01', -300.0, 'Salary-suppliers'),
+    )
+
+    def grouped(period):
+        return [(row.period, row.type, row.total) for row in aggregates.totals_by_type(tenant.id, period=period)]
+
+    assert grouped('month') == [('2023-12', 'Cash-customer', 200.0), ('2024-01', 'Cash-customer', 1000.0),
+                                ('2024-03', 'Cash-customer', 500.0), ('2024-04', 'Salary-suppliers', -300.0)]
+    assert grouped('quarter') == [('2023-Q4', 'Cash-customer', 200.0), ('2024-Q1', 'Cash-customer', 1500.0),
+                                  ('2024-Q2', 'Salary-suppliers', -300.0)]
+    assert grouped('year') == [('2023', 'Cash-customer', 200.0), ('2024', 'Cash-customer', 1500.0),
+                               ('2024', 'Salary-suppliers', -300.0)]
+    with pytest.raises(ValueError):
+        aggregates.totals_by_type(tenant.id, period='week')
+
+
+def test_activity_totals_follow_the_category_registry(tenant, add_transactions):
+    add_transactions(
+        ('2024-01-05', 1000.0, 'Cash-customer'),
+        ('2024-01-20', -250.0, 'Buy-property-equipments'),
+        ('2024-02-01', 5000.0, 'borrowings'),
+        ('2024-02-02', 99.0, 'Mystery'),
+    )
+
+    assert aggregates.activity_totals(tenant.id) == {'CFO': 1000.0, 'CFI': -250.0, 'CFF': 5000.0}
+    assert aggregates.activity_totals(tenant.id, period='month') == {
+        '2024-01': {'CFO': 1000.0, 'CFI': -250.0, 'CFF': 0.0},
+        '2024-02': {'CFO': 0.0, 'CFI': 0.0, 'CFF': 5000.0},
+    }
+    statement = build_cashflow_statement(tenant.id, start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+    assert statement['activity_totals'] == {'CFO': 1000.0, 'CFI': -250.0, 'CFF': 0.0}
@@ -0,0 +1,39 @@
+import time
+
+from src.analysis_cache import AnalysisCache, fingerprint
+
+
+def test_fingerprint_ignores_key_order_but_not_values():
+    assert fingerprint('m', {'a': 1, 'b': [1, 2]}) == fingerprint('m', {'b': [1, 2], 'a': 1})
+    assert fingerprint('m', {'a': 1}) != fingerprint('m', {'a': 2})
+    assert fingerprint('m', {'a': 1}) != fingerprint('other', {'a': 1})
+
+
+def test_hits_misses_and_expiry(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.db'), ttl=60)
+    assert cache.get('k') is None
+    cache.set('k', 'text')
+    assert cache.get('k') == 'text'
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get('k') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.db'), maxsize=2)
+    cache.set('a', 1)
+    time.sleep(0.01)
+    cache.set('b', 2)
+    time.sleep(0.01)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_size_zero_disables_the_cache(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache.db'), maxsize=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
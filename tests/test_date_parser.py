@@ -0,0 +1,81 @@
+import pandas as pd
+
+from src.date_parser import DateParser
+
+
+def parse(parser, values):
+    return [None if pd.isna(value) else value.strftime('%Y-%m-%d') for value in parser.parse(pd.Series(values))]
+
+
+def test_iso_dates_are_not_ambiguous():
+    parser = DateParser()
+    assert parse(parser, ['2024-01-05', '2024-02-03']) == ['2024-01-05', '2024-02-03']
+    report = parser.report()
+    assert report['formats'] == ['ISO8601']
+    assert not report['ambiguous'] and report['failed'] == 0
+
+
+def test_a_settling_value_decides_the_order_for_the_whole_chunk():
+    parser = DateParser()
+    assert parse(parser, ['01/02/2024', '25/12/2024']) == ['2024-02-01', '2024-12-25']
+    report = parser.report()
+    assert report['dayfirst'] is True
+    assert report['formats'] == ['%d/%m/%Y']
+    assert not report['ambiguous']
+
+
+def test_only_one_order_per_pair_and_contradicting_rows_fail():
+    parser = DateParser()
+    parsed = parse(parser, ['12/31/2024', '01/02/2024', '25/12/2024'])
+    report = parser.report()
+    assert report['formats'] == ['%m/%d/%Y']
+    assert parsed == ['2024-12-31', '2024-01-02', None]
+    assert report['failed'] == 1 and report['examples'] == ['25/12/2024']
+
+
+def test_order_is_not_switched_by_a_later_chunk():
+    parser = DateParser()
+    parse(parser, ['12/31/2024'])
+    assert parse(parser, ['25/12/2024', '03/04/2024']) == [None, '2024-03-04']
+    report = parser.report()
+    assert report['formats'] == ['%m/%d/%Y']
+    assert report['failed'] == 1
+
+
+def test_rows_read_before_the_order_settles_are_reported_ambiguous():
+    parser = DateParser()
+    assert parse(parser, ['01/02/2024', '01/02/2024', '03/04/2024']) == ['2024-01-02', '2024-01-02', '2024-03-04']
+    assert parser.report()['ambiguous_rows'] == 3
+
+    assert parse(parser, ['25/12/2024', '05/06/2024']) == ['2024-12-25', '2024-06-05']
+    report = parser.report()
+    assert report['dayfirst'] is True
+    assert report['formats'] == ['%d/%m/%Y']
+    assert report['ambiguous'] and report['ambiguous_rows'] == 3
+
+
+def test_guess_confirmed_later_is_no_longer_ambiguous():
+    parser = DateParser()
+    parse(parser, ['01/02/2024'])
+    parse(parser, ['12/31/2024'])
+    report = parser.report()
+    assert report['dayfirst'] is False
+    assert not report['ambiguous']
+
+
+def test_override_forces_the_order():
+    parser = DateParser(dayfirst=True)
+    assert parse(parser, ['01/02/2024', '12/31/2024']) == ['2024-02-01', None]
+    assert parser.report()['formats'] == ['%d/%m/%Y']
+
+
+def test_mixed_offset_aware_and_naive_iso_keep_their_wall_time():
+    parser = DateParser()
+    parsed = parse(parser, ['2024-01-05T23:00:00-05:00', '2024-01-06', '2024-01-07T01:00:00+02:00', 'not a date'])
+    assert parsed == ['2024-01-05', '2024-01-06', '2024-01-07', None]
+    assert parser.report()['failed'] == 1
+
+
+def test_upload_with_mixed_offsets_imports(review_upload):
+    csv = "Date,Description,Amount,Type\n2024-01-05T23:00:00-05:00,A,10,Cash-customer\n2024-01-06,B,20,Cash-customer\n"
+    assert review_upload(csv, 'mixed.csv')['dates']['failed'] == 0
@@ -0,0 +1,76 @@
+import io
+from datetime import date
+
+from werkzeug.datastructures import FileStorage
+
+from src import fingerprint, ledger
+from src.models import db, Transaction
+from src.upload_handler import ingest_upload
+
+HEADER = "Date,Description,Amount,Type\n"
+EXPORT = HEADER + (
+    "2024-01-05,Coffee,-3.5,Other-cfo\n"
+    "2024-01-05,Coffee,-3.5,Other-cfo\n"  # a second coffee that day, not a duplicate
+    "2024-01-06,Invoice 7,1200,Cash-customer\n"
+)
+LATER_EXPORT = EXPORT + "2024-01-09,Invoice 8,800,Cash-customer\n"
+
+
+def commit(client, token):
+    response = client.post(f'/commit-staged/{token}', json={})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def transaction_count(user_id):
+    return Transaction.query.filter_by(user_id=user_id).count()
+
+
+def test_fingerprint_ignores_case_and_spacing_of_descriptions():
+    day = date(2024, 1, 5)
+    assert fingerprint.base_fingerprint(1, day, -3.5, 'Coffee  shop') == fingerprint.base_fingerprint(1, day, -3.5, ' coffee shop')
+    assert fingerprint.base_fingerprint(1, day, -3.5, 'Coffee') != fingerprint.base_fingerprint(2, day, -3.5, 'Coffee')
+
+
+def test_reuploading_an_overlapping_export_only_adds_new_rows(client, user, tenant, review_upload):
+    assert commit(client, review_upload(EXPORT)['token']) == {
+        'message': '3 transactions saved successfully', 'inserted': 3, 'duplicates': 0}
+    again = commit(client, review_upload(LATER_EXPORT)['token'])
+    assert (again['inserted'], again['duplicates']) == (1, 3)
+
+    assert transaction_count(user.id) == 4
+    assert ledger.get_summary(user.id).transaction_count == 4
+    assert ledger.check(user.id) == []
+
+
+def test_streamed_import_skips_rows_already_imported(tenant):
+    ingest_upload(FileStorage(io.BytesIO(EXPORT.encode()), filename='a.csv'), tenant.id)
+    db.session.commit()
+    result = ingest_upload(FileStorage(io.BytesIO(LATER_EXPORT.encode()), filename='b.csv'), tenant.id)
+    db.session.commit()
+
+    assert result['stats']['rows_imported'] == 1 and result['stats']['rows_duplicate'] == 3
+    assert transaction_count(tenant.id) == 4
+
+
+def test_save_transactions_twice_saves_once(client, user, tenant):
+    items = [{'date': '2024-01-05', 'description': 'Coffee', 'amount': -3.5, 'type': 'Other-cfo'},
+             {'date': '2024-01-05', 'description': 'Coffee', 'amount': -3.5, 'type': 'Other-cfo'}]
+    first = client.post('/save_transactions', json=items).get_json()
+    second = client.post('/save_transactions', json=items).get_json()
+
+    assert (first['inserted'], first['duplicates']) == (2, 0)
+    assert (second['inserted'], second['duplicates']) == (0, 2)
+    assert transaction_count(user.id) == 2
+
+
+def test_backfilled_manual_rows_are_recognised_on_import(client, user, add_transactions, review_upload):
+    add_transactions(('2024-01-06', 1200.0, 'Cash-customer'))
+    manual = Transaction.query.filter_by(user_id=user.id).one()
+    manual.description = 'Invoice 7'
+    db.session.commit()
+
+    assert fingerprint.backfill(user.id) == 1
+    db.session.commit()
+    assert commit(client, review_upload(EXPORT)['token'])['duplicates'] == 1
+    assert transaction_count(user.id) == 3
@@ -0,0 +1,94 @@
+import io
+import time
+from datetime import datetime, timedelta
+
+from src import jobs, ledger
+from src.models import db, ImportJob
+
+CSV = (
+    "Date,Description,Amount,Type\n"
+    "2024-01-05,Invoice 1,1500,Cash-customer\n"
+    "2024-01-20,Rent,-700,Salary-suppliers\n"
+    "2024-02-03,Invoice 2,900,Cash-customer\n"
+)
+
+
+def upload_in_background(client, content, filename='import.csv', review=False):
+    data = {'file': (io.BytesIO(content.encode()), filename)}
+    if not review:
+        data['mode'] = 'stream'
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+    assert response.status_code == 202
+    return response.get_json()['job_id']
+
+
+def wait_for(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['state'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'Job {job_id} still {job["state"]} after {timeout}s')
+
+
+def test_background_import_finishes_and_lands_in_the_users_shard(client, user, tenant):
+    job = wait_for(client, upload_in_background(client, CSV))
+
+    assert job['state'] == 'succeeded'
+    assert job['finished_at'] is not None
+    assert job['rows_imported'] == 3
+    assert ledger.get_summary(user.id).transaction_count == 3
+
+
+def test_failed_import_is_marked_finished(client):
+    job = wait_for(client, upload_in_background(client, "Description,Amount\nNo date,10\n"))
+
+    assert job['state'] == 'failed'
+    assert "'date' column not found" in job['error']
+    assert job['finished_at'] is not None
+
+
+def test_spooled_upload_is_removed(client, tmp_path):
+    job_id = upload_in_background(client, CSV)
+    wait_for(client, job_id)
+
+    # The worker deletes the file just after recording the outcome
+    deadline = time.monotonic() + 5
+    while list(tmp_path.iterdir()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_review_upload_is_staged_by_a_job(client, user, tenant):
+    job = wait_for(client, upload_in_background(client, CSV, review=True))
+
+    assert (job['kind'], job['state'], job['rows_read']) == ('review', 'succeeded', 3)
+    page = job['result']
+    assert page['total'] == 3 and [row['description'] for row in page['rows']][:1] == ['Invoice 1']
+    assert ledger.get_summary(user.id).transaction_count == 0  # nothing saved until it is committed
+
+    response = client.post(f"/commit-staged/{page['token']}", json={})
+    assert response.get_json()['inserted'] == 3
+
+
+def test_jobs_orphaned_by_a_restart_stop_counting_as_pending(app, client, user):
+    stale = datetime.utcnow() - timedelta(seconds=app.config['IMPORT_JOB_STALE_AFTER'] + 1)
+    orphans = [ImportJob(user_id=user.id, filename='lost.csv', state=state, updated_at=stale)
+               for state in ('queued', 'running', 'running')]
+    db.session.add_all(orphans)
+    db.session.commit()
+    assert len(orphans) >= app.config['IMPORT_MAX_PENDING']
+
+    job = wait_for(client, upload_in_background(client, CSV))
+
+    assert job['state'] == 'succeeded'
+    for orphan in orphans:
+        status = client.get(f'/jobs/{orphan.id}').get_json()
+        assert status['state'] == 'failed' and status['error'] == jobs.ORPHANED_ERROR
+
+
+def test_live_jobs_are_not_expired(app, user):
+    db.session.add(ImportJob(user_id=user.id, filename='busy.csv', state='running'))
+    db.session.commit()
+    assert jobs.expire_orphans(user.id) == 0
@@ -0,0 +1,207 @@
+import uuid
+from datetime import date
+
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+
+from src import ledger, sharding
+from src.models import db, LedgerSummary, User
+
+
+def summary_of(user_id):
+    summary = ledger.get_summary(user_id)
+    return (summary.total_cfo, summary.total_cfi, summary.total_cff,
+            summary.transaction_count, summary.first_date, summary.last_date)
+
+
+def test_summary_follows_adds_edits_and_deletes(tenant, add_transactions):
+    invoice, rent, laptop = add_transactions(
+        ('2024-01-05', 1000.0, 'Cash-customer'),
+        ('2024-02-01', -400.0, 'Salary-suppliers'),
+        ('2024-03-10', -250.0, 'Buy-property-equipments'),
+    )
+    assert summary_of(tenant.id) == (600.0, -250.0, 0.0, 3, date(2024, 1, 5), date(2024, 3, 10))
+
+    ledger.update_transaction(laptop, type='borrowings', amount=2000.0, date=date(2024, 4, 1))
+    db.session.commit()
+    assert summary_of(tenant.id) == (600.0, 0.0, 2000.0, 3, date(2024, 1, 5), date(2024, 4, 1))
+
+    ledger.delete_transaction(invoice)
+    db.session.commit()
+    assert summary_of(tenant.id) == (-400.0, 0.0, 2000.0, 2, date(2024, 2, 1), date(2024, 4, 1))
+    assert ledger.check(tenant.id) == []
+
+
+def test_uncategorised_types_count_but_add_no_cash(tenant, add_transactions):
+    add_transactions(('2024-01-05', 1000.0, 'Cash-customer'), ('2024-01-06', 99.0, 'Mystery'))
+    assert summary_of(tenant.id)[:4] == (1000.0, 0.0, 0.0, 2)
+    assert ledger.check(tenant.id) == []
+
+
+def test_missing_summary_is_rebuilt_from_the_transactions(tenant, add_transactions):
+    add_transactions(('2024-01-05', 1000.0, 'Cash-customer'), ('2024-01-07', -100.0, 'Interest-paid'))
+    LedgerSummary.query.filter_by(user_id=tenant.id).delete()
+    db.session.commit()
+
+    assert summary_of(tenant.id)[:4] == (1000.0, 0.0, -100.0, 2)
+    assert ledger.check(tenant.id) == []
+
+
+def test_building_a_missing_summary_leaves_the_commit_to_the_caller(tenant, add_transactions):
+    add_transactions(('2024-01-05', 1000.0, 'Cash-customer'))
+    LedgerSummary.query.filter_by(user_id=tenant.id).delete()
+    db.session.commit()
+
+    assert ledger.get_summary(tenant.id).total_cfo == 1000.0
+    db.session.rollback()
+    assert LedgerSummary.query.filter_by(user_id=tenant.id).count() == 0
+
+
+def test_summary_stored_by_a_concurrent_request_is_returned(tenant, add_transactions, monkeypatch):
+    add_transactions(('2024-01-05', 1000.0, 'Cash-customer'))
+    LedgerSummary.query.filter_by(user_id=tenant.id).delete()
+    db.session.commit()
+    summary_values = ledger._summary_values
+
+    def lose_the_race(user_id):
+        # Another request commits its summary between our lookup and our insert
+        with db.session.get_bind(LedgerSummary.__mapper__).begin() as connection:
+            connection.execute(insert(LedgerSummary.__table__).values(
+                user_id=user_id, **dict(zip(ledger.SUMMARY_FIELDS, summary_values(user_id)))))
+        return summary_values(user_id)
+    monkeypatch.setattr(ledger, '_summary_values', lose_the_race)
+
+    assert summary_of(tenant.id)[:4] == (1000.0, 0.0, 0.0, 1)
+    assert LedgerSummary.query.filter_by(user_id=tenant.id).count() == 1
+
+
+def test_registration_creates_the_ledger_summary(app):
+    username = f'new-{uuid.uuid4().hex[:12]}'
+    response = app.test_client().post('/register', data={
+        'username': username, 'password': 'secret-pw', 'confirm_password': 'secret-pw'})
+    assert response.status_code == 302
+    user = User.query.filter_by(username=username).one()
+    with sharding.tenant(db, user.id):
+        assert LedgerSummary.query.filter_by(user_id=user.id).count() == 1
+
+
+def test_check_reports_drift_and_rebuild_repairs_it(tenant, add_transactions):
+    add_transactions(('2024-01-05', 1000.0, 'Cash-customer'))
+    ledger.get_summary(tenant.id).total_cfo = 5.0
+    db.session.commit()
+
+    assert ledger.check(tenant.id)
+    assert ledger.rebuild(tenant.id) == [tenant.id]
+    assert ledger.check(tenant.id) == []
+    assert ledger.get_summary(tenant.id).total_cfo == 1000.0
+
+
+def test_cash_overview_shows_the_summary(client, add_transactions):
+    add_transactions(('2024-01-05', 1234.5, 'Cash-customer'), ('2024-01-09', 700.0, 'Issue-shares'))
+    page = client.get('/cash-overview').get_data(as_text=True)
+    assert '$1234.5' in page and '$700.0' in page
+
+
+def test_monthly_rollups_follow_writes(tenant, add_transactions):
+    invoice, rent, _ = add_transactions(
+        ('2024-01-05', 1000.0, 'Cash-customer'),
+        ('2024-01-20', -400.0, 'Salary-suppliers'),
+        ('2024-02-03', -150.0, 'Income-tax'),
+    )
+    assert ledger.monthly_totals(tenant.id) == [('2024-01', 1000.0, 400.0), ('2024-02', 0.0, 150.0)]
+
+    # Moving a row to another month empties its old rollup rather than leaving a stale one
+    ledger.update_transaction(rent, date=date(2024, 3, 1))
+    ledger.delete_transaction(invoice)
+    db.session.commit()
+    assert ledger.monthly_totals(tenant.id) == [('2024-02', 0.0, 150.0), ('2024-03', 0.0, 400.0)]
+    assert sorted(ledger.outflow_by_type(tenant.id)) == [('Income-tax', 150.0), ('Salary-suppliers', 400.0)]
+    assert ledger.check(tenant.id) == []
+
+
+def test_monthly_totals_can_be_limited_to_types(tenant, add_transactions):
+    add_transactions(('2024-01-05', 1000.0, 'Cash-customer'), ('2024-01-06', 50.0, 'Mystery'))
+    assert ledger.monthly_totals(tenant.id) == [('2024-01', 1050.0, 0.0)]
+    assert ledger.monthly_totals(tenant.id, ['Cash-customer']) == [('2024-01', 1000.0, 0.0)]
+
+
+def test_daily_net_lists_every_day_but_nets_only_categorised_types(tenant, add_transactions):
+    add_transactions(('2024-01-05', 1000.0, 'Cash-customer'), ('2024-01-05', 40.0, 'Mystery'),
+                     ('2024-01-06', 99.0, 'Mystery'), ('2024-01-08', -300.0, 'Salary-suppliers'))
+
+    assert ledger.daily_net(tenant.id) == [(date(2024, 1, 5), 1000.0), (date(2024, 1, 6), 0.0),
+                                           (date(2024, 1, 8), -300.0)]
+
+
+def test_chart_endpoints_read_the_rollups(client, add_transactions):
+    add_transactions(
+        ('2024-01-05', 1000.0, 'Cash-customer'),
+        ('2024-02-20', -400.0, 'Salary-suppliers'),
+    )
+    monthly = client.get('/monthly-income-expense').get_json()['data']
+    assert monthly == {'labels': ['2024-01', '2024-02'], 'income': [1000.0, 0.0], 'expense': [0.0, 400.0]}
+    categories = client.get('/cashout-categories').get_json()['data']
+    assert categories == {'labels': ['Salary-suppliers'], 'amounts': [400.0]}
+
+
+def expected_balance(rows, day):
+    return sum(amount for when, amount, t_type in rows if date.fromisoformat(when) <= day and t_type != 'Mystery')
+
+
+def test_balance_as_of_matches_a_full_scan_after_backdated_writes(tenant, add_transactions):
+    rows = [('2024-01-10', 1000.0, 'Cash-customer'), ('2024-02-10', -300.0, 'Salary-suppliers'),
+            ('2024-03-10', 50.0, 'Mystery')]
+    add_transactions(*rows)
+    # Earlier than every stored day, so every later cumulative balance shifts
+    backdated = [('2023-12-31', 200.0, 'Issue-shares'), ('2024-02-10', -25.0, 'Interest-paid')]
+    add_transactions(*backdated)
+    rows += backdated
+
+    days = [date(2023, 12, 1), date(2023, 12, 31), date(2024, 1, 31), date(2024, 2, 10), date(2025, 1, 1)]
+    assert ledger.balances_as_of(tenant.id, days) == [expected_balance(rows, day) for day in days]
+    assert ledger.balance_as_of(tenant.id, date(2024, 2, 9)) == 1200.0
+    assert ledger.check(tenant.id) == []
+
+
+def test_large_change_sets_rebuild_the_daily_balances(tenant, add_transactions):
+    # More distinct days than DAILY_REBUILD_THRESHOLD in one change set
+    rows = [(date(2024, 1 + i // 28, 1 + i % 28).isoformat(), float(i), 'Cash-customer')
+            for i in range(ledger.DAILY_REBUILD_THRESHOLD + 10)]
+    add_transactions(*rows)
+    add_transactions(*rows[:5])
+    rows += rows[:5]
+
+    days = [date(2024, 1, 15), date(2024, 2, 28), date(2024, 12, 31)]
+    assert ledger.balances_as_of(tenant.id, days) == [expected_balance(rows, day) for day in days]
+    assert ledger.check(tenant.id) == []
+
+
+def test_many_balances_take_a_fixed_number_of_queries(tenant, add_transactions):
+    rows = [(date(2024, 1 + i // 28, 1 + i % 28).isoformat(), 100.0 - i, 'Cash-customer') for i in range(90)]
+    add_transactions(*rows)
+    # Unsorted, repeated, before the first and after the last transaction
+    days = [date(2024, 3, 5), date(2023, 6, 1), date(2024, 1, 1), date(2024, 3, 5), date(2025, 1, 1)]
+    days += [date(2024, 1 + i % 4, 1 + i % 27) for i in range(200)]
+    ledger.get_summary(tenant.id)
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        balances = ledger.balances_as_of(tenant.id, days)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+
+    assert balances == [expected_balance(rows, day) for day in days]
+    assert len(statements) <= 3
+    assert ledger.balances_as_of(tenant.id, []) == []
+
+
+def test_balance_by_date_endpoints_add_the_initial_balance(client, add_transactions):
+    add_transactions(('2024-01-10', 1000.0, 'Cash-customer'), ('2024-02-10', -300.0, 'Salary-suppliers'))
+    client.post('/set-initial-balance', data={'initial_balance': '500'})
+
+    assert client.post('/balance-by-date', data={'date': '2024-01-31'}).get_json()['balance'] == 1500.0
+    batch = client.post('/balance-by-date/batch', json={'dates': ['2023-01-01', '2024-03-01']}).get_json()
+    assert [point['balance'] for point in batch['balances']] == [500.0, 1200.0]
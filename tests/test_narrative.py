@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+from werkzeug.security import generate_password_hash
+
+from src import analysis_cache, narrative
+from src.models import db, User
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+from fake_anthropic import CANNED_ANALYSIS, make_server  # noqa: E402
+
+
+def start(monkeypatch, **options):
+    server = make_server(port=0, quiet=True, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('ANTHROPIC_BASE_URL', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setenv('ANTHROPIC_API_KEY', 'test')
+    return server
+
+
+@pytest.fixture
+def fake_api(app, monkeypatch):
+    server = start(monkeypatch)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fresh_slots_and_cache(app):
+    config = dict(app.config)
+    analysis_cache.shared.clear(reset_stats=True)
+    narrative.init_app(app)
+    yield
+    app.config.update(config)
+    narrative.init_app(app)
+
+
+@pytest.fixture
+def history(add_transactions):
+    return add_transactions(
+        ('2024-01-05', 3000.0, 'Cash-customer'),
+        ('2024-01-20', -1200.0, 'Salary-suppliers'),
+        ('2024-02-05', 2500.0, 'Cash-customer'),
+        ('2024-02-20', -1300.0, 'Salary-suppliers'),
+        ('2024-03-05', 2800.0, 'Cash-customer'),
+    )
+
+
+def events(response):
+    assert response.mimetype == 'text/event-stream'
+    parsed = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in lines:
+            parsed.append((lines['event'], json.loads(lines['data'])))
+    return parsed
+
+
+def test_narrative_streams_in_chunks_then_comes_from_the_cache(client, history, fake_api):
+    analysis = client.get('/forecast').get_json()
+    assert analysis['success'] and analysis['ai_analysis'] is None
+    assert analysis['risk_metrics']['runway_months'] is None
+    assert f"key={analysis['cache_key']}" in analysis['stream_url']
+
+    streamed = events(client.get(analysis['stream_url']))
+    assert len(streamed) > 2
+    assert {name for name, _ in streamed[:-1]} == {'chunk'}
+    assert ''.join(data['text'] for _, data in streamed[:-1]) == CANNED_ANALYSIS
+    assert streamed[-1] == ('done', {'cached': False})
+    assert fake_api.requests == 1
+
+    again = client.get('/forecast').get_json()
+    assert again['cached'] and again['ai_analysis'] == CANNED_ANALYSIS and again['stream_url'] is None
+    assert fake_api.requests == 1
+
+
+def test_refresh_asks_the_model_again(client, history, fake_api):
+    events(client.get(client.get('/forecast').get_json()['stream_url']))
+
+    refreshed = client.get('/forecast?refresh=1').get_json()
+    assert refreshed['ai_analysis'] is None and 'refresh=1' in refreshed['stream_url']
+    assert events(client.get(refreshed['stream_url']))[-1] == ('done', {'cached': False})
+    assert fake_api.requests == 2
+
+
+def test_stream_does_not_use_another_users_prompt(app, client, history, fake_api):
+    stream_url = client.get('/forecast').get_json()['stream_url']
+
+    # A fresh app context, so the first user's login does not carry over in flask.g
+    with app.app_context():
+        other = User(username='someone-else', password=generate_password_hash('pw'))
+        db.session.add(other)
+        db.session.commit()
+        intruder = app.test_client()
+        intruder.post('/login', data={'username': 'someone-else', 'password': 'pw'})
+        streamed = events(intruder.get(stream_url))
+
+    # Without the prompt, the analysis is redone for the intruder, who has no transactions
+    assert streamed == [('failed', {'error': 'No transactions found. Please add some transactions first.'})]
+    assert fake_api.requests == 0
+
+
+def test_busy_when_every_slot_is_taken(app, client, history, fake_api):
+    app.config['ANALYSIS_QUEUE_TIMEOUT'] = 0.01
+    slots = app.extensions['narrative_slots']
+    for _ in range(app.config['ANALYSIS_MAX_CONCURRENT']):
+        assert slots.acquire(blocking=False)
+
+    streamed = events(client.get(client.get('/forecast').get_json()['stream_url']))
+    assert streamed == [('failed', {'error': 'The analysis service is busy; please try again shortly.'})]
+    assert fake_api.requests == 0
+
+
+def assert_every_slot_free(app):
+    slots = app.extensions['narrative_slots']
+    for _ in range(app.config['ANALYSIS_MAX_CONCURRENT']):
+        assert slots.acquire(blocking=False)
+
+
+@pytest.mark.parametrize('options', [{'stall': 5}, {'delay': 1}], ids=['before-response', 'mid-stream'])
+def test_stalled_model_call_times_out(app, client, history, monkeypatch, options):
+    server = start(monkeypatch, **options)
+    app.config['ANALYSIS_TIMEOUT'] = 0.5
+    try:
+        streamed = events(client.get(client.get('/forecast').get_json()['stream_url']))
+        # The call was aborted, not left to run on until the API or the fake server gives up
+        assert_every_slot_free(app)
+    finally:
+        server.shutdown()
+    assert streamed[-1][0] == 'failed'
+    assert all(name != 'done' for name, _ in streamed)
+    assert server.requests == 1  # not retried
+    assert analysis_cache.shared.stats()['entries'] == 1  # the prompt, but no narrative
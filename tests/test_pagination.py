@@ -0,0 +1,60 @@
+import pytest
+
+from src.pagination import decode_cursor, encode_cursor, paginate_transactions
+
+
+@pytest.fixture
+def transactions(add_transactions):
+    # Several rows share a date, so the id has to break ties
+    days = ['2024-01-01', '2024-01-02', '2024-01-02', '2024-01-02', '2024-01-03', '2024-01-05', '2024-01-05']
+    return add_transactions(*[(day, float(i), 'Cash-customer') for i, day in enumerate(days)])
+
+
+def newest_first(transactions):
+    return [t.id for t in sorted(transactions, key=lambda t: (t.date, t.id), reverse=True)]
+
+
+def test_walking_forward_visits_every_row_once_newest_first(tenant, transactions):
+    seen, page = [], paginate_transactions(tenant.id, 3)
+    assert not page.has_prev
+    while True:
+        seen += [t.id for t in page.items]
+        if not page.has_next:
+            break
+        page = paginate_transactions(tenant.id, 3, after=page.next_cursor)
+    assert seen == newest_first(transactions)
+
+
+def test_walking_back_returns_the_same_pages(tenant, transactions):
+    first = paginate_transactions(tenant.id, 3)
+    second = paginate_transactions(tenant.id, 3, after=first.next_cursor)
+    third = paginate_transactions(tenant.id, 3, after=second.next_cursor)
+    assert [len(page.items) for page in (first, second, third)] == [3, 3, 1]
+
+    back = paginate_transactions(tenant.id, 3, before=third.prev_cursor)
+    assert [t.id for t in back.items] == [t.id for t in second.items]
+    assert back.has_next and back.has_prev
+    assert [t.id for t in paginate_transactions(tenant.id, 3, before=back.prev_cursor).items] == \
+        [t.id for t in first.items]
+
+
+def test_rows_added_meanwhile_do_not_shift_later_pages(tenant, transactions, add_transactions):
+    first = paginate_transactions(tenant.id, 3)
+    expected = [t.id for t in paginate_transactions(tenant.id, 3, after=first.next_cursor).items]
+    add_transactions(('2024-02-01', 1.0, 'Cash-customer'))
+    assert [t.id for t in paginate_transactions(tenant.id, 3, after=first.next_cursor).items] == expected
+
+
+def test_cursor_round_trip_and_rejects_garbage(transactions):
+    assert decode_cursor(encode_cursor(transactions[2])) == (transactions[2].date, transactions[2].id)
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+
+def test_transactions_endpoint_pages_with_cursors(client, transactions):
+    first = client.get('/transactions?limit=4&total=1').get_json()
+    assert first['total'] == 7 and first['prev_cursor'] is None
+    rest = client.get(f"/transactions?limit=4&after={first['next_cursor']}").get_json()
+    assert rest['next_cursor'] is None
+    assert [t['id'] for t in first['transactions'] + rest['transactions']] == newest_first(transactions)
+    assert client.get('/transactions?after=garbage').status_code == 400
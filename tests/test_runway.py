@@ -0,0 +1,33 @@
+import numpy as np
+
+from src import runway
+from src.anthropic_service import FinancialAnalytics
+
+
+def test_monthly_net_flows_leave_out_uncategorised_types(tenant, add_transactions):
+    add_transactions(
+        ('2024-01-10', 1000.0, 'Cash-customer'),
+        ('2024-01-20', -400.0, 'Salary-suppliers'),
+        ('2024-01-25', 5000.0, 'Unknown'),
+        ('2024-03-05', -200.0, 'Other-cfo'),
+    )
+    assert runway.monthly_net_flows(tenant.id).tolist() == [600.0, 0.0, -200.0]
+
+
+def test_simulation_runs_out_when_every_month_loses_cash():
+    simulation = runway.simulate(1000.0, [-300.0, -300.0], months=12, paths=100, seed=1)
+    assert simulation.runway_median == 4
+    assert simulation.cash_out_probability[2] == 0.0 and simulation.cash_out_probability[3] == 1.0
+
+
+def test_risk_metrics_runway_is_the_simulated_median():
+    analytics = FinancialAnalytics(api_key='test')
+    working_capital = {'current_assets': 1000.0, 'current_liabilities': 0, 'cash': 1000.0}
+    simulation = runway.simulate(1000.0, [-300.0, -100.0], months=24, paths=1000, seed=1)
+
+    metrics = analytics.calculate_risk_metrics([-300.0, -100.0], working_capital, simulation)
+    assert metrics['runway_months'] == simulation.runway_median
+
+    growing = runway.simulate(1000.0, [100.0], months=24, paths=10, seed=1)
+    assert np.isinf(growing.runway_median)
+    assert analytics.calculate_risk_metrics([100.0], working_capital, growing)['runway_months'] is None
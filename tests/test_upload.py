@@ -0,0 +1,83 @@
+import io
+
+import pandas as pd
+from werkzeug.datastructures import FileStorage
+
+from src import ledger
+from src.models import db
+from src.upload_handler import ingest_upload, read_chunks
+
+ROWS = [
+    ('2024-01-05', 'Invoice 1', 1500.0, 'Cash-customer'),
+    ('2024-01-20', 'Rent', -700.0, 'Salary-suppliers'),
+    ('2024-02-03', 'Invoice 2', 900.0, 'Cash-customer'),
+    ('2024-02-15', 'Laptop', -1200.0, 'Buy-property-equipments'),
+    ('2024-03-01', 'Loan', 5000.0, 'borrowings'),
+]
+
+
+def csv_upload(rows=ROWS, filename='upload.csv'):
+    frame = pd.DataFrame(rows, columns=['Date', 'Description', 'Amount', 'Type'])
+    return FileStorage(stream=io.BytesIO(frame.to_csv(index=False).encode()), filename=filename)
+
+
+def xlsx_upload(rows=ROWS):
+    buffer = io.BytesIO()
+    pd.DataFrame(rows, columns=['Date', 'Description', 'Amount', 'Type']).to_excel(buffer, index=False)
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename='upload.xlsx')
+
+
+def test_read_chunks_caps_rows_per_chunk():
+    assert [len(chunk) for chunk in read_chunks(csv_upload(), chunksize=2)] == [2, 2, 1]
+    assert [len(chunk) for chunk in read_chunks(xlsx_upload(), chunksize=2)] == [2, 2, 1]
+
+
+def test_chunked_import_reaches_the_ledger_whole(tenant):
+    progress = []
+    result = ingest_upload(csv_upload(), tenant.id, chunksize=2, progress=lambda stats: progress.append(stats['rows_read']))
+    db.session.commit()
+
+    assert progress == [2, 4, 5]
+    assert result['stats']['rows_imported'] == 5 and result['stats']['chunks'] == 3
+    summary = ledger.get_summary(tenant.id)
+    assert summary.transaction_count == 5
+    assert summary.total_cfo == 1700.0 and summary.total_cfi == -1200.0 and summary.total_cff == 5000.0
+    assert ledger.check(tenant.id) == []
+
+
+def test_rows_without_a_usable_amount_are_skipped(tenant):
+    rows = ROWS[:2] + [('2024-02-03', 'Broken', 'n/a', 'Cash-customer')]
+    result = ingest_upload(csv_upload(rows), tenant.id, chunksize=2)
+    db.session.commit()
+    assert result['stats']['rows_imported'] == 2 and result['stats']['rows_skipped'] == 1
+
+
+def test_saved_items_may_mix_utc_offsets(client, user, tenant):
+    items = [{'date': '2024-01-05T23:30:00-08:00', 'description': 'Invoice 1', 'amount': 1500.0, 'type': 'Cash-customer'},
+             {'date': '2024-01-06', 'description': 'Rent', 'amount': -700.0, 'type': 'Salary-suppliers'},
+             {'date': '2024-01-07T09:00:00+05:30', 'description': 'Invoice 2', 'amount': 900.0, 'type': 'Cash-customer'},
+             {'date': 'soon', 'description': 'Broken', 'amount': 10.0, 'type': 'Cash-customer'}]
+    response = client.post('/save_transactions', json=items)
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['inserted'] == 3 and report['errors'] == [{'row': 3, 'error': "invalid date: 'soon'"}]
+    # Each date keeps its own wall-clock day
+    assert [str(day) for day, _ in ledger.daily_net(user.id)] == ['2024-01-05', '2024-01-06', '2024-01-07']
+
+
+def test_committed_uploads_keep_the_derived_tables_exact(tenant, add_transactions):
+    add_transactions(('2024-01-20', -700.0, 'Salary-suppliers'))
+    # A few days updates the daily balances in place, many days rebuilds them
+    many_days = [(f'2023-{month:02d}-{day:02d}', f'Sale {month}/{day}', 10.0 * day, 'Cash-customer')
+                 for month in range(1, 13) for day in (3, 9, 17, 25)]
+    for rows in (ROWS, many_days + ROWS[:2]):
+        ingest_upload(csv_upload(rows), tenant.id, chunksize=20)
+        db.session.commit()
+        assert ledger.check(tenant.id) == []
+
+    summary = ledger.get_summary(tenant.id)
+    assert summary.transaction_count == 1 + 5 + 48
+    assert summary.total_cfo == -700.0 + 1700.0 + sum(10.0 * day for day in (3, 9, 17, 25)) * 12
+    assert summary.first_date.isoformat() == '2023-01-03'
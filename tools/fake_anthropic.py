@@ -0,0 +1,140 @@
+"""
+A local stand-in for the Anthropic Messages API.
+
+It exercises the AI analysis without a key or network access.
+POST /v1/messages answers with a canned analysis, either as one JSON message
+or, when the request asks for "stream": true, as the same Server-Sent Events
+the real API sends (message_start, content_block_delta per word, ...).
+--delay spaces the streamed words out and --stall holds the response back,
+to watch streaming and timeouts in the browser. Usage:
+
+    python tools/fake_anthropic.py --port 8765 --delay 0.05
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=test flask --app main run
+"""
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_ANALYSIS = """## 1. Pattern Recognition Analysis
+- Cash flows follow a regular monthly cycle with no unusual outliers.
+
+## 2. Risk Assessment
+- Liquidity is adequate; keep an eye on months where outflows cluster.
+
+## 3. Seasonal Trends
+- Inflows peak towards quarter ends.
+
+## 4. Working Capital Optimization
+- Bring collections forward and stagger supplier payments.
+
+## 5. Forecast
+- Expect the current trend to continue over the forecast horizon.
+"""
+
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/v1/messages':
+            self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.requests += 1
+        time.sleep(self.server.stall)
+        model = request.get('model', 'fake-model')
+        input_tokens = sum(len(str(m.get('content', '')).split()) for m in request.get('messages', []))
+        if request.get('stream'):
+            self._stream(model, input_tokens)
+        else:
+            self._send_json(200, {
+                'id': f'msg_fake_{self.server.requests}',
+                'type': 'message',
+                'role': 'assistant',
+                'model': model,
+                'content': [{'type': 'text', 'text': self.server.text}],
+                'stop_reason': 'end_turn',
+                'stop_sequence': None,
+                'usage': {'input_tokens': input_tokens, 'output_tokens': len(self.server.text.split())},
+            })
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _event(self, name, data):
+        chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+        # Chunked transfer encoding, so each event reaches the client as it is written
+        self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, model, input_tokens):
+        words = re.findall(r'\S+\s*', self.server.text)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self._event('message_start', {'type': 'message_start', 'message': {
+                'id': f'msg_fake_{self.server.requests}', 'type': 'message', 'role': 'assistant', 'model': model,
+                'content': [], 'stop_reason': None, 'stop_sequence': None,
+                'usage': {'input_tokens': input_tokens, 'output_tokens': 0},
+            }})
+            self._event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                                'content_block': {'type': 'text', 'text': ''}})
+            for word in words:
+                time.sleep(self.server.delay)
+                self._event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                                    'delta': {'type': 'text_delta', 'text': word}})
+            self._event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+            self._event('message_delta', {'type': 'message_delta',
+                                          'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                          'usage': {'output_tokens': len(words)}})
+            self._event('message_stop', {'type': 'message_stop'})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. the app abandoned a timed-out analysis), possibly during --stall
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host='127.0.0.1', port=8765, delay=0.0, stall=0.0, text=CANNED_ANALYSIS, quiet=False):
+    """The fake API server, not yet serving; port 0 picks a free port (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), FakeAnthropicHandler)
+    server.daemon_threads = True
+    server.delay, server.stall, server.text, server.quiet = delay, stall, text, quiet
+    server.requests = 0
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.05, help='Seconds between streamed words.')
+    parser.add_argument('--stall', type=float, default=0.0, help='Seconds to wait before responding.')
+    parser.add_argument('--text', help='Reply with this text instead of the canned analysis.')
+    parser.add_argument('--quiet', action='store_true', help='Do not log requests.')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.delay, args.stall, args.text or CANNED_ANALYSIS, args.quiet)
+    print(f"Fake Anthropic API on http://{args.host}:{server.server_port} "
+          f"(set ANTHROPIC_BASE_URL to this address)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()